@@ -1,9 +1,16 @@
 import subprocess
+import urllib.parse
 import streamlit as st
 import json
+import sys
 import os
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import search_client
+
 QUERIES_PATH = "queries.json"
+SERVER_URL = urllib.parse.urlsplit(os.getenv("ASK_PW_SERVER_URL",
+                                             f"http://{search_client.DEFAULT_HOST}:{search_client.DEFAULT_PORT}"))
 
 def main():
     st.title("Ask Parallel Works")
@@ -13,11 +20,12 @@ def main():
     st.markdown(intro_message)
 
     query = st.text_input("Enter your query:")
+    show_timings = st.checkbox("Show stage timings")
 
     if st.button("Ask"):
         if query:
             with st.spinner("Processing..."):
-                answer = run_script(query)
+                answer = run_script(query, show_timings)
             save_query(query, answer)
         else:
             st.error("Error: No query provided.")
@@ -25,31 +33,102 @@ def main():
     queries = load_queries()
     display_sidebar(queries)
 
-def run_script(query: str):
+def ask_server_stream(query: str, placeholder, show_timings=False):
+    """
+    Asks the resident Ask PW search server to answer a query, rendering the
+    answer into the page incrementally as it is streamed back.
+
+    Parameters
+    -----------
+        query (str) : user query to answer
+        placeholder : Streamlit placeholder the partial answer is written into
+        show_timings (bool) : if True, also shows the per-stage timings of the query
+
+    Returns
+    -----------
+        output (str | None) : answer from the server, or None if no server is
+                running
+        error (str | None) : error reported by the server, if any
+    """
+    try:
+        events = search_client.stream_server("ask_stream", {"query": query, "timings": show_timings},
+                                             host=SERVER_URL.hostname,
+                                             port=SERVER_URL.port or search_client.DEFAULT_PORT)
+    except RuntimeError as e:
+        return "", str(e)
+    except search_client.DISCONNECTED_ERRORS:
+        return "", "The search server did not respond in time."
+
+    if events is None:
+        return None, None
+
+    partial_answer = ""
+    try:
+        for event in events:
+            if "error" in event:
+                return "", event["error"]
+            if "answer" in event:
+                placeholder.markdown(event["answer"])
+                if show_timings:
+                    display_timings(event.get("timings", {}))
+                return event["answer"], None
+            partial_answer += event["delta"]
+            placeholder.markdown(partial_answer)
+    except search_client.DISCONNECTED_ERRORS:
+        return "", "The search server stopped responding."
+
+    return "", "The answer stream ended unexpectedly."
+
+def display_timings(timings: dict):
+    """
+    Displays the per-stage timings of a query.
+
+    Parameters
+    -----------
+        timings (dict) : stage name to milliseconds
+
+    Returns
+    -----------
+        (Does not return a value)
+    """
+    st.subheader("Stage timings:")
+    st.table([{"stage": stage, "ms": round(ms, 2)} for stage, ms in timings.items()])
+
+def run_script(query: str, show_timings=False):
     """
-    Runs the Ask Parallel Works script in Streamlit.
+    Runs the Ask Parallel Works script in Streamlit. Queries are answered by the
+    resident search server when it is running, with the answer streamed into the
+    page as it is generated, and otherwise by spawning the `ask_pw.sh` script.
 
     Parameters
     -----------
         query (str) : user query to answer
+        show_timings (bool) : if True, also shows the per-stage timings of the
+                query when it is answered by the server
 
     Returns
     -----------
         output (str) : run_gpt output
     """
-    command = ["bash", "ask_pw.sh", query]
-    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    st.subheader("Answer:")
+    placeholder = st.empty()
+
+    output, error = ask_server_stream(query, placeholder, show_timings)
+
+    if output is None:
+        command = ["bash", "ask_pw.sh", query]
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
 
-    output, error = process.communicate()
-    output = output.decode("utf-8")
+        output, error = process.communicate()
+        output = output.decode("utf-8")
+        # The script logs warnings to stderr even when it succeeds
+        error = error.decode("utf-8") if process.returncode != 0 else None
 
     if error:
         st.subheader("Script Error:")
-        st.error(error.decode("utf-8"))
-    else:
-        st.subheader("Answer:")
+        st.error(error)
 
-    st.write(output)
+    placeholder.write(output)
 
     return output
 
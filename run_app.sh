@@ -27,6 +27,11 @@ then
   cd ../../ask_pw_app
 fi
 
+# Start the resident search server so queries are answered from warm memory
+(cd ../src && exec python3 search_server.py) &
+server_pid=$!
+trap "kill $server_pid 2>/dev/null" EXIT
+
 streamlit run ask_pw_app.py
 
 
@@ -0,0 +1,241 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+import helper_funcs as helper
+
+ANSWER_CACHE_PATH = os.path.join(helper.DATA_PATH, "answer_cache.json")
+DEFAULT_TTL = 7 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_SAVE_INTERVAL = 5.0
+
+
+def normalize_query(query: str) -> list[str]:
+    """
+    Normalizes a query with the same cleaning and preprocessing as the docs, so
+    that queries differing only in case, punctuation, stopwords, or inflection
+    share a cache entry.
+
+    Parameters
+    -----------
+        query (str) : user query
+
+    Returns
+    -----------
+        (list[str]) : normalized query tokens
+    """
+    return helper.clean_and_preproc_data(query)
+
+
+def make_cache_key(query: str, doc_names) -> str:
+    """
+    Builds the cache key of a query from its normalized tokens and the set of
+    docs retrieved for it.
+
+    Parameters
+    -----------
+        query (str) : user query
+        doc_names (iterable[str]) : filenames retrieved by semantic search
+
+    Returns
+    -----------
+        (str) : hex digest identifying the query and its retrieved docs
+    """
+    key_data = json.dumps([normalize_query(query), sorted(doc_names)])
+    return hashlib.sha1(key_data.encode()).hexdigest()
+
+
+class AnswerCache:
+    """
+    Persistent, size-bounded LRU cache of Ask PW answers with a time-to-live.
+    The cache is tagged with a version string, e.g. the docs and model
+    fingerprint plus the GPT model name, and is emptied on load whenever the
+    version does not match or the file is malformed.
+
+    Saves are debounced: the first `put` is written right away, and later ones
+    within `save_interval` seconds are batched into one write when the
+    interval ends. Owners call `flush` before exiting so that a pending batch
+    is not lost.
+    """
+    def __init__(self,
+                 cache_path=ANSWER_CACHE_PATH,
+                 version="",
+                 ttl=DEFAULT_TTL,
+                 max_entries=DEFAULT_MAX_ENTRIES,
+                 save_interval=DEFAULT_SAVE_INTERVAL):
+        self.cache_path = cache_path
+        self.version = version
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.save_interval = save_interval
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._last_save = float("-inf")
+        self._save_timer = None
+        self._load()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _load(self):
+        if not os.path.exists(self.cache_path):
+            return
+
+        try:
+            with open(self.cache_path, "r") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if not isinstance(cache, dict) or cache.get("version") != self.version:
+            return
+
+        now = time.time()
+        try:
+            self.entries = OrderedDict((key, entry) for key, entry in cache.get("entries", [])
+                                       if isinstance(entry["answer"], str) and now - entry["created"] < self.ttl)
+        except (KeyError, TypeError, ValueError):
+            self.entries = OrderedDict()
+
+    def save(self):
+        """
+        Atomically writes the cache to disk through a temporary file unique to
+        this write, so that concurrent writers, e.g. the CLI and the search
+        server, never write to the same file. The entries are copied under
+        the lock and written outside it.
+
+        Returns
+        -----------
+            (Does not return a value)
+        """
+        cache_dir = os.path.dirname(self.cache_path)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+
+        with self._save_lock:
+            with self._lock:
+                cache = {"version": self.version, "entries": list(self.entries.items())}
+                self._dirty = False
+                self._last_save = time.monotonic()
+
+            tmp_file = tempfile.NamedTemporaryFile("w", dir=cache_dir or ".", prefix=os.path.basename(self.cache_path),
+                                                   suffix=".tmp", delete=False)
+            try:
+                with tmp_file:
+                    json.dump(cache, tmp_file)
+                os.replace(tmp_file.name, self.cache_path)
+            except BaseException:
+                if os.path.exists(tmp_file.name):
+                    os.remove(tmp_file.name)
+                raise
+
+    def flush(self):
+        """
+        Writes any puts not yet saved to disk.
+
+        Returns
+        -----------
+            (Does not return a value)
+        """
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            dirty = self._dirty
+
+        if dirty:
+            self.save()
+
+    def get(self, query: str, doc_names) -> str:
+        """
+        Looks up the cached answer of a query.
+
+        Parameters
+        -----------
+            query (str) : user query
+            doc_names (iterable[str]) : filenames retrieved by semantic search
+
+        Returns
+        -----------
+            answer (str | None) : cached answer, or None on a miss
+        """
+        key = make_cache_key(query, doc_names)
+
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.time() - entry["created"] >= self.ttl:
+                del self.entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry["answer"]
+
+    def put(self, query: str, doc_names, answer: str):
+        """
+        Stores the answer of a query, evicting the least recently used entries
+        beyond `max_entries`, and persists the cache, right away if it was not
+        saved within `save_interval` seconds and otherwise once the interval
+        ends.
+
+        Parameters
+        -----------
+            query (str) : user query
+            doc_names (iterable[str]) : filenames retrieved by semantic search
+            answer (str) : answer to cache
+
+        Returns
+        -----------
+            (Does not return a value)
+        """
+        key = make_cache_key(query, doc_names)
+
+        with self._lock:
+            self.entries[key] = {"answer": answer, "created": time.time()}
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self._dirty = True
+
+            if self._save_timer is not None:
+                return
+            delay = self._last_save + self.save_interval - time.monotonic()
+            if delay > 0:
+                self._save_timer = threading.Timer(delay, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+                return
+
+        self.save()
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self._dirty = True
+        self.flush()
+
+    def stats(self) -> dict:
+        """
+        Reports the cache size and hit rate since the cache was loaded.
+
+        Returns
+        -----------
+            (dict) : entries, hits, misses, and hit_rate
+        """
+        lookups = self.hits + self.misses
+        return {"entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
@@ -0,0 +1,230 @@
+import sys
+import time
+import random
+import asyncio
+import threading
+import numpy as np
+import aiohttp
+import openai
+
+import helper_funcs as helper
+import run_gpt
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF_BASE = 1.0
+DEFAULT_BACKOFF_MAX = 30.0
+# Deltas buffered per stream before a slow consumer pauses reading the reply
+STREAM_QUEUE_SIZE = 64
+
+RETRYABLE_ERRORS = (openai.error.RateLimitError,
+                    openai.error.ServiceUnavailableError,
+                    openai.error.APIConnectionError,
+                    openai.error.Timeout,
+                    openai.error.TryAgain)
+
+
+class AsyncGPTClient:
+    """
+    Asyncio GPT client which streams completions over one pooled HTTP session,
+    limits the number of requests in flight, and retries rate-limited or
+    transiently failing requests with jittered exponential backoff.
+    """
+    def __init__(self,
+                 api_key=None,
+                 api_base=None,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 max_retries=DEFAULT_MAX_RETRIES,
+                 backoff_base=DEFAULT_BACKOFF_BASE,
+                 backoff_max=DEFAULT_BACKOFF_MAX):
+        self.api_key = api_key
+        self.api_base = api_base
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._session = None
+        self._semaphore = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        return self._session
+
+    def _backoff_delay(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        return delay * (0.5 + random.random() / 2)
+
+    async def stream_chat(self, query: str, formatted_docs: str):
+        """
+        Streams the GPT reply to a query as it is generated. Requests that fail
+        with a retryable error before the first token are retried with backoff.
+
+        Parameters
+        -----------
+            query (str) : inputted query from user
+            formatted_docs (str) : json-formatted dictionary containing file and
+                    content info from semantic search
+
+        Returns
+        -----------
+            (async generator[str]) : text deltas of the reply
+        """
+        openai.aiosession.set(self._get_session())
+        api_key = self.api_key or helper.get_api_key()
+
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = await openai.ChatCompletion.acreate(model=run_gpt.GPT_MODEL,
+                                                                   messages=run_gpt.build_gpt_messages(query, formatted_docs),
+                                                                   stream=True,
+                                                                   api_key=api_key,
+                                                                   api_base=self.api_base)
+                    break
+                except RETRYABLE_ERRORS:
+                    if attempt == self.max_retries:
+                        raise
+                    await asyncio.sleep(self._backoff_delay(attempt))
+
+            try:
+                async for chunk in response:
+                    delta = chunk.choices[0].get("delta", {}).get("content")
+                    if delta:
+                        yield delta
+            finally:
+                # Close the HTTP response now rather than when the generator is
+                # garbage collected, e.g. when the consumer is cancelled
+                await response.aclose()
+
+    async def complete(self, query: str, formatted_docs: str) -> str:
+        """
+        Runs GPT on a query and returns the full reply.
+        """
+        return "".join([delta async for delta in self.stream_chat(query, formatted_docs)])
+
+    async def complete_many(self, requests: list[tuple]) -> list[str]:
+        """
+        Runs GPT on many (query, formatted_docs) pairs concurrently, at most
+        `max_concurrency` at a time.
+
+        Parameters
+        -----------
+            requests (list[tuple]) : (query, formatted_docs) pairs
+
+        Returns
+        -----------
+            replies (list[str]) : GPT reply to each request, in order
+        """
+        self._get_session()
+        return await asyncio.gather(*(self.complete(query, docs) for query, docs in requests))
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+class BackgroundGPTStreamer:
+    """
+    Runs an AsyncGPTClient on an event loop in a background thread, so that
+    synchronous code such as the threaded search server can share its pooled
+    session and consume streamed replies as plain iterators.
+    """
+    def __init__(self, client=None):
+        self.client = client or AsyncGPTClient()
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def stream(self, query: str, formatted_docs: str):
+        """
+        Streams the GPT reply to a query from the background event loop.
+
+        Parameters
+        -----------
+            query (str) : inputted query from user
+            formatted_docs (str) : json-formatted dictionary containing file and
+                    content info from semantic search
+
+        Returns
+        -----------
+            (generator[str]) : text deltas of the reply. Closing the generator
+                    early cancels the request and releases its concurrency slot.
+        """
+        # Only touched from the event loop, so that a full queue pauses the relay
+        # without blocking the other streams sharing the loop
+        deltas = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        done = object()
+
+        async def relay():
+            try:
+                async for delta in self.client.stream_chat(query, formatted_docs):
+                    await deltas.put(delta)
+            except Exception as e:
+                await deltas.put(e)
+            else:
+                await deltas.put(done)
+
+        future = asyncio.run_coroutine_threadsafe(relay(), self.loop)
+
+        try:
+            while (item := asyncio.run_coroutine_threadsafe(deltas.get(), self.loop).result()) is not done:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self.loop.call_soon_threadsafe(future.cancel)
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.client.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+async def measure_streaming(api_base: str, num_requests: int, max_concurrency: int) -> dict:
+    """
+    Measures time-to-first-token and total latency of concurrent streamed
+    requests, e.g. against `fake_completion_server.py`.
+    """
+    client = AsyncGPTClient(api_key="fake-key", api_base=api_base, max_concurrency=max_concurrency)
+    client._get_session()
+
+    async def timed_request(i):
+        start = time.perf_counter()
+        first_token_s = None
+        async for _ in client.stream_chat(f"question {i}", "{}"):
+            if first_token_s is None:
+                first_token_s = time.perf_counter() - start
+        return first_token_s, time.perf_counter() - start
+
+    start = time.perf_counter()
+    timings = await asyncio.gather(*(timed_request(i) for i in range(num_requests)))
+    wall_s = time.perf_counter() - start
+    await client.close()
+
+    ttft_ms, total_ms = np.array(timings).T * 1000
+
+    return {"num_requests": num_requests,
+            "max_concurrency": max_concurrency,
+            "ttft_p50_ms": round(float(np.percentile(ttft_ms, 50)), 1),
+            "ttft_p95_ms": round(float(np.percentile(ttft_ms, 95)), 1),
+            "total_p50_ms": round(float(np.percentile(total_ms, 50)), 1),
+            "wall_s": round(wall_s, 3)}
+
+
+def main():
+    """
+    Main execution function for measuring streamed GPT latency.
+    Usage: python async_gpt.py [api_base] [num_requests] [max_concurrency]
+    """
+    api_base = sys.argv[1] if len(sys.argv) >= 2 else "http://127.0.0.1:8799/v1"
+    num_requests = int(sys.argv[2]) if len(sys.argv) >= 3 else 20
+    max_concurrency = int(sys.argv[3]) if len(sys.argv) >= 4 else DEFAULT_MAX_CONCURRENCY
+
+    print(asyncio.run(measure_streaming(api_base, num_requests, max_concurrency)))
+
+
+if __name__ == "__main__":
+    main()
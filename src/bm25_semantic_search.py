@@ -0,0 +1,331 @@
+import os
+import json
+import numpy as np
+
+import helper_funcs as helper
+import metrics
+
+INDPTR_FILE = "indptr.npy"
+DOC_INDICES_FILE = "doc_indices.npy"
+TERM_FREQS_FILE = "term_freqs.npy"
+DOC_LENGTHS_FILE = "doc_lengths.npy"
+MAX_SCORES_FILE = "max_scores.npy"
+META_FILE = "bm25_meta.json"
+
+
+class BM25Index:
+    """
+    BM25 lexical retrieval engine over a compact inverted index. The postings
+    of every term are stored contiguously in flat arrays, CSR-style: `indptr`
+    delimits each term's slice of `doc_indices` and `term_freqs`, and the doc
+    indices within a slice are sorted. Top-k retrieval uses MaxScore-style
+    early termination on per-term score upper bounds.
+    """
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocab = {}
+        self.doc_ids = []
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.doc_indices = np.empty(0, dtype=np.int32)
+        self.term_freqs = np.empty(0, dtype=np.int32)
+        self.doc_lengths = np.empty(0, dtype=np.int32)
+        self.max_scores = np.empty(0, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def build(self, preproc_docs: dict):
+        """
+        Builds the inverted index from preprocessed docs.
+
+        Parameters
+        -----------
+            preproc_docs (dict | helper.StreamingCorpus): preprocessed documents,
+                    keyed by filename with values corresponding to the file
+                    content in tokenized form
+
+        Returns
+        -----------
+            self (BM25Index) : the built index
+        """
+        vocab = {}
+        doc_ids, doc_lengths = [], []
+        posting_terms, posting_docs, posting_freqs = [], [], []
+
+        for doc_index, (filename, tokens) in enumerate(preproc_docs.items()):
+            doc_ids.append(filename)
+            doc_lengths.append(len(tokens))
+
+            term_ids = np.fromiter((vocab.setdefault(token, len(vocab)) for token in tokens),
+                                   dtype=np.int32, count=len(tokens))
+            unique_terms, counts = np.unique(term_ids, return_counts=True)
+            posting_terms.append(unique_terms)
+            posting_docs.append(np.full(len(unique_terms), doc_index, dtype=np.int32))
+            posting_freqs.append(counts.astype(np.int32))
+
+        terms = np.concatenate(posting_terms) if posting_terms else np.empty(0, dtype=np.int32)
+        order = np.argsort(terms, kind='stable')
+
+        self.vocab = vocab
+        self.doc_ids = doc_ids
+        self.doc_lengths = np.array(doc_lengths, dtype=np.int32)
+        self.doc_indices = np.concatenate(posting_docs)[order] if posting_docs else self.doc_indices
+        self.term_freqs = np.concatenate(posting_freqs)[order] if posting_freqs else self.term_freqs
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(terms, minlength=len(vocab)))]).astype(np.int64)
+        self.max_scores = self._compute_max_scores()
+
+        return self
+
+    @property
+    def avg_doc_length(self) -> float:
+        return float(np.mean(self.doc_lengths)) if len(self.doc_lengths) else 0.0
+
+    def _idf(self, doc_freqs: np.ndarray) -> np.ndarray:
+        num_docs = len(self.doc_ids)
+        return np.log1p((num_docs - doc_freqs + 0.5) / (doc_freqs + 0.5))
+
+    def _posting_scores(self, term_id: int, positions: np.ndarray) -> np.ndarray:
+        """
+        Computes the BM25 contribution of one term for a subset of its postings.
+
+        Parameters
+        -----------
+            term_id (int) : id of the term
+            positions (np.ndarray) : absolute positions into the postings arrays
+
+        Returns
+        -----------
+            (np.ndarray) : BM25 term scores of the selected postings
+        """
+        start, end = self.indptr[term_id], self.indptr[term_id + 1]
+        idf = self._idf(end - start)
+
+        tf = self.term_freqs[positions].astype(np.float32)
+        doc_lengths = self.doc_lengths[self.doc_indices[positions]]
+        norm = self.k1 * (1 - self.b + self.b * doc_lengths / max(self.avg_doc_length, 1e-9))
+
+        return idf * tf * (self.k1 + 1) / (tf + norm)
+
+    def _compute_max_scores(self) -> np.ndarray:
+        if len(self.term_freqs) == 0:
+            return np.zeros(len(self.vocab), dtype=np.float32)
+
+        doc_freqs = np.diff(self.indptr)
+        idf = np.repeat(self._idf(doc_freqs), doc_freqs)
+        tf = self.term_freqs.astype(np.float32)
+        doc_lengths = self.doc_lengths[self.doc_indices]
+        norm = self.k1 * (1 - self.b + self.b * doc_lengths / max(self.avg_doc_length, 1e-9))
+        posting_scores = idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return np.maximum.reduceat(posting_scores, self.indptr[:-1]).astype(np.float32)
+
+    def search(self, query_tokens: list[str], top_k=5) -> list[tuple]:
+        """
+        Finds the top 'k' documents for preprocessed query tokens.
+
+        Query terms are processed from the highest to the lowest score upper
+        bound. Once the summed upper bounds of the remaining terms can no longer
+        lift an unseen document above the current k-th best score, the remaining
+        terms are only probed for the existing candidates instead of having
+        their full postings merged, and candidates that can no longer reach the
+        top 'k' are dropped.
+
+        Parameters
+        -----------
+            query_tokens (list[str]) : preprocessed query tokens
+            top_k (int) : number of docs to return (default: 5)
+
+        Returns
+        -----------
+            results (list[tuple]) : (filename, BM25 score) of the best docs, best first
+        """
+        term_ids = np.array(sorted({self.vocab[token] for token in query_tokens if token in self.vocab}),
+                            dtype=np.int64)
+        if len(term_ids) == 0 or top_k <= 0:
+            return []
+
+        term_ids = term_ids[np.argsort(-self.max_scores[term_ids], kind='stable')]
+        remaining_bounds = np.cumsum(self.max_scores[term_ids][::-1])[::-1]
+
+        candidates = np.empty(0, dtype=np.int32)
+        scores = np.empty(0, dtype=np.float64)
+
+        for i, term_id in enumerate(term_ids):
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            threshold = np.partition(scores, -top_k)[-top_k] if len(scores) >= top_k else 0.0
+
+            if len(scores) >= top_k and remaining_bounds[i] <= threshold:
+                keep = scores + remaining_bounds[i] >= threshold
+                candidates, scores = candidates[keep], scores[keep]
+
+                positions = start + np.searchsorted(self.doc_indices[start:end], candidates)
+                found = positions < end
+                found[found] = self.doc_indices[positions[found]] == candidates[found]
+                scores[found] += self._posting_scores(term_id, positions[found])
+            else:
+                positions = np.arange(start, end)
+                merged_docs = np.concatenate([candidates, self.doc_indices[start:end]])
+                merged_scores = np.concatenate([scores, self._posting_scores(term_id, positions)])
+                candidates, inverse = np.unique(merged_docs, return_inverse=True)
+                scores = np.bincount(inverse, weights=merged_scores)
+
+        best_indices = helper.top_k_indices(scores, top_k)
+        metrics.inc("docs_scored", len(candidates))
+
+        return [(self.doc_ids[candidates[i]], scores[i]) for i in best_indices]
+
+    def save(self, index_dir: str):
+        """
+        Saves the index into a directory as flat `.npy` arrays plus a JSON file
+        holding the vocabulary, doc ids, and BM25 parameters.
+
+        Parameters
+        -----------
+            index_dir (str) : directory to save the index into
+
+        Returns
+        -----------
+            (Does not return a value)
+        """
+        if not os.path.exists(index_dir):
+            os.makedirs(index_dir)
+
+        arrays = {INDPTR_FILE: self.indptr,
+                  DOC_INDICES_FILE: self.doc_indices,
+                  TERM_FREQS_FILE: self.term_freqs,
+                  DOC_LENGTHS_FILE: self.doc_lengths,
+                  MAX_SCORES_FILE: self.max_scores}
+        for filename, array in arrays.items():
+            np.save(os.path.join(index_dir, filename), array)
+
+        with open(os.path.join(index_dir, META_FILE), "w") as f:
+            json.dump({"k1": self.k1,
+                       "b": self.b,
+                       "terms": list(self.vocab.keys()),
+                       "doc_ids": self.doc_ids}, f)
+
+
+def load_index(index_dir=os.path.join(helper.MODEL_PATH, "bm25_index"), mmap_mode='r') -> BM25Index:
+    """
+    Loads a saved BM25 index, memory-mapping its postings arrays by default.
+
+    Parameters
+    -----------
+        index_dir (str) : directory the index was saved into
+        mmap_mode (str | None) : `np.load` memory-map mode for the arrays
+
+    Returns
+    -----------
+        index (BM25Index) : loaded BM25 index
+    """
+    meta_path = os.path.join(index_dir, META_FILE)
+    if not os.path.exists(meta_path):
+        raise FileNotFoundError(f"The BM25 index '{index_dir}' does not exist.")
+
+    with open(meta_path, "r") as f:
+        meta = json.load(f)
+
+    index = BM25Index(k1=meta["k1"], b=meta["b"])
+    index.vocab = {term: i for i, term in enumerate(meta["terms"])}
+    index.doc_ids = meta["doc_ids"]
+    index.indptr = np.load(os.path.join(index_dir, INDPTR_FILE), mmap_mode=mmap_mode)
+    index.doc_indices = np.load(os.path.join(index_dir, DOC_INDICES_FILE), mmap_mode=mmap_mode)
+    index.term_freqs = np.load(os.path.join(index_dir, TERM_FREQS_FILE), mmap_mode=mmap_mode)
+    index.doc_lengths = np.load(os.path.join(index_dir, DOC_LENGTHS_FILE), mmap_mode=mmap_mode)
+    index.max_scores = np.load(os.path.join(index_dir, MAX_SCORES_FILE), mmap_mode=mmap_mode)
+
+    return index
+
+
+def semantic_search(query: str, bm25_index: BM25Index, top_k=5, query_tokens=None) -> list[tuple]:
+    """
+    Runs a BM25 search with a query on the indexed docs.
+
+    Parameters
+    -----------
+        query (str): the query string
+        bm25_index (BM25Index): the BM25 index over the docs
+        top_k (int): number of docs to return (default: 5)
+        query_tokens (list[str] | None): the query already preprocessed with
+                `helper_funcs.preprocess_query`, to skip preprocessing it again
+
+    Returns
+    -----------
+        results (list): List of tuples containing similar documents and their BM25 scores
+    """
+    if query_tokens is None:
+        query_tokens = helper.preprocess_query(query)
+    with metrics.span("score_docs"):
+        return bm25_index.search(query_tokens, top_k)
+
+def semantic_search_batch(queries: list[str], bm25_index: BM25Index, top_k=5) -> list[list[tuple]]:
+    """
+    Runs a BM25 search for a batch of queries. Each distinct query is
+    preprocessed and scored only once.
+
+    Parameters
+    -----------
+        queries (list[str]): the query strings
+        bm25_index (BM25Index): the BM25 index over the docs
+        top_k (int): number of docs to return per query (default: 5)
+
+    Returns
+    -----------
+        batch_docs (list[list[tuple]]): (filename, BM25 score) of the best docs
+                for each query, empty for queries matching nothing
+    """
+    unique_queries = list(dict.fromkeys(queries))
+    unique_tokens = [helper.preprocess_query(query) for query in unique_queries]
+    with metrics.span("score_docs"):
+        results = {query: bm25_index.search(query_tokens, top_k)
+                   for query, query_tokens in zip(unique_queries, unique_tokens)}
+
+    return [results[query] for query in queries]
+
+
+def get_relevant_files(query: str,
+                       bm25_index: BM25Index,
+                       top_k=5,
+                       include_score=False,
+                       verbose=False,
+                       query_tokens=None) -> list[str]:
+    """
+    Gets the top 'k' relevant files from an inputted query. Defaults to top
+    5 most relevant files.
+
+    Parameters
+    -----------
+        query (str) : question to search PW documentation for
+        bm25_index (BM25Index): the BM25 index over the docs
+        top_k (int) : top 'k' most relevant files to return (default: 5)
+        include_score (bool) : if True, includes similarity score of file
+        verbose (bool) : if True, prints files in addition to returning
+        query_tokens (list[str] | None) : the query already preprocessed with
+                `helper_funcs.preprocess_query`, to skip preprocessing it again
+
+    Returns
+    -----------
+        rel_files (list) : top 'k' most relevant files
+    """
+    similar_docs = semantic_search(query, bm25_index, top_k, query_tokens)
+
+    if not similar_docs:
+        print("Your query does not match anything in our system.")
+        return []
+
+    if include_score:
+        rel_files = similar_docs
+        if verbose:
+            print(f"Top {top_k} most relevant files to your query with similarity scores included:\n")
+            for i, (file, sim_score) in enumerate(rel_files):
+                print(f"{i + 1}. {file}: {sim_score}")
+        return rel_files
+    else:
+        rel_files = [filename for filename, _ in similar_docs]
+        if verbose:
+            print(f"Top {top_k} most relevant files to your query:\n")
+            for i, file in enumerate(rel_files):
+                print(f"{i + 1}. {file}")
+
+    return rel_files
@@ -0,0 +1,114 @@
+import os
+import sys
+import time
+import tempfile
+
+import doc_reader as reader
+import md_cleaner as cleaner
+import md_preprocessor as preprocessor
+import helper_funcs as helper
+
+DEFAULT_REPEATS = 5
+SYNTHETIC_NUM_DOCS = 500
+
+# Inputs which exercise the corners of the cleaning steps: Unicode whitespace
+# and punctuation, characters whose lowercase form changes length or becomes
+# ASCII, punctuation-only tokens which leave double spaces behind, and sidebar
+# positioning labels which only appear once punctuation is removed.
+EDGE_CASES = ["",
+              "   ",
+              "Hello,  World!\tHow's it\n\ngoing?",
+              "a - b -- c --- d",
+              "- leading and trailing -",
+              "sidebar_position: 3\nTitle",
+              "sidebar_position 12 sidebar_position sidebar_position:",
+              "sidebar-_position: 4 x",
+              "İstanbul ǅemal KÅ ß Σίσυφος",
+              "naïve café, “quoted” – dash — em … ellipsis ½ ① ™ ©",
+              "no break em line\x1cfile\x1fsep\x85nel",
+              "snake_case __dunder__ under_score_ _",
+              "mixed123 numbers 4.5 6,7 1e-3 #hash @at $dollar %pct",
+              "can't won't cannot gonna gimme wanna y'all o'clock",
+              "tabs\tand\u000bvertical\u000cfeeds\rreturns"]
+
+
+def load_texts(docs_path: str) -> list[str]:
+    """
+    Loads the converted text of every doc, or of a generated synthetic corpus
+    if the docs are not available, followed by the EDGE_CASES.
+
+    Parameters
+    -----------
+        docs_path (str) : path to documentation folder
+
+    Returns
+    -----------
+        texts (list[str]) : texts to clean
+    """
+    if os.path.isdir(docs_path):
+        texts = list(reader.collect_doc_data(docs_path).values())
+    else:
+        import pipeline_benchmark
+
+        print(f"No docs at {docs_path}, using a synthetic corpus of {SYNTHETIC_NUM_DOCS} docs.")
+        with tempfile.TemporaryDirectory() as directory:
+            pipeline_benchmark.make_synthetic_corpus(directory, SYNTHETIC_NUM_DOCS)
+            texts = list(reader.collect_doc_data(directory).values())
+
+    return texts + EDGE_CASES
+
+def measure_throughput(func, texts: list[str], repeats=DEFAULT_REPEATS) -> float:
+    """
+    Measures the throughput of a string function over texts, taking the best
+    of several repeats.
+
+    Parameters
+    -----------
+        func (callable) : function applied to each text
+        texts (list[str]) : input texts
+        repeats (int) : number of timed passes over the texts
+
+    Returns
+    -----------
+        (float) : throughput in MB of input text per second
+    """
+    num_mb = sum(len(text) for text in texts) / 1e6
+
+    best_s = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for text in texts:
+            func(text)
+        best_s = min(best_s, time.perf_counter() - start)
+
+    return num_mb / best_s if best_s > 0 else float("inf")
+
+def main():
+    """
+    Main execution function for measuring the speedup of the fused cleaning
+    path over the stepwise one. Their outputs are checked to match by
+    tests/test_md_cleaner.py.
+    Usage: python cleaner_benchmark.py [docs] [repeats]
+    """
+    docs_path = os.path.join(helper.DATA_PATH, sys.argv[1] if len(sys.argv) >= 2 else "docs")
+    repeats = int(sys.argv[2]) if len(sys.argv) >= 3 else DEFAULT_REPEATS
+
+    helper.check_nltk_data()
+    texts = load_texts(docs_path)
+    cleaned_texts = [cleaner.clean_str(text) for text in texts]
+    rows = [("clean_str", cleaner.clean_str_stepwise, cleaner.clean_str, texts),
+            ("preprocess_str", preprocessor.preprocess_str_stepwise, preprocessor.preprocess_str, cleaned_texts),
+            ("clean + preprocess",
+             lambda text: preprocessor.preprocess_str_stepwise(cleaner.clean_str_stepwise(text)),
+             lambda text: preprocessor.preprocess_str(cleaner.clean_str(text)),
+             texts)]
+
+    print(f"{'stage':<22}{'stepwise MB/s':>16}{'fused MB/s':>14}{'speedup':>10}")
+    for name, stepwise_func, fused_func, inputs in rows:
+        stepwise = measure_throughput(stepwise_func, inputs, repeats)
+        fused = measure_throughput(fused_func, inputs, repeats)
+        print(f"{name:<22}{stepwise:>16.1f}{fused:>14.1f}{fused / stepwise:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
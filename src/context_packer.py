@@ -0,0 +1,145 @@
+import json
+import logging
+from functools import lru_cache
+
+GPT_ENCODING = "cl100k_base"
+CHARS_PER_TOKEN = 4
+COST_CACHE_SIZE = 4096
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def get_encoding():
+    """
+    Loads the local `tiktoken` BPE encoding used by gpt-3.5-turbo, or returns
+    None if `tiktoken` or its encoding files are unavailable, in which case
+    token counts fall back to a characters-per-token estimate. The fallback
+    is logged once, since the estimate can overrun the model's context window.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        logger.warning("tiktoken is not installed, estimating GPT token counts "
+                       "as %d characters per token", CHARS_PER_TOKEN)
+        return None
+
+    try:
+        return tiktoken.get_encoding(GPT_ENCODING)
+    except (OSError, ValueError) as e:
+        logger.warning("Could not load the %s tiktoken encoding (%s), estimating GPT token "
+                       "counts as %d characters per token", GPT_ENCODING, e, CHARS_PER_TOKEN)
+        return None
+
+def count_tokens(text: str) -> int:
+    """
+    Counts the GPT tokens of a string.
+
+    Parameters
+    -----------
+        text (str) : text to count
+
+    Returns
+    -----------
+        (int) : number of tokens, exact with `tiktoken` and estimated otherwise
+    """
+    encoding = get_encoding()
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+
+    return len(encoding.encode(text))
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cuts a string down to at most `max_tokens` tokens.
+
+    Parameters
+    -----------
+        text (str) : text to truncate
+        max_tokens (int) : token budget for the text
+
+    Returns
+    -----------
+        (str) : longest prefix of the text that fits in the budget
+    """
+    if max_tokens <= 0:
+        return ""
+
+    encoding = get_encoding()
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+
+    return encoding.decode(encoding.encode(text)[:max_tokens])
+
+def _entry_cost(filename: str, text: str) -> int:
+    return count_tokens(f"{json.dumps(filename)}: {json.dumps(text)}, ")
+
+# Only whole documents go through the cache, so that the prefixes tried while
+# truncating do not evict them
+_doc_cost = lru_cache(maxsize=COST_CACHE_SIZE)(_entry_cost)
+
+def _truncate_entry(filename: str, text: str, max_cost: int) -> str:
+    """
+    Finds the longest token prefix of a doc whose entry fits in the budget.
+    JSON escaping can make a prefix cost more than its raw token count, so
+    the prefix length is binary searched on the serialized entry cost.
+
+    Parameters
+    -----------
+        filename (str) : filename of the doc
+        text (str) : content of the doc
+        max_cost (int) : token budget for the entry
+
+    Returns
+    -----------
+        (str) : longest prefix that fits, or "" if none does
+    """
+    low, high = 0, max_cost - _entry_cost(filename, "")
+    best = ""
+    while low <= high:
+        mid = (low + high) // 2
+        truncated = truncate_to_tokens(text, mid)
+        if _entry_cost(filename, truncated) <= max_cost:
+            best, low = truncated, mid + 1
+        else:
+            high = mid - 1
+
+    return best
+
+def pack_context(gpt_docs: dict, max_tokens: int) -> str:
+    """
+    Packs documents into a json-formatted dictionary that stays within a token
+    budget. Docs are taken greedily in their given (relevance) order, each
+    doc's token cost is computed once and cached, the first doc that does not
+    fit is truncated to the longest prefix that fills the remaining budget,
+    and the payload is serialized a single time at the end.
+
+    Parameters
+    -----------
+        gpt_docs (dict) : documents keyed by filename, valued with lists of
+                string tokens, most relevant first
+        max_tokens (int) : token budget for the whole payload
+
+    Returns
+    -----------
+        gpt_input (str) : json-formatted dictionary keyed by filename with the
+                content joined into strings
+    """
+    remaining = max_tokens - count_tokens("{}")
+    packed = {}
+
+    for filename, content in gpt_docs.items():
+        text = " ".join(content)
+        cost = _doc_cost(filename, text)
+
+        if cost <= remaining:
+            packed[filename] = text
+            remaining -= cost
+            continue
+
+        truncated = _truncate_entry(filename, text, remaining)
+        if truncated:
+            packed[filename] = truncated
+        break
+
+    return json.dumps(packed)
@@ -0,0 +1,142 @@
+import os
+import hashlib
+import pickle
+
+import doc_reader as reader
+import md_preprocessor as preprocessor
+import parallel_ingest as ingest
+
+CACHE_VERSION = 1
+
+
+def _load_cache(directory: str, cache_path: str) -> dict:
+    """
+    Loads the per-file token cache from disk, discarding it if it is missing,
+    unreadable, was written by a different cache version or tokenizer, or
+    belongs to a different documentation directory.
+
+    Parameters
+    -----------
+        directory (str) : documentation directory the cache should belong to
+        cache_path (str) : path to the cache file
+
+    Returns
+    -----------
+        entries (dict) : cache entries keyed by relative file path
+    """
+    if not os.path.exists(cache_path):
+        return {}
+
+    try:
+        with open(cache_path, 'rb') as f:
+            cache = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return {}
+
+    if not isinstance(cache, dict) or cache.get("version") != CACHE_VERSION:
+        return {}
+
+    if cache.get("tokenizer", "nltk") != preprocessor.TOKENIZER:
+        return {}
+
+    if cache.get("directory") != os.path.abspath(directory):
+        return {}
+
+    return cache.get("entries", {})
+
+
+def _save_cache(entries: dict, directory: str, cache_path: str):
+    """
+    Atomically writes the per-file token cache to disk.
+
+    Parameters
+    -----------
+        entries (dict) : cache entries keyed by relative file path
+        directory (str) : documentation directory the entries belong to
+        cache_path (str) : path to the cache file
+
+    Returns
+    -----------
+        (Does not return a value)
+    """
+    cache_dir = os.path.dirname(cache_path)
+    if cache_dir and not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({"version": CACHE_VERSION,
+                     "tokenizer": preprocessor.TOKENIZER,
+                     "directory": os.path.abspath(directory),
+                     "entries": entries}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+
+
+def load_preproc_docs(directory: str, cache_path: str, workers=1, verbose=False) -> dict:
+    """
+    Reads, cleans, and preprocesses all `.md` files in a directory, reusing the
+    tokens stored in an on-disk cache for every file that has not changed.
+
+    A file is reused without being read if its modification time and size
+    match the cache entry, and without being re-parsed if its content hash
+    matches. Only added or modified files go through the markdown, cleaning,
+    and preprocessing stages, and entries for deleted files are dropped.
+
+    Parameters
+    -----------
+        directory (str) : directory to scan through
+        cache_path (str) : path to the cache file
+        workers (int | None) : number of worker processes used to process
+                changed files, all CPU cores if None
+        verbose (bool) : if True, prints how many files were reprocessed
+
+    Returns
+    -----------
+        preproc_docs (dict) : preprocessed documentation data keyed by filename
+    """
+    old_entries = _load_cache(directory, cache_path)
+    new_entries = {}
+    md_files = []
+    to_process = []
+
+    for file_path, file in ingest.list_md_files(directory):
+        rel_path = os.path.relpath(file_path, directory)
+        stat = os.stat(file_path)
+        entry = old_entries.get(rel_path)
+        md_files.append((rel_path, file))
+
+        if entry is not None and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            new_entries[rel_path] = entry
+            continue
+
+        with open(file_path, 'rb') as f:
+            raw = f.read()
+        content_hash = hashlib.sha1(raw).hexdigest()
+        new_entry = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha1": content_hash}
+
+        if entry is not None and entry["sha1"] == content_hash:
+            new_entry["tokens"] = entry["tokens"]
+            new_entries[rel_path] = new_entry
+        else:
+            to_process.append((rel_path, new_entry, file_path, raw))
+
+    results = ingest.process_documents([(file_path, content) for _, _, file_path, content in to_process], workers)
+    for (rel_path, new_entry, _, _), tokens in zip(to_process, results):
+        if tokens is not None:
+            new_entry["tokens"] = tokens
+            new_entries[rel_path] = new_entry
+
+    preproc_docs = {}
+    for rel_path, file in md_files:
+        if rel_path in new_entries:
+            preproc_docs[reader.convert_filename(file)] = new_entries[rel_path]["tokens"]
+
+    cache_changed = new_entries.keys() != old_entries.keys() or any(
+        new_entries[path] is not old_entries[path] for path in new_entries)
+    if cache_changed:
+        _save_cache(new_entries, directory, cache_path)
+
+    if verbose:
+        print(f"Reprocessed {len(to_process)} of {len(md_files)} documentation files.")
+
+    return preproc_docs
@@ -0,0 +1,50 @@
+import sys
+import os
+
+import helper_funcs as helper
+from bm25_semantic_search import BM25Index
+
+SUPER_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH = os.path.join(SUPER_PATH, "data")
+MODEL_PATH = os.path.join(SUPER_PATH, "models")
+PREPROC_CACHE_PATH = os.path.join(DATA_PATH, "preproc_cache.pkl")
+
+def create_index(docs, workers=None, stream=False):
+    """
+    Builds a BM25 index on inputted documents.
+
+    Parameters
+    -----------
+        docs (str) : path to documentation folder
+        workers (int | None) : number of worker processes used to ingest the
+                docs, all CPU cores if None
+        stream (bool) : if True, streams the docs into the index one at a time
+                instead of loading the whole preprocessed corpus first
+    """
+    helper.check_nltk_data()
+
+    if stream:
+        preproc_docs = helper.StreamingCorpus(docs)
+    else:
+        preproc_docs = helper.read_clean_process_data(docs, cache_path=PREPROC_CACHE_PATH, workers=workers)
+
+    return BM25Index().build(preproc_docs)
+
+def main():
+    """
+    Main execution function for creating the BM25 index.
+    Usage: python create_bm25_model.py [docs] [workers] [--stream]
+    """
+    args = [arg for arg in sys.argv[1:] if arg != "--stream"]
+    stream = len(args) < len(sys.argv) - 1
+
+    input_docs_path = args[0] if len(args) >= 1 else "docs"
+    docs_path = os.path.join(DATA_PATH, input_docs_path)
+    workers = int(args[1]) if len(args) >= 2 else None
+    bm25_index = create_index(docs_path, workers, stream)
+
+    bm25_index.save(os.path.join(MODEL_PATH, "bm25_index"))
+
+
+if __name__ == "__main__":
+    main()
@@ -13,32 +13,49 @@ import helper_funcs as helper
 SUPER_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_PATH = os.path.join(SUPER_PATH, "data")
 MODEL_PATH = os.path.join(SUPER_PATH, "models")
+PREPROC_CACHE_PATH = os.path.join(DATA_PATH, "preproc_cache.pkl")
 
-def initialize_vectorizer(docs):
+def initialize_vectorizer(docs, workers=None, stream=False):
     """
     Initializes a TF-IDF vectorizer model on inputted documents.
+
+    Parameters
+    -----------
+        docs (str) : path to documentation folder
+        workers (int | None) : number of worker processes used to ingest the
+                docs, all CPU cores if None
+        stream (bool) : if True, streams the docs into the vectorizer one at a
+                time instead of loading the whole preprocessed corpus first
     """
     helper.check_nltk_data()
 
-    preproc_docs = helper.read_clean_process_data(docs)
+    if stream:
+        tokenized_corpus = helper.StreamingCorpus(docs)
+    else:
+        preproc_docs = helper.read_clean_process_data(docs, cache_path=PREPROC_CACHE_PATH, workers=workers)
+        tokenized_corpus = preproc_docs.values()
 
     vectorizer = TfidfVectorizer(sublinear_tf=True, stop_words='english')
 
-    tokenized_corpus = list(preproc_docs.values())
-    corpus = [' '.join(tokens) for tokens in tokenized_corpus]
+    corpus = (' '.join(tokens) for tokens in tokenized_corpus)
 
     tfidf_matrix = vectorizer.fit_transform(corpus)
 
     return vectorizer, tfidf_matrix
 
-def main():
-    """
-    Main execution function for creating the TF-IDF model.
+def save_vectorizer(vectorizer, tfidf_matrix):
     """
-    input_docs_path = sys.argv[1] if len(sys.argv) >= 2 else "docs"
-    docs_path = os.path.join(DATA_PATH, input_docs_path)
-    vectorizer, tfidf_matrix = initialize_vectorizer(docs_path)
+    Saves the TF-IDF vectorizer and matrix into the models folder.
+
+    Parameters
+    -----------
+        vectorizer (TfidfVectorizer) : fitted TF-IDF vectorizer
+        tfidf_matrix (scipy.sparse.csr_matrix) : TF-IDF matrix of the docs
 
+    Returns
+    -----------
+        (Does not return a value)
+    """
     if not os.path.exists(MODEL_PATH):
         os.makedirs(MODEL_PATH)
 
@@ -48,6 +65,21 @@ def main():
     with open(os.path.join(MODEL_PATH, "tfidf_matrix.pkl"), "wb") as f:
         pickle.dump(tfidf_matrix, f)
 
+def main():
+    """
+    Main execution function for creating the TF-IDF model.
+    Usage: python create_tfidf_model.py [docs] [workers] [--stream]
+    """
+    args = [arg for arg in sys.argv[1:] if arg != "--stream"]
+    stream = len(args) < len(sys.argv) - 1
+
+    input_docs_path = args[0] if len(args) >= 1 else "docs"
+    docs_path = os.path.join(DATA_PATH, input_docs_path)
+    workers = int(args[1]) if len(args) >= 2 else None
+    vectorizer, tfidf_matrix = initialize_vectorizer(docs_path, workers, stream)
+
+    save_vectorizer(vectorizer, tfidf_matrix)
+
 
 if __name__ == "__main__":
     main()
@@ -5,55 +5,97 @@ import gensim.downloader
 from gensim.models import Word2Vec
 
 import helper_funcs as helper
+import w2v_semantic_search as w2v
 
 SUPER_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_PATH = os.path.join(SUPER_PATH, "data")
 MODEL_PATH = os.path.join(SUPER_PATH, "models")
+PREPROC_CACHE_PATH = os.path.join(DATA_PATH, "preproc_cache.pkl")
 
 
-def create_model(docs: dict, add_train_data=True):
+def create_model(docs, add_train_data=True, pretrained_limit=None):
     """
     Creates a Word2Vec model based on a Wiki News pretrained vectorized model
     and a provided dictionary of documentation.
 
     Parameters
     -----------
-        docs (dict) : input docs in format filename : content
+        docs (dict | helper.StreamingCorpus) : preprocessed docs in format
+                filename : tokens, or a restartable corpus streaming the tokens
         add_train_data (bool) : whether or not to add the training data from wiki news
+        pretrained_limit (int | None) : if given, only adds the top 'N' most
+                frequent wiki news words
 
     Returns
     -----------
         model (object) : Word2Vec model to be saved
     """
-    helper.check_nltk_data()
-
-    preproc_docs = helper.read_clean_process_data(docs)
-
-    corpus = list(preproc_docs.values())
+    corpus = list(docs.values()) if isinstance(docs, dict) else docs
     model = Word2Vec(corpus, vector_size=500, window=5, min_count=2, workers=4)
 
     if add_train_data:
         # googlenews_model = gensim.downloader.load('word2vec-google-news-300')
         # model.build_vocab_from_freq(googlenews_model.key_to_index, corpus_count=len(corpus), update=True)
         wikinews_model_path = os.path.join(DATA_PATH, "wiki-news-300d-1M-subword.vec")
-        wikinews_model = gensim.models.KeyedVectors.load_word2vec_format(wikinews_model_path, binary=False)
-        model.build_vocab_from_freq(wikinews_model.key_to_index, corpus_count=len(corpus), update=True)
+        wikinews_model = helper.load_pretrained_vectors(wikinews_model_path, limit=pretrained_limit)
+        model.build_vocab_from_freq(wikinews_model.key_to_index, corpus_count=model.corpus_count, update=True)
 
     return model
 
+def save_model(model, preproc_docs, docs_path, embedding_matrix=None, filenames=None):
+    """
+    Saves a Word2Vec model, its exported query-serving vectors, and the
+    document embeddings built from it.
+
+    Parameters
+    -----------
+        model (object) : trained Word2Vec model
+        preproc_docs (dict | helper.StreamingCorpus) : preprocessed docs the
+                document embeddings are built from
+        docs_path (str) : path to documentation folder
+        embedding_matrix (np.ndarray | None) : precomputed document embeddings
+                to save instead of rebuilding them from preproc_docs
+        filenames (list[str] | None) : filename of each embedding_matrix row
+
+    Returns
+    -----------
+        (Does not return a value)
+    """
+    if not os.path.exists(MODEL_PATH):
+        os.makedirs(MODEL_PATH)
+
+    model.save(os.path.join(MODEL_PATH, "word2vec_model.bin"))
+
+    vectors_path = os.path.join(MODEL_PATH, "word2vec_vectors.kv")
+    helper.export_w2v_vectors(model, vectors_path)
+
+    if embedding_matrix is None:
+        w2v.build_doc_embeddings(preproc_docs, model, docs_path, vectors_path)
+    else:
+        fingerprint = w2v.get_embeddings_fingerprint(docs_path, vectors_path)
+        w2v.save_doc_embeddings(embedding_matrix, filenames, fingerprint, MODEL_PATH)
+
 def main():
     """
     Main execution function for creating the Word2Vec model.
+    Usage: python create_w2v_model.py [docs] [workers] [--stream]
     """
-    input_docs_path = sys.argv[1] if len(sys.argv) >= 2 else "docs"
+    args = [arg for arg in sys.argv[1:] if arg != "--stream"]
+    stream = len(args) < len(sys.argv) - 1
+
+    input_docs_path = args[0] if len(args) >= 1 else "docs"
     docs_path = os.path.join(DATA_PATH, input_docs_path)
+    workers = int(args[1]) if len(args) >= 2 else None
 
-    model = create_model(docs_path)
+    helper.check_nltk_data()
+    if stream:
+        preproc_docs = helper.StreamingCorpus(docs_path)
+    else:
+        preproc_docs = helper.read_clean_process_data(docs_path, cache_path=PREPROC_CACHE_PATH, workers=workers)
 
-    if not os.path.exists(MODEL_PATH):
-        os.makedirs(MODEL_PATH)
+    model = create_model(preproc_docs)
 
-    model.save(os.path.join(MODEL_PATH, "word2vec_model.bin"))
+    save_model(model, preproc_docs, docs_path)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,6 +1,5 @@
 import os
-import markdown
-from bs4 import BeautifulSoup
+import hashlib
 
 def read_md_file(filepath: str) -> str:
     """
@@ -14,11 +13,44 @@ def read_md_file(filepath: str) -> str:
     """
     with open(filepath, 'r') as f:
         content = f.read()
-        md_text =  markdown.markdown(content)
-        text = ''.join(BeautifulSoup(md_text, features="html5lib").findAll(text=True))
+
+    return convert_md_text(content)
+
+def convert_md_text(content: str) -> str:
+    """
+    Converts raw markdown content into a string of plain text.
+
+    Parameters:
+        content (str) : the raw markdown content
+
+    Returns:
+        text (str) : the plain text from the inputted markdown content
+    """
+    import markdown
+    from bs4 import BeautifulSoup
+
+    md_text = markdown.markdown(content)
+    text = ''.join(BeautifulSoup(md_text, features="html5lib").findAll(text=True))
 
     return text
 
+def iter_doc_data(directory: str):
+    """
+    Scans through a directory and lazily yields the documentation data from
+    all '.md' files one file at a time.
+
+    Parameters:
+        directory (str) : directory to scan through
+
+    Yields
+        (tuple) : (filename, content) of each `.md` file
+    """
+    for dirpath, _, filenames in os.walk(directory):
+        for file in filenames:
+            if file.endswith('.md'):
+                file_path = os.path.join(dirpath, file)
+                yield convert_filename(file), read_md_file(file_path)
+
 def collect_doc_data(directory: str) -> list[str]:
     """
     Scans through a directory and collects the documentation data from all
@@ -30,16 +62,7 @@ def collect_doc_data(directory: str) -> list[str]:
     Returns
         docs_data (list[str]) : documentation data from `.md` files
     """
-    doc_data = {}
-    for dirpath, _, filenames in os.walk(directory):
-        for file in filenames:
-            if file.endswith('.md'):
-                file_path = os.path.join(dirpath, file)
-                content = read_md_file(file_path)
-                proper_filename = convert_filename(file)
-                doc_data[proper_filename] = content
-    
-    return doc_data
+    return dict(iter_doc_data(directory))
 
 def create_hyperlink_dict(directory: str) -> dict:
     """
@@ -80,3 +103,27 @@ def convert_filename(filename):
     converted_name = " ".join(name_parts).replace(".md", "")
 
     return converted_name
+
+def get_docs_fingerprint(directory: str) -> str:
+    """
+    Computes a cheap fingerprint of a documentation directory from the path,
+    modification time, and size of every `.md` file. The fingerprint changes
+    whenever a doc is added, modified, or removed, without reading any content.
+
+    Parameters:
+        directory (str) : directory to scan through
+
+    Returns:
+        fingerprint (str) : hex digest identifying the current state of the docs
+    """
+    digest = hashlib.sha1()
+    for dirpath, dirnames, filenames in os.walk(directory):
+        dirnames.sort()
+        for file in sorted(filenames):
+            if file.endswith('.md'):
+                file_path = os.path.join(dirpath, file)
+                stat = os.stat(file_path)
+                rel_path = os.path.relpath(file_path, directory)
+                digest.update(f"{rel_path}:{stat.st_mtime_ns}:{stat.st_size}\n".encode())
+
+    return digest.hexdigest()
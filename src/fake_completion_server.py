@@ -0,0 +1,119 @@
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 8799
+FAKE_REPLY = ("To start a cluster, open the Compute tab, select the cluster, and click the power "
+              "button. Further reading: compute_clusters.md")
+
+
+def make_handler(token_delay=0.02, first_token_delay=0.2, fail_first=0):
+    """
+    Creates a request handler which imitates the streaming ChatCompletion API.
+
+    Parameters
+    -----------
+        token_delay (float) : seconds between streamed tokens
+        first_token_delay (float) : seconds before the first token
+        fail_first (int) : number of initial requests answered with a 429 rate
+                limit error, to exercise client retries
+
+    Returns
+    -----------
+        (type) : request handler class for the HTTP server, whose `state`
+                records the number of requests and the most requests which
+                were in flight at once
+    """
+    state = {"requests": 0, "in_flight": 0, "max_in_flight": 0}
+    lock = threading.Lock()
+
+    class FakeCompletionHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            with lock:
+                state["requests"] += 1
+                request_number = state["requests"]
+                state["in_flight"] += 1
+                state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+            try:
+                self._respond(request_number)
+            finally:
+                with lock:
+                    state["in_flight"] -= 1
+
+        def _respond(self, request_number: int):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+
+            if request_number <= fail_first:
+                body = json.dumps({"error": {"message": "Rate limit reached.", "type": "requests"}}).encode()
+                self.send_response(429)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+
+            words = FAKE_REPLY.split(" ")
+            tokens = [word if i == 0 else f" {word}" for i, word in enumerate(words)]
+
+            if not payload.get("stream"):
+                body = json.dumps({"id": "chatcmpl-fake",
+                                   "object": "chat.completion",
+                                   "model": payload.get("model"),
+                                   "choices": [{"index": 0,
+                                                "message": {"role": "assistant", "content": FAKE_REPLY},
+                                                "finish_reason": "stop"}]}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+
+            time.sleep(first_token_delay)
+            for token in tokens:
+                chunk = {"id": "chatcmpl-fake",
+                         "object": "chat.completion.chunk",
+                         "model": payload.get("model"),
+                         "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(token_delay)
+            self.wfile.write(b"data: [DONE]\n\n")
+
+        def log_message(self, format, *args):
+            pass
+
+    FakeCompletionHandler.state = state
+    return FakeCompletionHandler
+
+
+def main():
+    """
+    Main execution function for running the fake completion server, which
+    lets the GPT clients be exercised locally without an API key. Point the
+    client's `api_base` at http://127.0.0.1:<port>/v1.
+    Usage: python fake_completion_server.py [port] [fail_first]
+    """
+    port = int(sys.argv[1]) if len(sys.argv) >= 2 else DEFAULT_PORT
+    fail_first = int(sys.argv[2]) if len(sys.argv) >= 3 else 0
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(fail_first=fail_first))
+    print(f"Fake completion server listening on http://127.0.0.1:{port}/v1")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,20 @@
 # Helper functions
 import os
 import pickle
-import nltk
-from gensim.models import Word2Vec
+import numpy as np
 from dotenv import load_dotenv
 
 import doc_reader as reader
 import md_cleaner as cleaner
 import md_preprocessor as preprocessor
+import corpus_cache
+import parallel_ingest as ingest
+import metrics
 
 DATA_PATH = "../data/"
 MODEL_PATH = "../models/"
+PREPROC_CACHE_PATH = os.path.join(DATA_PATH, "preproc_cache.pkl")
+W2V_VECTORS_PATH = os.path.join(MODEL_PATH, "word2vec_vectors.kv")
 
 def get_api_key():
     """
@@ -26,14 +30,22 @@ def get_api_key():
 
     return os.getenv("OPENAI_API_KEY")
 
-def read_clean_process_data(docs=os.path.join(DATA_PATH, "docs")) -> dict:
+def read_clean_process_data(docs=os.path.join(DATA_PATH, "docs"),
+                            use_cache=True,
+                            cache_path=PREPROC_CACHE_PATH,
+                            workers=1) -> dict:
     """
     Reads, cleans, and processes input documentation data using the doc_reader,
-    md_cleaner, and md_preprocessor stages.
+    md_cleaner, and md_preprocessor stages. By default, the preprocessed tokens
+    are cached on disk per file so only added or modified docs are reprocessed.
 
     Parameters
     -----------
         docs (str) : path to documentation folder
+        use_cache (bool) : if True, reuses tokens of unchanged docs from the cache
+        cache_path (str) : path to the preprocessed token cache file
+        workers (int | None) : number of worker processes used to read, clean,
+                and preprocess docs, all CPU cores if None (default: 1)
 
     Returns
     -----------
@@ -42,12 +54,60 @@ def read_clean_process_data(docs=os.path.join(DATA_PATH, "docs")) -> dict:
     if not os.path.exists(docs):
         raise FileNotFoundError("Parallel Works documentation not found. Please run 'dvc pull' and try again.")
 
+    if use_cache:
+        return corpus_cache.load_preproc_docs(docs, cache_path, workers)
+
+    if workers != 1:
+        return ingest.ingest_directory(docs, workers)
+
     doc_data = reader.collect_doc_data(docs)
     cleaned_doc_data = cleaner.clean_doc_data(doc_data)
     preproc_docs = preprocessor.preprocess_doc_data(cleaned_doc_data)
 
     return preproc_docs
 
+def stream_clean_process_data(docs=os.path.join(DATA_PATH, "docs")):
+    """
+    Streams documentation data through the doc_reader, md_cleaner, and
+    md_preprocessor stages one document at a time, so only a single document's
+    raw text, cleaned text, and tokens are held in memory at once.
+
+    Parameters
+    -----------
+        docs (str) : path to documentation folder
+
+    Yields
+    -----------
+        (tuple) : (filename, preprocessed tokens) of each document
+    """
+    if not os.path.exists(docs):
+        raise FileNotFoundError("Parallel Works documentation not found. Please run 'dvc pull' and try again.")
+
+    doc_items = reader.iter_doc_data(docs)
+    cleaned_items = cleaner.iter_clean_doc_data(doc_items)
+
+    yield from preprocessor.iter_preprocess_doc_data(cleaned_items)
+
+class StreamingCorpus:
+    """
+    Restartable corpus over a documentation folder which re-streams the docs
+    through `stream_clean_process_data` on every pass. Iterating yields token
+    lists, as expected by gensim, and `items()` yields (filename, tokens) pairs
+    like a preprocessed docs dictionary.
+    """
+    def __init__(self, docs=os.path.join(DATA_PATH, "docs")):
+        self.docs = docs
+
+    def __iter__(self):
+        for _, tokens in self.items():
+            yield tokens
+
+    def items(self):
+        return stream_clean_process_data(self.docs)
+
+    def values(self):
+        return iter(self)
+
 def clean_and_preproc_data(input_data):
     """
     Helper function to combine cleaning and preprocessing of data.
@@ -67,6 +127,36 @@ def clean_and_preproc_data(input_data):
 
     return cp_data
 
+def preprocess_query(query: str) -> list[str]:
+    """
+    Spell-corrects, cleans, and preprocesses a user query into tokens, so the
+    same preprocessing pass can be shared across retrieval backends.
+
+    Parameters:
+        query (str) : user query
+
+    Returns:
+        (list[str]) : preprocessed query tokens
+    """
+    with metrics.span("spell_correction"):
+        corrected_query = cleaner.correct_spelling(query)
+    with metrics.span("preprocess_query"):
+        return clean_and_preproc_data(corrected_query)
+
+def preprocess_query_batch(queries: list[str]) -> list[list[str]]:
+    """
+    Runs `preprocess_query` on a batch of queries, preprocessing each distinct
+    query only once, since replayed query logs repeat queries heavily.
+
+    Parameters:
+        queries (list[str]) : user queries
+
+    Returns:
+        (list[list[str]]) : preprocessed tokens of each query, in order
+    """
+    query_tokens = {query: preprocess_query(query) for query in dict.fromkeys(queries)}
+    return [query_tokens[query] for query in queries]
+
 def load_w2v(model_path=os.path.join(MODEL_PATH, "word2vec_model.bin")):
     """
     Loads the Word2Vec model from a stored file.
@@ -80,8 +170,113 @@ def load_w2v(model_path=os.path.join(MODEL_PATH, "word2vec_model.bin")):
     if not os.path.exists(model_path):
         raise FileNotFoundError(f"The Word2Vec model file '{model_path}' does not exist.")
 
+    from gensim.models import Word2Vec
+
     return Word2Vec.load(model_path)
 
+def export_w2v_vectors(model: "Word2Vec", vectors_path=W2V_VECTORS_PATH):
+    """
+    Exports only the KeyedVectors of a trained Word2Vec model, without any of
+    its training state, for query serving. The vector array is always stored
+    in its own `.npy` file so it can be memory-mapped on load.
+
+    Parameters:
+        model (Word2Vec): trained Word2Vec model
+        vectors_path (str): Path to save the KeyedVectors to (default: "word2vec_vectors.kv")
+
+    Returns:
+        (Does not return a value)
+    """
+    model.wv.save(vectors_path, separately=['vectors'])
+
+def load_w2v_vectors(vectors_path=W2V_VECTORS_PATH, mmap='r') -> "KeyedVectors":
+    """
+    Query-serving counterpart of `load_w2v` which loads only the Word2Vec
+    KeyedVectors, with the vector array memory-mapped read-only by default so
+    that several processes on one host share a single page-cached copy.
+
+    Parameters:
+        vectors_path (str): Path to the exported KeyedVectors (default: "word2vec_vectors.kv")
+        mmap (str | None): memory-map mode for the vector array (default: 'r')
+
+    Returns:
+        (KeyedVectors) : Word2Vec word vectors
+    """
+    if not os.path.exists(vectors_path):
+        raise FileNotFoundError(f"The Word2Vec vectors file '{vectors_path}' does not exist.")
+
+    from gensim.models import KeyedVectors
+
+    return KeyedVectors.load(vectors_path, mmap=mmap)
+
+def convert_pretrained_vectors(vec_path: str):
+    """
+    One-time conversion of pretrained word vectors from the text `.vec` format
+    into a float32 `.npy` vector matrix and a `.vocab.txt` file listing one word
+    per line in the original (most to least frequent) order.
+
+    Parameters:
+        vec_path (str): Path to the pretrained `.vec` file
+
+    Returns:
+        vectors_path (str): Path to the converted `.npy` vector matrix
+        vocab_path (str): Path to the converted vocabulary file
+    """
+    if not os.path.exists(vec_path):
+        raise FileNotFoundError(f"The pretrained vectors file '{vec_path}' does not exist.")
+
+    base_path = os.path.splitext(vec_path)[0]
+    vectors_path = f"{base_path}.vectors.npy"
+    vocab_path = f"{base_path}.vocab.txt"
+
+    from gensim.models import KeyedVectors
+
+    pretrained = KeyedVectors.load_word2vec_format(vec_path, binary=False)
+
+    np.save(vectors_path, pretrained.vectors.astype(np.float32, copy=False))
+    with open(vocab_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(pretrained.index_to_key))
+
+    return vectors_path, vocab_path
+
+def load_pretrained_vectors(vec_path: str, limit=None) -> "KeyedVectors":
+    """
+    Loads pretrained word vectors from their converted native format, with the
+    vector matrix memory-mapped read-only. The `.vec` file is converted first if
+    it has not been yet, or if it changed since it was converted.
+
+    Parameters:
+        vec_path (str): Path to the pretrained `.vec` file
+        limit (int | None): if given, only loads the top 'N' most frequent words
+
+    Returns:
+        (KeyedVectors) : pretrained word vectors
+    """
+    base_path = os.path.splitext(vec_path)[0]
+    vectors_path = f"{base_path}.vectors.npy"
+    vocab_path = f"{base_path}.vocab.txt"
+
+    converted = os.path.exists(vectors_path) and os.path.exists(vocab_path)
+    if not converted or (os.path.exists(vec_path) and os.path.getmtime(vec_path) > os.path.getmtime(vectors_path)):
+        convert_pretrained_vectors(vec_path)
+
+    with open(vocab_path, "r", encoding="utf-8") as f:
+        if limit is None:
+            words = f.read().split("\n")
+        else:
+            words = [line.rstrip("\n") for _, line in zip(range(limit), f)]
+
+    vectors = np.load(vectors_path, mmap_mode='r')[:len(words)]
+
+    from gensim.models import KeyedVectors
+
+    pretrained = KeyedVectors(vectors.shape[1], count=0, dtype=np.float32)
+    pretrained.vectors = vectors
+    pretrained.index_to_key = words
+    pretrained.key_to_index = {word: i for i, word in enumerate(words)}
+
+    return pretrained
+
 def load_tfidf(vectorizer_path=os.path.join(MODEL_PATH, "tfidf_vectorizer.pkl"),
                matrix_path=os.path.join(MODEL_PATH, "tfidf_matrix.pkl")):
     """
@@ -109,10 +304,66 @@ def load_tfidf(vectorizer_path=os.path.join(MODEL_PATH, "tfidf_vectorizer.pkl"),
 
     return vectorizer, tfidf_matrix
 
+def top_k_indices(scores: np.ndarray, top_k=None) -> np.ndarray:
+    """
+    Returns the indices of the highest scores in descending order of score,
+    using `np.argpartition` so only the top 'k' entries are sorted.
+
+    Parameters
+    -----------
+        scores (np.ndarray) : 1-D array of similarity scores
+        top_k (int | None) : number of indices to return, all if None
+
+    Returns
+    -----------
+        (np.ndarray) : indices of the top 'k' scores, best first
+    """
+    if top_k is None or top_k >= len(scores):
+        return np.argsort(scores)[::-1]
+
+    if top_k <= 0:
+        return np.array([], dtype=np.intp)
+
+    candidates = np.argpartition(scores, -top_k)[-top_k:]
+
+    return candidates[np.argsort(scores[candidates])[::-1]]
+
+def top_k_indices_batch(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    Row-wise version of `top_k_indices` for a matrix of scores, selecting the
+    top 'k' columns of every row with a single vectorized `np.argpartition`.
+
+    Parameters
+    -----------
+        scores (np.ndarray) : (num_queries, num_docs) array of similarity scores
+        top_k (int) : number of indices to return per row
+
+    Returns
+    -----------
+        (np.ndarray) : (num_queries, k) indices of the top scores, best first
+    """
+    num_rows, num_cols = scores.shape
+    k = max(0, min(top_k, num_cols))
+
+    if k == 0:
+        return np.empty((num_rows, 0), dtype=np.intp)
+
+    if k < num_cols:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(num_cols), (num_rows, 1))
+
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind='stable')
+
+    return np.take_along_axis(candidates, order, axis=1)
+
 def check_nltk_data():
     """
     Check and download necessary data for NLTK packages.
     """
+    import nltk
+
     nltk_packages = ['punkt', 'stopwords', 'wordnet']
 
     for package in nltk_packages:
@@ -0,0 +1,131 @@
+import os
+import sys
+import json
+import subprocess
+import numpy as np
+
+DEFAULT_RUNS = 5
+NUM_SLOWEST = 5
+
+# Cumulative import time budgets of the entry points, in milliseconds
+IMPORT_BUDGETS_MS = {"run_gpt": 150,
+                     "search_client": 100,
+                     "helper_funcs": 400,
+                     "md_preprocessor": 50,
+                     "doc_reader": 50}
+
+# Dependencies which take a second or more to import between them, and which
+# importing a budgeted entry point must not pull in
+HEAVY_MODULES = ("openai", "aiohttp", "gensim", "sklearn", "scipy", "nltk",
+                 "spellchecker", "markdown", "bs4", "tiktoken")
+
+
+def parse_importtime(stderr: str) -> list[tuple]:
+    """
+    Parses the report written by `python -X importtime`.
+
+    Parameters
+    -----------
+        stderr (str) : stderr of the Python process
+
+    Returns
+    -----------
+        rows (list[tuple]) : (module, self microseconds, cumulative microseconds)
+                of every import
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+
+    return rows
+
+def measure_import(module: str, cwd: str) -> dict:
+    """
+    Imports a module in a fresh Python process.
+
+    Parameters
+    -----------
+        module (str) : name of the module to import
+        cwd (str) : directory to run the process in
+
+    Returns
+    -----------
+        (dict) : cumulative import time of the module in milliseconds, the
+                slowest imports by their own time, and the heavy modules which
+                were loaded
+    """
+    code = f"import sys, json, {module}; print(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=cwd, capture_output=True, text=True, check=True)
+
+    rows = parse_importtime(result.stderr)
+    cumulative_us = next(cumulative for name, _, cumulative in reversed(rows) if name == module)
+    loaded = set(json.loads(result.stdout))
+
+    return {"import_ms": cumulative_us / 1000,
+            "slowest": [(name, round(self_us / 1000, 1))
+                        for name, self_us, _ in sorted(rows, key=lambda row: -row[1])[:NUM_SLOWEST]],
+            "heavy_modules": sorted(name for name in HEAVY_MODULES if name in loaded)}
+
+def check_budgets(modules: list[str], runs=DEFAULT_RUNS, cwd=os.path.dirname(os.path.abspath(__file__))) -> dict:
+    """
+    Measures the median import time of each module over several fresh
+    processes and checks it against IMPORT_BUDGETS_MS and HEAVY_MODULES.
+    Modules without a budget are only measured.
+
+    Parameters
+    -----------
+        modules (list[str]) : names of the modules to check
+        runs (int) : number of processes to import each module in
+        cwd (str) : directory to run the processes in
+
+    Returns
+    -----------
+        report (dict) : per-module median import time, budget, heavy modules
+                loaded, slowest imports, and whether the module passed
+    """
+    report = {}
+    for module in modules:
+        measurements = [measure_import(module, cwd) for _ in range(runs)]
+        import_ms = float(np.median([m["import_ms"] for m in measurements]))
+        budget_ms = IMPORT_BUDGETS_MS.get(module)
+        heavy_modules = measurements[-1]["heavy_modules"]
+
+        report[module] = {"import_ms": round(import_ms, 1),
+                          "budget_ms": budget_ms,
+                          "heavy_modules": heavy_modules,
+                          "slowest": measurements[-1]["slowest"],
+                          "passed": budget_ms is None or (import_ms <= budget_ms and not heavy_modules)}
+
+    return report
+
+def main():
+    """
+    Main execution function for checking the import time budgets of the entry
+    points. Exits with status 1 if any module is over budget.
+    Usage: python import_benchmark.py [module[,module...]] [runs]
+    """
+    modules = sys.argv[1].split(",") if len(sys.argv) >= 2 else list(IMPORT_BUDGETS_MS)
+    runs = int(sys.argv[2]) if len(sys.argv) >= 3 else DEFAULT_RUNS
+
+    report = check_budgets(modules, runs)
+
+    print(f"{'module':<20}{'import ms':>12}{'budget ms':>12}  {'result':<8}heavy modules loaded")
+    for module, row in report.items():
+        budget = row["budget_ms"] if row["budget_ms"] is not None else "-"
+        result = "ok" if row["passed"] else "FAIL"
+        print(f"{module:<20}{row['import_ms']:>12}{budget:>12}  {result:<8}{', '.join(row['heavy_modules']) or '-'}")
+
+    print("\nSlowest imports by own time (ms):")
+    for module, row in report.items():
+        print(f"    {module}: {row['slowest']}")
+
+    if not all(row["passed"] for row in report.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,13 @@
 import re
-from spellchecker import SpellChecker
 import md_preprocessor as preprocessor
 
+PUNCT_PATTERN = re.compile(r'[^\w\s]')
+SIDEBAR_POS_PATTERN = re.compile(r"sidebar_position(?: \d+)? ")
+SIDEBAR_POS_LABEL = "sidebar_position"
+
+# ASCII characters matched by PUNCT_PATTERN, deleted with str.translate
+_ASCII_PUNCT_TABLE = {i: None for i in range(128) if PUNCT_PATTERN.match(chr(i))}
+
 
 def _remove_whitespace(input_str: str) -> str:
     """
@@ -46,8 +52,7 @@ def _remove_punct_and_special_chars(input_str: str) -> str:
     -----------
         (str) : inputted string without punctuation or special characters
     """
-    pattern = r'[^\w\s]'
-    return re.sub(pattern, '', input_str)
+    return PUNCT_PATTERN.sub('', input_str)
 
 
 def _filter_sidebar_pos(input_str: str) -> str:
@@ -63,8 +68,31 @@ def _filter_sidebar_pos(input_str: str) -> str:
     -----------
         (str) : inputted string without sidebar position labels
     """
-    pattern = r"sidebar_position(?: \d+)? "
-    return re.sub(pattern, "", input_str)
+    return SIDEBAR_POS_PATTERN.sub("", input_str)
+
+
+CLEANING_FUNCS = [_remove_whitespace,
+                  _lower_str,
+                  _remove_punct_and_special_chars,
+                  _filter_sidebar_pos]
+
+
+def clean_str_stepwise(input_str: str) -> str:
+    """
+    Applies each of the CLEANING_FUNCS to the input string in turn, one full
+    pass per step. Kept as the reference that `clean_str` must match exactly.
+
+    Parameters:
+        input_str (str) : inputted string to be cleaned
+
+    Returns:
+        cleaned_str (str) : cleaned string
+    """
+    cleaned_str = input_str
+    for func in CLEANING_FUNCS:
+        cleaned_str = func(cleaned_str)
+
+    return cleaned_str
 
 
 def clean_str(input_str: str) -> str:
@@ -73,20 +101,26 @@ def clean_str(input_str: str) -> str:
     lowercasing the string, removing punctuations and special characters, and
     filtering sidebar positioning from .md files.
 
+    The steps are fused to give the same output as `clean_str_stepwise` in
+    fewer passes: ASCII text has its punctuation deleted with a single
+    str.translate instead of a regex, and the sidebar positioning regex only
+    runs on text which contains a label.
+
     Parameters:
         input_str (str) : inputted string to be cleaned
     
     Returns:
         cleaned_str (str) : cleaned string
     """
-    cleaning_funcs = [_remove_whitespace,
-                      _lower_str,
-                      _remove_punct_and_special_chars,
-                      _filter_sidebar_pos]
-    
-    cleaned_str = input_str
-    for func in cleaning_funcs:
-        cleaned_str = func(cleaned_str)
+    cleaned_str = ' '.join(input_str.split()).lower()
+
+    if cleaned_str.isascii():
+        cleaned_str = cleaned_str.translate(_ASCII_PUNCT_TABLE)
+    else:
+        cleaned_str = PUNCT_PATTERN.sub('', cleaned_str)
+
+    if SIDEBAR_POS_LABEL in cleaned_str:
+        cleaned_str = SIDEBAR_POS_PATTERN.sub("", cleaned_str)
 
     return cleaned_str
 
@@ -103,7 +137,21 @@ def clean_doc_data(doc_data: list[str]) -> list[str]:
     Returns:
         cleaned_doc_data (list[str]) : the cleaned documentation data
     """
-    return {file : clean_str(content) for file, content in doc_data.items()}
+    return dict(iter_clean_doc_data(doc_data.items()))
+
+
+def iter_clean_doc_data(doc_items):
+    """
+    Lazily cleans a stream of documentation data one file at a time.
+
+    Parameters:
+        doc_items (iterable[tuple]) : (filename, content) pairs of `.md` data
+
+    Yields:
+        (tuple) : (filename, cleaned content) of each file
+    """
+    for file, content in doc_items:
+        yield file, clean_str(content)
 
 
 def correct_spelling(query_str):
@@ -116,16 +164,10 @@ def correct_spelling(query_str):
     Returns:
         corrected_str (str) : corrected spelling for input string
     """
-    spell = SpellChecker()
-    query_tokens = preprocessor.word_tokenize(query_str)
-    misspelled = spell.unknown(query_tokens)
+    correct_word = preprocessor.get_default_pipeline().correct_word
+    query_tokens = preprocessor.tokenize_str(query_str, "nltk")
 
-    corrected_query = []
-    for word in query_tokens:
-        if word in misspelled:
-            corrected_query.append(spell.correction(word))
-        else:
-            corrected_query.append(word)
+    corrected_query = [correct_word(word) for word in query_tokens]
 
     corrected_str = " ".join(corrected_query)
 
@@ -1,10 +1,125 @@
+import os
 import re
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from nltk.stem import PorterStemmer
-from nltk.stem import WordNetLemmatizer
+from functools import lru_cache
 
-def tokenize_str(input_str: str) -> list[str]:
+# NLTK takes over a second to import, so it and the spell checker are imported
+# only once a pipeline is created or the NLTK tokenizer is used
+
+NON_ALNUM_PATTERN = re.compile(r'[^a-zA-Z0-9]')
+
+# "nltk" for NLTK's word_tokenize, or "fast" for `fast_tokenize`
+TOKENIZER = os.getenv("ASK_PW_TOKENIZER", "nltk")
+
+# Whole-word contractions which NLTK's Treebank tokenizer splits even after
+# punctuation is removed
+TREEBANK_CONTRACTIONS = {"cannot": ("can", "not"),
+                         "gimme": ("gim", "me"),
+                         "gonna": ("gon", "na"),
+                         "gotta": ("got", "ta"),
+                         "lemme": ("lem", "me"),
+                         "wanna": ("wan", "na")}
+
+_default_pipeline = None
+
+
+class PreprocessingPipeline:
+    """
+    Reusable preprocessing resources. Holds the stop-word set, lemmatizer,
+    stemmer, and spell checker once, along with bounded LRU caches for
+    per-token lemmatization, stemming, and spelling correction, since the same
+    vocabulary repeats heavily across docs and queries.
+    """
+    def __init__(self, token_cache_size=100000, spelling_cache_size=10000):
+        from nltk.corpus import stopwords
+        from nltk.stem import PorterStemmer, WordNetLemmatizer
+
+        self.stop_words = set(stopwords.words('english'))
+        self.lemmatizer = WordNetLemmatizer()
+        self.stemmer = PorterStemmer()
+        self._spell = None
+
+        self.lemmatize = lru_cache(maxsize=token_cache_size)(self.lemmatizer.lemmatize)
+        self.stem = lru_cache(maxsize=token_cache_size)(self.stemmer.stem)
+        self.correct_word = lru_cache(maxsize=spelling_cache_size)(self._correct_word)
+
+    @property
+    def spell(self) -> "SpellChecker":
+        """
+        Spell checker, loaded on first use since only queries are spell-checked.
+        """
+        if self._spell is None:
+            from spellchecker import SpellChecker
+            self._spell = SpellChecker()
+        return self._spell
+
+    def _correct_word(self, word: str) -> str:
+        if word in self.spell.unknown([word]):
+            return self.spell.correction(word)
+        return word
+
+    def cache_stats(self) -> dict:
+        """
+        Gets the hit and miss counters of the per-token caches.
+
+        Returns
+        -----------
+            (dict) : hits, misses, and current size of each cache
+        """
+        caches = {"lemmatize": self.lemmatize, "stem": self.stem, "spelling": self.correct_word}
+        return {name: {"hits": info.hits, "misses": info.misses, "size": info.currsize}
+                for name, info in ((name, cache.cache_info()) for name, cache in caches.items())}
+
+    def clear_caches(self):
+        """
+        Empties the per-token caches and resets their counters.
+        """
+        for cache in (self.lemmatize, self.stem, self.correct_word):
+            cache.cache_clear()
+
+
+def get_default_pipeline() -> PreprocessingPipeline:
+    """
+    Gets the process-wide preprocessing pipeline, creating it on first use.
+
+    Returns
+    -----------
+        (PreprocessingPipeline) : shared preprocessing pipeline
+    """
+    global _default_pipeline
+    if _default_pipeline is None:
+        _default_pipeline = PreprocessingPipeline()
+    return _default_pipeline
+
+
+def fast_tokenize(cleaned_str: str) -> list[str]:
+    """
+    Tokenizes a string already cleaned by `md_cleaner.clean_str`. With the
+    punctuation removed, NLTK's sentence splitting and Treebank regexes reduce
+    to a whitespace split plus the TREEBANK_CONTRACTIONS, which this applies
+    directly.
+
+    Parameters
+    -----------
+        cleaned_str (str) : lowercased string without punctuation
+
+    Returns
+    -----------
+        tokens (list[str]) : tokenized input string
+    """
+    tokens = cleaned_str.split()
+    if not any(token in TREEBANK_CONTRACTIONS for token in tokens):
+        return tokens
+
+    split_tokens = []
+    for token in tokens:
+        if token in TREEBANK_CONTRACTIONS:
+            split_tokens.extend(TREEBANK_CONTRACTIONS[token])
+        else:
+            split_tokens.append(token)
+
+    return split_tokens
+
+def tokenize_str(input_str: str, tokenizer=None) -> list[str]:
     """
     Tokenizes an input string. Tokenization is the process of splitting a string
     into a list of word "tokens", i.e. into each separate word component of the
@@ -13,12 +128,21 @@ def tokenize_str(input_str: str) -> list[str]:
     Parameters
     -----------
         input_str (str) : inputed string to tokenize
+        tokenizer (str | None) : "nltk" or "fast" (default: TOKENIZER, set by
+                the ASK_PW_TOKENIZER environment variable)
 
     Returns
     -----------
         (list[str]) : tokenized input string
     """
-    return word_tokenize(input_str)
+    tokenizer = tokenizer or TOKENIZER
+    if tokenizer == "fast":
+        return fast_tokenize(input_str)
+    elif tokenizer == "nltk":
+        from nltk.tokenize import word_tokenize
+        return word_tokenize(input_str)
+
+    raise ValueError(f"Unknown tokenizer '{tokenizer}'.")
 
 def _remove_stopwords(tokens: list[str]) -> list[str]:
     """
@@ -32,7 +156,7 @@ def _remove_stopwords(tokens: list[str]) -> list[str]:
     -----------
         (list[str]) : tokenized string with stopwords removed
     """
-    stop_words = set(stopwords.words('english'))
+    stop_words = get_default_pipeline().stop_words
     return [token for token in tokens if token not in stop_words]
 
 def _stem_tokens(tokens: list[str]) -> list[str]:
@@ -49,8 +173,8 @@ def _stem_tokens(tokens: list[str]) -> list[str]:
     -----------
         (list[str]) : tokenized string with words stemmed
     """
-    stemmer = PorterStemmer()
-    return [stemmer.stem(token) for token in tokens]
+    stem = get_default_pipeline().stem
+    return [stem(token) for token in tokens]
 
 def _lemmatize_tokens(tokens: list[str]) -> list[str]:
     """
@@ -66,8 +190,8 @@ def _lemmatize_tokens(tokens: list[str]) -> list[str]:
     -----------
         (list[str]) : tokenized string with words lemmatized
     """
-    lemmatizer = WordNetLemmatizer()
-    return [lemmatizer.lemmatize(token) for token in tokens]
+    lemmatize = get_default_pipeline().lemmatize
+    return [lemmatize(token) for token in tokens]
 
 def _clean_tokens(tokens: list[str]) -> list[str]:
     """
@@ -81,27 +205,59 @@ def _clean_tokens(tokens: list[str]) -> list[str]:
     -----------
         (list[str]) : tokenized string with only alphanumeric characters
     """
-    return [re.sub(r'[^a-zA-Z0-9]', '', token) for token in tokens if token]
+    return [NON_ALNUM_PATTERN.sub('', token) for token in tokens if token]
+
+PREPROC_FUNCS = [_remove_stopwords, _lemmatize_tokens, _clean_tokens]
 
-def preprocess_str(cleaned_str: str) -> list[str]:
+def preprocess_str_stepwise(cleaned_str: str, tokenizer=None) -> list[str]:
+    """
+    Tokenizes a string and applies each of the PREPROC_FUNCS to the token list
+    in turn. Kept as the reference that `preprocess_str` must match exactly.
+
+    Parameters:
+        cleaned_str (str) : a pre-cleaned string
+        tokenizer (str | None) : "nltk" or "fast" (default: TOKENIZER)
+
+    Returns:
+        preproc_tokens (list[str]) : preprocessed tokens of a string
+    """
+    preproc_tokens = tokenize_str(cleaned_str, tokenizer)
+    for func in PREPROC_FUNCS:
+        preproc_tokens = func(preproc_tokens)
+
+    return preproc_tokens
+
+def preprocess_str(cleaned_str: str, tokenizer=None) -> list[str]:
     """
     Helper function to preprocess an inputted string via tokenization, stemming or 
     lemmatizing, and stop-word removal.
 
+    Stop-word removal, lemmatization, and token cleaning are fused into a single
+    loop over the tokens, with the same output as `preprocess_str_stepwise`.
+    Tokens which are already ASCII alphanumeric skip the cleaning regex.
+
     Parameters:
         cleaned_str (str) : a pre-cleaned string
+        tokenizer (str | None) : "nltk" or "fast" (default: TOKENIZER, set by
+                the ASK_PW_TOKENIZER environment variable)
     
     Returns:
         preproc_tokens (list[str]) : preprocessed tokens of a string
     """
-    tokens = tokenize_str(cleaned_str)
+    pipeline = get_default_pipeline()
+    stop_words, lemmatize = pipeline.stop_words, pipeline.lemmatize
 
-    preproc_funcs = [_remove_stopwords, _lemmatize_tokens, _clean_tokens] 
+    preproc_tokens = []
+    for token in tokenize_str(cleaned_str, tokenizer):
+        if token in stop_words:
+            continue
+        token = lemmatize(token)
+        if not token:
+            continue
+        if not (token.isascii() and token.isalnum()):
+            token = NON_ALNUM_PATTERN.sub('', token)
+        preproc_tokens.append(token)
 
-    preproc_tokens = tokens
-    for func in preproc_funcs:
-        preproc_tokens = func(preproc_tokens)
-    
     return preproc_tokens
 
 def preprocess_doc_data(cleaned_doc_data: list[str]) -> list[list[str]]:
@@ -116,4 +272,17 @@ def preprocess_doc_data(cleaned_doc_data: list[str]) -> list[list[str]]:
     Returns:
         preproc_doc_data (list[list[str]]) : full pre-processed documentation data
     """
-    return {file : preprocess_str(content) for file, content in cleaned_doc_data.items()}
\ No newline at end of file
+    return dict(iter_preprocess_doc_data(cleaned_doc_data.items()))
+
+def iter_preprocess_doc_data(cleaned_doc_items):
+    """
+    Lazily preprocesses a stream of cleaned documentation data one file at a time.
+
+    Parameters:
+        cleaned_doc_items (iterable[tuple]) : (filename, cleaned content) pairs
+
+    Yields:
+        (tuple) : (filename, preprocessed tokens) of each file
+    """
+    for file, content in cleaned_doc_items:
+        yield file, preprocess_str(content)
@@ -0,0 +1,211 @@
+import os
+import json
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+
+METRICS_PREFIX = "ask_pw"
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRICS_LOG_PATH = os.getenv("ASK_PW_METRICS_LOG")
+
+_enabled = os.getenv("ASK_PW_METRICS", "0") == "1"
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+# Stage timings of the current `trace`. Worker threads only see them when
+# they run in a copy of the caller's context, e.g. via `copy_context().run`.
+_stage_timings = contextvars.ContextVar("stage_timings", default=None)
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        duration = time.perf_counter() - self.start
+        observe(f"{self.name}_seconds", duration)
+
+        stage_timings = _stage_timings.get()
+        if stage_timings is not None:
+            with _lock:
+                stage_timings[self.name] = stage_timings.get(self.name, 0.0) + duration * 1000
+        return False
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+def disable():
+    global _enabled
+    _enabled = False
+
+def is_enabled() -> bool:
+    return _enabled
+
+def span(name: str):
+    """
+    Times a pipeline stage as a context manager. The duration is recorded in
+    the `<name>_seconds` histogram and in the stage timings of the current
+    `trace`. When instrumentation is disabled, a shared no-op context manager
+    is returned, so a disabled span costs one function call.
+
+    Parameters
+    -----------
+        name (str) : stage name, e.g. "embed_query"
+
+    Returns
+    -----------
+        (context manager) : span timing the enclosed block
+    """
+    if not _enabled:
+        return _NULL_SPAN
+
+    return _Span(name)
+
+def inc(name: str, value=1):
+    """
+    Increments a counter, e.g. cache hits or docs scored.
+
+    Parameters
+    -----------
+        name (str) : counter name
+        value (int | float) : amount to add (default: 1)
+
+    Returns
+    -----------
+        (Does not return a value)
+    """
+    if not _enabled:
+        return
+
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+def observe(name: str, value: float, buckets=DEFAULT_BUCKETS):
+    """
+    Records a value in a histogram with cumulative upper-bound buckets.
+
+    Parameters
+    -----------
+        name (str) : histogram name
+        value (float) : observed value
+        buckets (tuple[float]) : bucket upper bounds, used when the histogram
+                is first created
+
+    Returns
+    -----------
+        (Does not return a value)
+    """
+    if not _enabled:
+        return
+
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = {"buckets": buckets, "counts": [0] * (len(buckets) + 1),
+                                             "sum": 0.0, "count": 0}
+        histogram["counts"][bisect.bisect_left(histogram["buckets"], value)] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+@contextmanager
+def trace():
+    """
+    Collects the per-stage timings of all spans entered within the block, e.g.
+    for one query, including spans in worker threads which were submitted with
+    a copy of the current context (`contextvars.copy_context().run`).
+
+    Returns
+    -----------
+        (context manager) : yields a dict of stage name to milliseconds, which
+                is filled in as the spans finish
+    """
+    stage_timings = {}
+    token = _stage_timings.set(stage_timings)
+    try:
+        yield stage_timings
+    finally:
+        _stage_timings.reset(token)
+
+def snapshot() -> dict:
+    """
+    Gets a copy of all counters and histograms.
+
+    Returns
+    -----------
+        (dict) : {"counters": {...}, "histograms": {...}}
+    """
+    with _lock:
+        return {"counters": dict(_counters),
+                "histograms": {name: {"buckets": list(h["buckets"]), "counts": list(h["counts"]),
+                                      "sum": h["sum"], "count": h["count"]}
+                               for name, h in _histograms.items()}}
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+def export_prometheus() -> str:
+    """
+    Renders all counters and histograms in the Prometheus text exposition format.
+
+    Returns
+    -----------
+        (str) : Prometheus text format metrics
+    """
+    metrics = snapshot()
+    lines = []
+
+    for name, value in sorted(metrics["counters"].items()):
+        lines.append(f"# TYPE {METRICS_PREFIX}_{name}_total counter")
+        lines.append(f"{METRICS_PREFIX}_{name}_total {value}")
+
+    for name, histogram in sorted(metrics["histograms"].items()):
+        lines.append(f"# TYPE {METRICS_PREFIX}_{name} histogram")
+        cumulative = 0
+        for bound, count in zip(list(histogram["buckets"]) + ["+Inf"], histogram["counts"]):
+            cumulative += count
+            lines.append(f'{METRICS_PREFIX}_{name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f"{METRICS_PREFIX}_{name}_sum {histogram['sum']}")
+        lines.append(f"{METRICS_PREFIX}_{name}_count {histogram['count']}")
+
+    return "\n".join(lines) + "\n"
+
+def write_json_line(path: str, record: dict):
+    """
+    Appends a timestamped record, e.g. the stage timings of one query, to a
+    JSON lines file.
+
+    Parameters
+    -----------
+        path (str) : path to the JSON lines file
+        record (dict) : JSON-serializable record
+
+    Returns
+    -----------
+        (Does not return a value)
+    """
+    with _lock, open(path, "a") as f:
+        f.write(json.dumps({"timestamp": time.time(), **record}) + "\n")
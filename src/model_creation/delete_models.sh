@@ -7,11 +7,21 @@ then
     rm word2vec_model.bin
     rm word2vec_model.bin.syn1neg.npy
     rm word2vec_model.bin.wv.vectors.npy
+    rm -f word2vec_vectors.kv word2vec_vectors.kv.vectors.npy
     echo "word2vec_model.bin deleted successfully!"
 else
     echo "word2vec_model.bin does not exist."
 fi
 
+if [ -f "doc_embeddings.npy" ]
+then
+    rm -f doc_embeddings.npy doc_embeddings_index.json
+    rm -rf ivf_index passage_index
+    echo "doc_embeddings.npy deleted successfully!"
+else
+    echo "doc_embeddings.npy does not exist."
+fi
+
 if [ -f "tfidf_vectorizer.pkl" ]
 then
     rm tfidf_vectorizer.pkl
@@ -27,3 +37,19 @@ then
 else
     echo "tfidf_matrix.pkl does not exist."
 fi
+
+if [ -d "bm25_index" ]
+then
+    rm -rf bm25_index
+    echo "bm25_index deleted successfully!"
+else
+    echo "bm25_index does not exist."
+fi
+
+if [ -f "docs_manifest.json" ]
+then
+    rm docs_manifest.json
+    echo "docs_manifest.json deleted successfully!"
+else
+    echo "docs_manifest.json does not exist."
+fi
@@ -51,3 +51,19 @@ then
 else
     echo "Both tfidf_vectorizer.pkl and tfidf_matrix.pkl exist. Skipping TF-IDF model creation."
 fi
+
+if [ ! -d "bm25_index" ]
+then
+    echo "bm25_index not found. Creating BM25 index..."
+    cd ../src/model_creation
+    if [ -z "$1" ]
+    then
+        python3 create_bm25_model.py
+    else
+        python3 create_bm25_model.py "$1"
+    fi
+    echo "BM25 index created successfully!"
+    cd ../../models
+else
+    echo "bm25_index already exists. Skipping BM25 index creation."
+fi
@@ -0,0 +1,135 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import doc_reader as reader
+import md_cleaner as cleaner
+import md_preprocessor as preprocessor
+
+DEFAULT_CHUNKSIZE = 16
+
+
+def list_md_files(directory: str) -> list[tuple]:
+    """
+    Lists all `.md` files in a directory in the same order as
+    `doc_reader.collect_doc_data` reads them.
+
+    Parameters
+    -----------
+        directory (str) : directory to scan through
+
+    Returns
+    -----------
+        md_files (list[tuple]) : (file_path, filename) of every `.md` file
+    """
+    md_files = []
+    for dirpath, _, filenames in os.walk(directory):
+        for file in filenames:
+            if file.endswith('.md'):
+                md_files.append((os.path.join(dirpath, file), file))
+
+    return md_files
+
+
+def process_md_content(content: str) -> list[str]:
+    """
+    Runs raw markdown content through the doc_reader, md_cleaner, and
+    md_preprocessor stages.
+
+    Parameters
+    -----------
+        content (str) : raw markdown content
+
+    Returns
+    -----------
+        (list[str]) : preprocessed tokens of the document
+    """
+    text = reader.convert_md_text(content)
+    return preprocessor.preprocess_str(cleaner.clean_str(text))
+
+
+def _process_item(item: tuple) -> tuple:
+    """
+    Worker function which reads (if needed) and processes a single document,
+    catching any error so one bad file cannot abort the whole run.
+
+    Parameters
+    -----------
+        item (tuple) : (file_path, content), where content is the raw file text
+                or bytes, or None if the file still needs to be read
+
+    Returns
+    -----------
+        (tuple) : (tokens, error), with tokens None if processing failed
+    """
+    file_path, content = item
+    try:
+        if content is None:
+            with open(file_path, 'r') as f:
+                content = f.read()
+        elif isinstance(content, bytes):
+            content = content.decode()
+        return process_md_content(content), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def process_documents(items: list[tuple], workers=1, chunksize=DEFAULT_CHUNKSIZE) -> list:
+    """
+    Processes documents through the read, clean, and preprocess chain, in a
+    process pool when more than one worker is requested. Results are returned
+    in the same order as the inputs regardless of the number of workers.
+
+    Parameters
+    -----------
+        items (list[tuple]) : (file_path, content) of every document, where
+                content is the raw file text or bytes, or None if the file
+                still needs to be read
+        workers (int | None) : number of worker processes, all CPU cores if None
+        chunksize (int) : number of documents sent to a worker at a time
+
+    Returns
+    -----------
+        results (list[list[str] | None]) : tokens of each document, or None for
+                documents that failed to process
+    """
+    workers = workers or os.cpu_count() or 1
+
+    if workers > 1 and len(items) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(items))) as executor:
+            outputs = list(executor.map(_process_item, items, chunksize=chunksize))
+    else:
+        outputs = [_process_item(item) for item in items]
+
+    results = []
+    for (file_path, _), (tokens, error) in zip(items, outputs):
+        if error is not None:
+            print(f"Warning: skipping '{file_path}' after failing to process it ({error}).")
+        results.append(tokens)
+
+    return results
+
+
+def ingest_directory(directory: str, workers=1, chunksize=DEFAULT_CHUNKSIZE) -> dict:
+    """
+    Reads, cleans, and preprocesses all `.md` files in a directory, optionally
+    across multiple worker processes.
+
+    Parameters
+    -----------
+        directory (str) : directory to scan through
+        workers (int | None) : number of worker processes, all CPU cores if None
+        chunksize (int) : number of documents sent to a worker at a time
+
+    Returns
+    -----------
+        preproc_docs (dict) : preprocessed documentation data keyed by filename
+    """
+    md_files = list_md_files(directory)
+    results = process_documents([(file_path, None) for file_path, _ in md_files], workers, chunksize)
+
+    preproc_docs = {}
+    for (_, file), tokens in zip(md_files, results):
+        if tokens is not None:
+            preproc_docs[reader.convert_filename(file)] = tokens
+
+    return preproc_docs
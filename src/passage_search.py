@@ -0,0 +1,288 @@
+import os
+
+import helper_funcs as helper
+import w2v_semantic_search as w2v
+import vector_index
+
+PASSAGE_WINDOW = 128
+PASSAGE_STRIDE = 96
+PASSAGE_INDEX_DIR = "passage_index"
+PASSAGE_SEPARATOR = "..."
+PASSAGES_PER_FILE = 2
+
+
+def split_passages(tokens: list[str], window=PASSAGE_WINDOW, stride=PASSAGE_STRIDE) -> list[tuple]:
+    """
+    Splits a tokenized document into overlapping fixed-size token windows.
+    Consecutive passages overlap by `window - stride` tokens so that content
+    cut at a passage boundary is still whole in one of the two passages.
+
+    Parameters
+    -----------
+        tokens (list[str]) : tokenized document content
+        window (int) : number of tokens per passage (default: PASSAGE_WINDOW)
+        stride (int) : number of tokens between passage starts (default: PASSAGE_STRIDE)
+
+    Returns
+    -----------
+        spans (list[tuple]) : (start, end) token offsets of each passage
+    """
+    if stride <= 0 or stride > window:
+        raise ValueError("The passage stride must be between 1 and the window size.")
+
+    if len(tokens) <= window:
+        return [(0, len(tokens))] if tokens else []
+
+    spans = [(start, start + window) for start in range(0, len(tokens) - window + 1, stride)]
+    if spans[-1][1] < len(tokens):
+        spans.append((len(tokens) - window, len(tokens)))
+
+    return spans
+
+def make_passage_id(filename: str, start: int, end: int) -> str:
+    return f"{filename}#{start}-{end}"
+
+def parse_passage_id(passage_id: str) -> tuple:
+    """
+    Splits a passage id back into its source filename and token offsets.
+
+    Parameters
+    -----------
+        passage_id (str) : passage id from `make_passage_id`
+
+    Returns
+    -----------
+        (tuple) : (filename, start, end) of the passage
+    """
+    filename, span = passage_id.rsplit("#", 1)
+    start, end = span.split("-")
+
+    return filename, int(start), int(end)
+
+def create_passages(preproc_docs: dict, window=PASSAGE_WINDOW, stride=PASSAGE_STRIDE) -> dict:
+    """
+    Splits every preprocessed document into overlapping passages.
+
+    Parameters
+    -----------
+        preproc_docs (dict) : preprocessed documents, keyed by filename with
+                values corresponding to the file content in tokenized form
+        window (int) : number of tokens per passage
+        stride (int) : number of tokens between passage starts
+
+    Returns
+    -----------
+        passages (dict) : passage tokens keyed by passage id, in document order
+    """
+    passages = {}
+    for filename, tokens in preproc_docs.items():
+        for start, end in split_passages(tokens, window, stride):
+            passages[make_passage_id(filename, start, end)] = tokens[start:end]
+
+    return passages
+
+def load_passage_index(preproc_docs: dict,
+                       model: object,
+                       docs_path=os.path.join(helper.DATA_PATH, "docs"),
+                       model_path=helper.W2V_VECTORS_PATH,
+                       window=PASSAGE_WINDOW,
+                       stride=PASSAGE_STRIDE):
+    """
+    Loads the Word2Vec vector index over the passage embeddings, building and
+    saving it next to the Word2Vec model first if it is missing or if the docs,
+    model, or passage settings have changed since it was built.
+
+    Parameters
+    -----------
+        preproc_docs (dict): preprocessed documents, keyed by filename with
+                values corresponding to the file content in tokenized form
+        model (object): the trained Word2Vec model
+        docs_path (str): path to documentation folder
+        model_path (str): path to the saved Word2Vec model or vectors file
+        window (int): number of tokens per passage
+        stride (int): number of tokens between passage starts
+
+    Returns
+    -----------
+        (vector_index.FlatIndex) : passage vector index, with passage ids as ids
+    """
+    index_dir = os.path.join(os.path.dirname(model_path), PASSAGE_INDEX_DIR)
+    fingerprint_path = os.path.join(index_dir, w2v.VECTOR_INDEX_FINGERPRINT_FILE)
+    fingerprint = f"{w2v.get_embeddings_fingerprint(docs_path, model_path)}:{window}:{stride}"
+
+    if os.path.exists(fingerprint_path):
+        with open(fingerprint_path, "r") as f:
+            if f.read() == fingerprint:
+                return vector_index.load_index(index_dir)
+
+    embedding_matrix, passage_ids = w2v.create_doc_embedding_matrix(create_passages(preproc_docs, window, stride),
+                                                                    model)
+    index = vector_index.FlatIndex(w2v.get_keyed_vectors(model).vector_size).build(embedding_matrix, passage_ids)
+    index.save(index_dir)
+
+    with open(fingerprint_path, "w") as f:
+        f.write(fingerprint)
+
+    return index
+
+def load_tfidf_passage_index(preproc_docs: dict,
+                             vectorizer,
+                             window=PASSAGE_WINDOW,
+                             stride=PASSAGE_STRIDE) -> tuple:
+    """
+    Projects every passage into the space of a TF-IDF vectorizer fitted on the
+    whole documents, and builds the passage matrix's inverted index.
+
+    Parameters
+    -----------
+        preproc_docs (dict) : preprocessed documents, keyed by filename with
+                values corresponding to the file content in tokenized form
+        vectorizer (TfidfVectorizer) : the initialized TF-IDF vectorizer
+        window (int) : number of tokens per passage
+        stride (int) : number of tokens between passage starts
+
+    Returns
+    -----------
+        passage_matrix (scipy.sparse.csr_matrix) : one TF-IDF row per passage
+        passage_ids (list[str]) : passage id of each row
+    """
+    import tfidf_semantic_search as tfidf
+
+    passages = create_passages(preproc_docs, window, stride)
+    passage_matrix = vectorizer.transform(" ".join(tokens) for tokens in passages.values())
+    tfidf.get_inverted_index(passage_matrix)
+
+    return passage_matrix, list(passages)
+
+def search_passages(query_tokens: list[str],
+                    model: object,
+                    passage_index,
+                    top_k=10) -> list[tuple]:
+    """
+    Finds the passages most similar to preprocessed query tokens with the
+    Word2Vec passage index.
+
+    Parameters
+    -----------
+        query_tokens (list[str]) : preprocessed query tokens
+        model (object) : the trained Word2Vec model
+        passage_index (vector_index.FlatIndex) : index from `load_passage_index`
+        top_k (int) : number of passages to return (default: 10)
+
+    Returns
+    -----------
+        results (list[tuple]) : (passage_id, score) of the best passages, best
+                first, or an empty list if the query matches no known token
+    """
+    if not any(token in w2v.get_keyed_vectors(model) for token in query_tokens):
+        return []
+
+    return passage_index.search(w2v.embed_tokens(query_tokens, model), top_k)
+
+def search_tfidf_passages(query_tokens: list[str],
+                          vectorizer,
+                          tfidf_passage_index: tuple,
+                          top_k=10) -> list[tuple]:
+    """
+    Finds the passages most similar to preprocessed query tokens with TF-IDF.
+
+    Parameters
+    -----------
+        query_tokens (list[str]) : preprocessed query tokens
+        vectorizer (TfidfVectorizer) : the initialized TF-IDF vectorizer
+        tfidf_passage_index (tuple) : (passage_matrix, passage_ids) from
+                `load_tfidf_passage_index`
+        top_k (int) : number of passages to return (default: 10)
+
+    Returns
+    -----------
+        results (list[tuple]) : (passage_id, score) of the best passages, best
+                first, or an empty list if the query shares no term with them
+    """
+    import tfidf_semantic_search as tfidf
+
+    passage_matrix, passage_ids = tfidf_passage_index
+    query_vector = vectorizer.transform([" ".join(query_tokens)])
+    passage_indices, scores = tfidf.score_top_k(query_vector, passage_matrix, top_k)
+
+    return [(passage_ids[i], score) for i, score in zip(passage_indices, scores)]
+
+def retrieve_passages(search, top_k: int, passages_per_file=PASSAGES_PER_FILE) -> list[tuple]:
+    """
+    Retrieves the best passages of the `top_k` files with the best passages.
+    The passage pool starts at `top_k * passages_per_file` and is doubled
+    until it covers `top_k` distinct files or runs out of passages, and at
+    most `passages_per_file` passages are kept per file.
+
+    Parameters
+    -----------
+        search (callable) : takes a number of passages and returns the
+                (passage_id, score) of that many best passages, best first
+        top_k (int) : number of files to return passages from
+        passages_per_file (int) : number of passages kept per file
+
+    Returns
+    -----------
+        passage_hits (list[tuple]) : (passage_id, score) pairs, best first
+    """
+    if top_k <= 0:
+        return []
+
+    pool_size = top_k * passages_per_file
+    while True:
+        passage_hits = search(pool_size)
+        filenames = dict.fromkeys(parse_passage_id(passage_id)[0] for passage_id, _ in passage_hits)
+        if len(filenames) >= top_k or len(passage_hits) < pool_size:
+            break
+        pool_size *= 2
+
+    kept = {filename: 0 for filename in list(filenames)[:top_k]}
+    selected_hits = []
+    for passage_id, score in passage_hits:
+        filename = parse_passage_id(passage_id)[0]
+        if filename in kept and kept[filename] < passages_per_file:
+            kept[filename] += 1
+            selected_hits.append((passage_id, score))
+
+    return selected_hits
+
+def pack_passages(passage_hits: list[tuple], preproc_docs: dict) -> dict:
+    """
+    Groups retrieved passages back into their source files for the GPT input.
+    Files are ordered by their best passage, overlapping or adjacent passages
+    of the same file are merged into one span, and separate spans are joined
+    with PASSAGE_SEPARATOR in document order.
+
+    Parameters
+    -----------
+        passage_hits (list[tuple]) : (passage_id, score) pairs, best first
+        preproc_docs (dict) : preprocessed documents keyed by filename
+
+    Returns
+    -----------
+        passage_docs (dict) : passage tokens keyed by filename, in the same
+                format as the semantic search output
+    """
+    spans_by_file = {}
+    for passage_id, _ in passage_hits:
+        filename, start, end = parse_passage_id(passage_id)
+        spans_by_file.setdefault(filename, []).append((start, end))
+
+    passage_docs = {}
+    for filename, spans in spans_by_file.items():
+        merged = []
+        for start, end in sorted(spans):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+
+        tokens = preproc_docs[filename]
+        content = []
+        for start, end in merged:
+            if content:
+                content.append(PASSAGE_SEPARATOR)
+            content.extend(tokens[start:end])
+        passage_docs[filename] = content
+
+    return passage_docs
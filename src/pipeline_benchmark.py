@@ -0,0 +1,346 @@
+import os
+import sys
+import json
+import time
+import pickle
+import shutil
+import tempfile
+import resource
+import numpy as np
+from gensim.models import Word2Vec
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+import doc_reader as reader
+import md_cleaner as cleaner
+import md_preprocessor as preprocessor
+import helper_funcs as helper
+import w2v_semantic_search as w2v
+import tfidf_semantic_search as tfidf
+import passage_search as passages
+import run_gpt
+from bm25_semantic_search import BM25Index
+from semantic_search import semsearch
+
+DEFAULT_SIZES = (1000,)
+DEFAULT_NUM_QUERIES = 200
+DEFAULT_REPEATS = 3
+# Fewest calls for which a tail percentile is reported, so that stages run
+# once per repeat over the whole corpus only report their median
+PERCENTILE_MIN_CALLS = {95: 20, 99: 100}
+RECALL_AT = (1, 5, 10)
+NUM_TOPICS = 50
+WORDS_PER_TOPIC = 30
+SIGNATURE_WORDS = 3
+SIGNATURE_POOL_SIZE = 20000
+FILLER_POOL_SIZE = 2000
+
+
+def get_word_pool(seed=0) -> list[str]:
+    """
+    Gets a shuffled pool of real English words from the spell checker's
+    dictionary, so generated docs and queries pass through spelling correction
+    unchanged, with stopwords left out.
+    """
+    pipeline = preprocessor.get_default_pipeline()
+    words = sorted(word for word in pipeline.spell.word_frequency.dictionary
+                   if word.isalpha() and word.isascii() and 5 <= len(word) <= 10
+                   and word not in pipeline.stop_words)
+    np.random.default_rng(seed).shuffle(words)
+
+    return words
+
+def make_synthetic_corpus(directory: str, num_docs: int, num_queries=DEFAULT_NUM_QUERIES, seed=0) -> list[dict]:
+    """
+    Writes a synthetic markdown corpus and its labeled queries. Every doc
+    belongs to a topic with its own vocabulary, shares Zipf-distributed filler
+    words with all docs, and repeats a few signature words which together only
+    it contains. Each query combines a doc's signature words with one of its
+    topic words, and that doc is the single relevant result.
+
+    Parameters
+    -----------
+        directory (str) : directory to write the `.md` files into
+        num_docs (int) : number of docs to generate
+        num_queries (int) : number of labeled queries to generate
+        seed (int) : random seed
+
+    Returns
+    -----------
+        queries (list[dict]) : {"query": str, "relevant": [filename]} for each query
+    """
+    rng = np.random.default_rng(seed)
+    words = get_word_pool(seed)
+
+    filler_words = words[:FILLER_POOL_SIZE]
+    topic_words = np.array(words[FILLER_POOL_SIZE:FILLER_POOL_SIZE + NUM_TOPICS * WORDS_PER_TOPIC]).reshape(NUM_TOPICS, -1)
+    signature_pool = words[FILLER_POOL_SIZE + topic_words.size:][:SIGNATURE_POOL_SIZE]
+
+    filler_probs = 1 / np.arange(1, len(filler_words) + 1)
+    filler_probs /= filler_probs.sum()
+
+    signatures = {}
+    for i in range(num_docs):
+        topic = rng.integers(NUM_TOPICS)
+        signature = list(rng.choice(signature_pool, SIGNATURE_WORDS, replace=False))
+
+        sections = []
+        for section in range(rng.integers(2, 5)):
+            body = list(rng.choice(filler_words, rng.integers(40, 160), p=filler_probs))
+            body += list(rng.choice(topic_words[topic], rng.integers(5, 15)))
+            body += signature * int(rng.integers(1, 3))
+            rng.shuffle(body)
+            sections.append(f"## {' '.join(body[:3]).title()}\n\n{' '.join(body)}.\n\n- {body[0]}\n- {body[-1]}\n")
+
+        subdir = os.path.join(directory, f"part_{i // 1000:03d}")
+        os.makedirs(subdir, exist_ok=True)
+        filename = f"doc_{i:06d}.md"
+        with open(os.path.join(subdir, filename), "w") as f:
+            f.write(f"---\nsidebar_position: {i % 10}\n---\n\n# {signature[0].title()} guide\n\n" + "\n".join(sections))
+
+        signatures[reader.convert_filename(filename)] = (signature, topic)
+
+    queries = []
+    for filename in rng.choice(list(signatures), min(num_queries, num_docs), replace=False):
+        signature, topic = signatures[filename]
+        queries.append({"query": f"how do I use {' '.join(signature)} {rng.choice(topic_words[topic])}",
+                        "relevant": [str(filename)]})
+
+    return queries
+
+def reset_peak_rss() -> bool:
+    """
+    Resets the peak RSS of the process to its current RSS, so that the next
+    `get_peak_rss_mb` covers only what ran in between. Needs Linux's
+    /proc/self/clear_refs.
+
+    Returns
+    -----------
+        (bool) : whether the peak was reset
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        return False
+    return True
+
+def get_peak_rss_mb() -> float:
+    """
+    Gets the peak RSS of the process since the last `reset_peak_rss`, or since
+    the process started where it cannot be reset.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def summarize(latencies_s: list[float], items_per_call=1, unit="docs") -> dict:
+    """
+    Summarizes the latencies of repeated calls of one stage. Called right
+    after `time_calls`, so the peak RSS is that of the stage's calls.
+
+    Parameters
+    -----------
+        latencies_s (list[float]) : duration of each call in seconds
+        items_per_call (int) : number of docs or queries handled per call
+        unit (str) : name of the items handled, for the throughput
+
+    Returns
+    -----------
+        (dict) : p50 latency in milliseconds, p95/p99 if there were at least
+                PERCENTILE_MIN_CALLS calls, throughput, and peak RSS
+    """
+    latencies_ms = np.array(latencies_s) * 1000
+
+    summary = {"calls": len(latencies_ms),
+               "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3)}
+    for percentile, min_calls in PERCENTILE_MIN_CALLS.items():
+        if len(latencies_ms) >= min_calls:
+            summary[f"p{percentile}_ms"] = round(float(np.percentile(latencies_ms, percentile)), 3)
+    summary[f"{unit}_per_s"] = round(items_per_call * len(latencies_ms) / max(float(np.sum(latencies_s)), 1e-12), 1)
+    summary["peak_rss_mb"] = round(get_peak_rss_mb(), 1)
+
+    return summary
+
+def time_calls(func, args_list: list) -> tuple:
+    """
+    Calls a function once per argument tuple and times every call. The peak
+    RSS is reset first, so it can be read per stage.
+
+    Returns
+    -----------
+        results (list) : return value of each call
+        latencies (list[float]) : duration of each call in seconds
+    """
+    reset_peak_rss()
+    results, latencies = [], []
+    for args in args_list:
+        start = time.perf_counter()
+        results.append(func(*args))
+        latencies.append(time.perf_counter() - start)
+
+    return results, latencies
+
+def score_rankings(rankings: list[list[str]], queries: list[dict]) -> dict:
+    """
+    Computes recall@k and MRR of ranked filenames against labeled queries.
+
+    Parameters
+    -----------
+        rankings (list[list[str]]) : ranked filenames returned for each query
+        queries (list[dict]) : labeled queries with their relevant filenames
+
+    Returns
+    -----------
+        (dict) : recall@k for each k in RECALL_AT, and MRR
+    """
+    recalls = {k: [] for k in RECALL_AT}
+    reciprocal_ranks = []
+    for ranking, labeled in zip(rankings, queries):
+        relevant = set(labeled["relevant"])
+        for k in RECALL_AT:
+            recalls[k].append(len(relevant.intersection(ranking[:k])) / len(relevant))
+        ranks = [rank for rank, filename in enumerate(ranking, 1) if filename in relevant]
+        reciprocal_ranks.append(1 / ranks[0] if ranks else 0.0)
+
+    quality = {f"recall@{k}": round(float(np.mean(values)), 4) for k, values in recalls.items()}
+    quality["mrr"] = round(float(np.mean(reciprocal_ranks)), 4)
+
+    return quality
+
+def run_benchmark(num_docs: int, num_queries=DEFAULT_NUM_QUERIES, repeats=DEFAULT_REPEATS, seed=0) -> dict:
+    """
+    Benchmarks every stage of the Ask PW pipeline and the retrieval quality of
+    every backend on a synthetic corpus.
+
+    Parameters
+    -----------
+        num_docs (int) : number of docs in the synthetic corpus
+        num_queries (int) : number of labeled queries
+        repeats (int) : number of times each corpus-wide stage is run
+        seed (int) : random seed
+
+    Returns
+    -----------
+        report (dict) : per-stage latency, throughput, and peak RSS during
+                the stage, plus
+                recall@k and MRR per retrieval backend
+    """
+    work_dir = tempfile.mkdtemp(prefix="ask_pw_bench_")
+    docs_path = os.path.join(work_dir, "docs")
+    model_dir = os.path.join(work_dir, "models")
+    os.makedirs(model_dir)
+
+    try:
+        labeled_queries = make_synthetic_corpus(docs_path, num_docs, num_queries, seed)
+        queries = [labeled["query"] for labeled in labeled_queries]
+        stages = {}
+
+        doc_data, latencies = time_calls(reader.collect_doc_data, [(docs_path,)] * repeats)
+        stages["collect_doc_data"] = summarize(latencies, num_docs)
+
+        clean_docs, latencies = time_calls(cleaner.clean_doc_data, [(doc_data[0],)] * repeats)
+        stages["clean_doc_data"] = summarize(latencies, num_docs)
+
+        preproc_docs, latencies = time_calls(preprocessor.preprocess_doc_data, [(clean_docs[0],)] * repeats)
+        stages["preprocess_doc_data"] = summarize(latencies, num_docs)
+        preproc_docs = preproc_docs[0]
+
+        w2v_model = Word2Vec(list(preproc_docs.values()), vector_size=100, min_count=1, workers=4, seed=seed)
+        vectors_path = os.path.join(model_dir, "word2vec_vectors.kv")
+        helper.export_w2v_vectors(w2v_model, vectors_path)
+
+        vectorizer = TfidfVectorizer(sublinear_tf=True, stop_words='english')
+        tfidf_matrix = vectorizer.fit_transform(" ".join(tokens) for tokens in preproc_docs.values())
+        vectorizer_path = os.path.join(model_dir, "tfidf_vectorizer.pkl")
+        matrix_path = os.path.join(model_dir, "tfidf_matrix.pkl")
+        with open(vectorizer_path, "wb") as f:
+            pickle.dump(vectorizer, f)
+        with open(matrix_path, "wb") as f:
+            pickle.dump(tfidf_matrix, f)
+
+        loaded, latencies = time_calls(helper.load_w2v_vectors, [(vectors_path,)] * repeats)
+        stages["load_w2v"] = summarize(latencies, unit="loads")
+        w2v_vectors = loaded[0]
+
+        _, latencies = time_calls(helper.load_tfidf, [(vectorizer_path, matrix_path)] * repeats)
+        stages["load_tfidf"] = summarize(latencies, unit="loads")
+
+        tfidf_index = tfidf.get_inverted_index(tfidf_matrix)
+        bm25_index = BM25Index().build(preproc_docs)
+        doc_embeddings = w2v.create_doc_embedding_matrix(preproc_docs, w2v_vectors)
+        passage_index = passages.load_passage_index(preproc_docs, w2v_vectors, docs_path, vectors_path)
+        tfidf_passage_index = passages.load_tfidf_passage_index(preproc_docs, vectorizer)
+
+        # The passage modes return their files ordered by best passage, so every
+        # backend's results are ranked by filename
+        backends = {"w2v": {"mode": "w2v", "doc_embeddings": doc_embeddings},
+                    "bm25": {"mode": "bm25", "bm25_index": bm25_index},
+                    "hybrid": {"mode": "hybrid", "doc_embeddings": doc_embeddings, "vectorizer": vectorizer,
+                               "tfidf_matrix": tfidf_matrix, "tfidf_index": tfidf_index},
+                    "passage": {"mode": "passage", "passage_index": passage_index},
+                    "tfidf_passage": {"mode": "tfidf_passage", "vectorizer": vectorizer,
+                                      "passage_index": tfidf_passage_index}}
+
+        quality = {}
+        top_k = max(RECALL_AT)
+        for backend, params in backends.items():
+            results, latencies = time_calls(lambda query: semsearch(query, preproc_docs, w2v_vectors,
+                                                                    top_k=top_k, **params),
+                                            [(query,) for query in queries])
+            stages[f"semsearch[{backend}]"] = summarize(latencies, unit="queries")
+            quality[backend] = score_rankings([list(ss_docs) for ss_docs in results], labeled_queries)
+
+            if backend == "w2v":
+                _, latencies = time_calls(run_gpt.optimize_gpt_input, [(ss_docs,) for ss_docs in results])
+                stages["optimize_gpt_input"] = summarize(latencies, unit="queries")
+
+        rankings, latencies = time_calls(lambda query: [filename for filename, _ in tfidf.semantic_search(
+                                            query, preproc_docs, vectorizer, tfidf_matrix, top_k, tfidf_index)],
+                                         [(query,) for query in queries])
+        stages["semsearch[tfidf]"] = summarize(latencies, unit="queries")
+        quality["tfidf"] = score_rankings(rankings, labeled_queries)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {"num_docs": num_docs,
+            "num_queries": len(labeled_queries),
+            "repeats": repeats,
+            "seed": seed,
+            "stages": stages,
+            "quality": quality}
+
+def main():
+    """
+    Main execution function for the pipeline benchmark.
+    Usage: python pipeline_benchmark.py [num_docs[,num_docs...]] [output.json]
+    """
+    sizes = [int(size) for size in sys.argv[1].split(",")] if len(sys.argv) >= 2 else list(DEFAULT_SIZES)
+
+    reports = []
+    for num_docs in sizes:
+        report = run_benchmark(num_docs)
+        reports.append(report)
+
+        print(f"\n{num_docs} docs, {report['num_queries']} labeled queries\n")
+        print(f"{'stage':<24}{'p50 ms':>12}{'p95 ms':>12}{'p99 ms':>12}{'throughput':>20}{'peak RSS MB':>14}")
+        for stage, row in report["stages"].items():
+            unit, throughput = next((key, value) for key, value in row.items() if key.endswith("_per_s"))
+            print(f"{stage:<24}{row['p50_ms']:>12}{row.get('p95_ms', '-'):>12}{row.get('p99_ms', '-'):>12}"
+                  f"{f'{throughput} {unit[:-6]}/s':>20}{row['peak_rss_mb']:>14}")
+
+        print(f"\n{'backend':<16}" + "".join(f"{metric:>12}" for metric in next(iter(report["quality"].values()))))
+        for backend, metrics in report["quality"].items():
+            print(f"{backend:<16}" + "".join(f"{value:>12}" for value in metrics.values()))
+
+    if len(sys.argv) >= 3:
+        with open(sys.argv[2], "w") as f:
+            json.dump({"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "runs": reports}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,20 @@
 import sys
 import json
-import openai
-from semantic_search import semsearch
-import helper_funcs as helper
-import doc_reader as reader
+import search_client
+import context_packer
+import metrics
+
+# openai and the semantic search stack are imported inside the functions that
+# use them, so that asking a running search server starts up quickly
 
 MAX_TOKENS = 3500
+GPT_MODEL = "gpt-3.5-turbo"
 
 def valid_gpt_input(cand_json: str) -> bool:
     """
     Checks if the candidate json input fits in GPT token input of 3500 total tokens.
     Choice is arbitrary to allow for 597 total tokens for setting system prompts and 
-    GPT output.
+    GPT output. Tokens are counted with the local GPT tokenizer when available.
 
     Parameters
     -----------
@@ -22,7 +25,7 @@ def valid_gpt_input(cand_json: str) -> bool:
         fits_in_gpt (bool) : Boolean flag on whether the candidate can be passed
                     into ChatGPT API
     """
-    token_count = len(cand_json) / 4
+    token_count = context_packer.count_tokens(cand_json)
 
     return token_count < MAX_TOKENS
 
@@ -45,11 +48,10 @@ def format_gpt_input(gpt_docs: dict) -> str:
 def optimize_gpt_input(gpt_docs: dict) -> str:
     """
     Optimizes the documentation passed into ChatGPT by filling in the maximum
-    number of tokens that can be fit from five files. If the five most relevant
-    files go over the maximum number of GPT API tokens, this function cuts out
-    the least relevant file, and tries again until the json-formatted dictionary
-    can be passed into the ChatGPT API with as many relevant documents as possible
-    and while staying below the maximum token count.
+    number of tokens that can be fit from the most relevant files. Files are
+    added greedily from most to least relevant, and the first file that goes
+    over the maximum number of GPT API tokens is truncated to fill the rest of
+    the budget instead of being dropped.
 
     Parameters
     -----------
@@ -57,20 +59,11 @@ def optimize_gpt_input(gpt_docs: dict) -> str:
 
     Returns
     -----------
-        gpt_input (str) : json-formatted string dictionary that has been trimmed
-                from lest relevant to most in order to fit into ChatGPT API
-                max token count of 3597 for inputs.
+        gpt_input (str) : json-formatted string dictionary that has been packed
+                from most relevant to least in order to fit into ChatGPT API
+                max token count of MAX_TOKENS for inputs.
     """
-    temp_docs = gpt_docs.copy()
-    cand = format_gpt_input(temp_docs)
-
-    while not valid_gpt_input(cand):
-        file_keys = list(temp_docs.keys())
-        file_to_remove = file_keys[-1]
-        temp_docs.pop(file_to_remove)
-        cand = format_gpt_input(temp_docs)
-
-    return cand
+    return context_packer.pack_context(gpt_docs, MAX_TOKENS)
 
 
 def replace_filenames_with_links(gpt_output: str, hyperlinks: dict) -> str:
@@ -94,24 +87,21 @@ def replace_filenames_with_links(gpt_output: str, hyperlinks: dict) -> str:
 
     return formatted_output
 
-def run_gpt(query, formatte_docs, api_key=helper.get_api_key()):
+def build_gpt_messages(query: str, formatted_docs: str) -> list[dict]:
     """
-    Function that runs the gpt-3.5-turbo AI API on a query and set of arguments
-    Arguments should consist of a variable length list, where each
-    element contains a list of tokens from the most relevant files related to
-    the inputted query.
+    Builds the chat messages sent to GPT: the system prompts, the user query,
+    and the json-formatted relevant docs.
 
-    Paramaters:
+    Parameters
+    -----------
         query (str) : inputted query from user
-        formatted_docs (list[str]) : json-formatted dictionary containing file and
+        formatted_docs (str) : json-formatted dictionary containing file and
                 content info from semantic search
-        api_key (str) : user API key to run
-    
-    Returns:
-        reply (str) : GPT AI response to query with supporting relevant documents
-    """
-    openai.api_key = api_key
 
+    Returns
+    -----------
+        messages (list[dict]) : chat messages for the ChatCompletion API
+    """
     gpt_prompt = "You are a helpful assistant in charge of helping users understand our platform."
     clarification_1 = "Your responses should not require users to search through our files and should be fully comprehensive. However, always include the most relevant files to the query at the bottom if the user would like to conduct further reading."
     clarification_2 = "If the inputted query isn't related to PW documentation, respond explaining that you are meant as an assistant for the Parallel Works platform. Tangentially related queries are okay."
@@ -125,40 +115,213 @@ def run_gpt(query, formatte_docs, api_key=helper.get_api_key()):
         {"role": "user", "content": query}
     ]
 
-    messages.append({"role": "user", "content": formatte_docs})
+    messages.append({"role": "user", "content": formatted_docs})
+
+    return messages
+
+def run_gpt(query, formatte_docs, api_key=None):
+    """
+    Function that runs the gpt-3.5-turbo AI API on a query and set of arguments
+    Arguments should consist of a variable length list, where each
+    element contains a list of tokens from the most relevant files related to
+    the inputted query.
+
+    Paramaters:
+        query (str) : inputted query from user
+        formatted_docs (list[str]) : json-formatted dictionary containing file and
+                content info from semantic search
+        api_key (str | None) : user API key to run, read from the environment if None
+    
+    Returns:
+        reply (str) : GPT AI response to query with supporting relevant documents
+    """
+    import openai
+    import helper_funcs as helper
+
+    openai.api_key = api_key or helper.get_api_key()
+
+    messages = build_gpt_messages(query, formatte_docs)
 
     response = openai.ChatCompletion.create(
-        model="gpt-3.5-turbo",
+        model=GPT_MODEL,
         messages=messages
     )
 
     reply = response.choices[0].message.content
     return reply
 
+def get_answer_cache_version(docs_path: str, model_path=None) -> str:
+    """
+    Computes the answer cache version from the GPT model and the state of the
+    docs and Word2Vec model, so cached answers are dropped when any of them change.
+
+    Parameters
+    -----------
+        docs_path (str) : path to documentation folder
+        model_path (str | None) : path to the saved Word2Vec model or vectors
+                file (default: helper_funcs.W2V_VECTORS_PATH)
+
+    Returns
+    -----------
+        (str) : answer cache version
+    """
+    import helper_funcs as helper
+    import w2v_semantic_search as w2v
+
+    return f"{GPT_MODEL}:{w2v.get_embeddings_fingerprint(docs_path, model_path or helper.W2V_VECTORS_PATH)}"
+
+def get_cached_answer(query: str, ss_docs: dict, answer_cache=None, semantic_cache=None, query_tokens=None) -> str:
+    """
+    Looks up a query's answer in the exact answer cache, then in the semantic
+    near-duplicate cache.
+
+    Parameters
+    -----------
+        query (str) : inputted query from user
+        ss_docs (dict) : most relevant docs from semantic search
+        answer_cache (AnswerCache | None) : exact answer cache
+        semantic_cache (SemanticCache | None) : near-duplicate answer cache
+        query_tokens (list[str] | None) : the query preprocessed for retrieval,
+                reused by the semantic cache instead of preprocessing it again
+
+    Returns
+    -----------
+        cached_reply (str | None) : cached answer, or None if neither cache has one
+    """
+    with metrics.span("cache_lookup"):
+        if answer_cache is not None:
+            cached_reply = answer_cache.get(query, ss_docs.keys())
+            if cached_reply is not None:
+                metrics.inc("answer_cache_hits")
+                return cached_reply
+            metrics.inc("answer_cache_misses")
+
+        if semantic_cache is not None:
+            cached_reply = semantic_cache.get(query, ss_docs.keys(), query_tokens)
+            if cached_reply is not None:
+                metrics.inc("semantic_cache_hits")
+                return cached_reply
+            metrics.inc("semantic_cache_misses")
+
+    return None
+
+def store_answer(query: str,
+                 ss_docs: dict,
+                 hyperlink_reply: str,
+                 answer_cache=None,
+                 semantic_cache=None,
+                 query_tokens=None):
+    """
+    Stores a query's answer in the given caches.
+
+    Parameters
+    -----------
+        query (str) : inputted query from user
+        ss_docs (dict) : most relevant docs from semantic search
+        hyperlink_reply (str) : GPT AI response with filenames as hyperlinks
+        answer_cache (AnswerCache | None) : exact answer cache
+        semantic_cache (SemanticCache | None) : near-duplicate answer cache
+        query_tokens (list[str] | None) : the query preprocessed for retrieval,
+                reused by the semantic cache instead of preprocessing it again
+
+    Returns
+    -----------
+        (Does not return a value)
+    """
+    if answer_cache is not None:
+        answer_cache.put(query, ss_docs.keys(), hyperlink_reply)
+    if semantic_cache is not None:
+        semantic_cache.put(query, ss_docs.keys(), hyperlink_reply, query_tokens)
+
+def answer_query(query: str,
+                 ss_docs: dict,
+                 hyperlink_dict: dict,
+                 answer_cache=None,
+                 semantic_cache=None,
+                 query_tokens=None) -> str:
+    """
+    Answers a query from its semantic search results by packing the relevant
+    docs into the GPT input, running GPT, and linking the cited filenames.
+
+    Parameters
+    -----------
+        query (str) : inputted query from user
+        ss_docs (dict) : most relevant docs from semantic search
+        hyperlink_dict (dict) : the hyperlinks corresponding to the file names
+        answer_cache (AnswerCache | None) : if given, answers are looked up in
+                and stored into this cache, keyed by the normalized query and
+                the retrieved docs
+        semantic_cache (SemanticCache | None) : if given, answers of similar
+                prior queries with overlapping docs are reused from this cache
+                before calling GPT
+        query_tokens (list[str] | None) : the query preprocessed for retrieval,
+                reused by the semantic cache instead of preprocessing it again
+
+    Returns
+    -----------
+        hyperlink_reply (str) : GPT AI response with filenames as hyperlinks
+    """
+    cached_reply = get_cached_answer(query, ss_docs, answer_cache, semantic_cache, query_tokens)
+    if cached_reply is not None:
+        return cached_reply
+
+    with metrics.span("pack_prompt"):
+        gpt_input = optimize_gpt_input(ss_docs)
+
+    with metrics.span("llm_call"):
+        reply = run_gpt(query, gpt_input)
+
+    hyperlink_reply = replace_filenames_with_links(reply, hyperlink_dict)
+
+    store_answer(query, ss_docs, hyperlink_reply, answer_cache, semantic_cache, query_tokens)
+
+    return hyperlink_reply
+
 def main():
     if len(sys.argv) < 2:
         raise ValueError("Query input required.")
 
     query = sys.argv[1]
 
+    if len(sys.argv) < 3:
+        server_reply = search_client.query_server("ask", {"query": query})
+        if server_reply is not None:
+            print(f"{server_reply['answer']}\n")
+            return
+
+    import helper_funcs as helper
+    import doc_reader as reader
+    import w2v_semantic_search as w2v
+    from semantic_search import semsearch
+    from answer_cache import AnswerCache
+
     docs_path = sys.argv[2] if len(sys.argv) >= 3 else "../data/docs"
     preproc_docs = helper.read_clean_process_data(docs_path)
     hyperlink_dict = reader.create_hyperlink_dict(docs_path)
 
-    w2v_model = helper.load_w2v()
+    w2v_model = helper.load_w2v_vectors()
+    doc_embeddings = w2v.load_doc_embeddings(preproc_docs, w2v_model, docs_path)
     # vectorizer, tfidf_matrix = helper.load_tfidf()
 
-    # ss_docs = semsearch(query, preproc_docs, w2v_model, vectorizer, tfidf_matrix)
-    ss_docs = semsearch(query, preproc_docs, w2v_model)
-
-    gpt_input = optimize_gpt_input(ss_docs)
+    with metrics.trace() as stage_timings:
+        with metrics.span("retrieval"):
+            # ss_docs = semsearch(query, preproc_docs, w2v_model, vectorizer, tfidf_matrix)
+            ss_docs = semsearch(query, preproc_docs, w2v_model, doc_embeddings=doc_embeddings)
 
-    reply = run_gpt(query, gpt_input)
-
-    hyperlink_reply = replace_filenames_with_links(reply, hyperlink_dict)
+        answer_cache = AnswerCache(version=get_answer_cache_version(docs_path))
+        try:
+            hyperlink_reply = answer_query(query, ss_docs, hyperlink_dict, answer_cache)
+        finally:
+            answer_cache.flush()
 
     print(f"{hyperlink_reply}\n")
 
+    if metrics.is_enabled():
+        print(f"Stage timings (ms): {json.dumps({stage: round(ms, 2) for stage, ms in stage_timings.items()})}",
+              file=sys.stderr)
+        if metrics.METRICS_LOG_PATH:
+            metrics.write_json_line(metrics.METRICS_LOG_PATH, {"query": query, "stage_timings_ms": stage_timings})
+
 if __name__ == "__main__":
     main()
 
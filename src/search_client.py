@@ -0,0 +1,105 @@
+import json
+import socket
+import urllib.request
+import urllib.error
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# urlopen wraps errors raised while connecting and sending the request in
+# URLError, so these mean the server never received the request and the caller
+# can safely fall back to running the pipeline locally.
+UNREACHABLE_ERRORS = (urllib.error.URLError,)
+
+# Errors raised once the request was sent, e.g. timing out while the server is
+# answering. The server may still be running the query, so retrying it locally
+# could run GPT twice. socket.timeout is only an alias of TimeoutError from
+# Python 3.10.
+DISCONNECTED_ERRORS = (ConnectionError, TimeoutError, socket.timeout)
+
+
+def _make_request(endpoint: str, payload: dict, host: str, port: int) -> urllib.request.Request:
+    return urllib.request.Request(f"http://{host}:{port}/{endpoint}",
+                                  data=json.dumps(payload).encode("utf-8"),
+                                  headers={"Content-Type": "application/json"},
+                                  method="POST")
+
+def _server_error(e: urllib.error.HTTPError) -> RuntimeError:
+    body = e.read().decode("utf-8")
+    try:
+        message = json.loads(body).get("error", body)
+    except ValueError:
+        message = body
+    return RuntimeError(f"Search server error: {message}")
+
+def query_server(endpoint: str,
+                 payload: dict,
+                 host=DEFAULT_HOST,
+                 port=DEFAULT_PORT,
+                 timeout=120) -> dict:
+    """
+    Sends a request to a running Ask PW search server.
+
+    Parameters
+    -----------
+        endpoint (str) : server endpoint, e.g. "search" or "ask"
+        payload (dict) : JSON-serializable request body
+        host (str) : host the server is listening on
+        port (int) : port the server is listening on
+        timeout (float) : seconds to wait for a response
+
+    Returns
+    -----------
+        response (dict | None) : decoded JSON response, or None if no server
+                is reachable at the given address. Timing out after the request
+                was sent raises TimeoutError instead of falling back.
+    """
+    request = _make_request(endpoint, payload, host, port)
+
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+    except urllib.error.HTTPError as e:
+        raise _server_error(e) from e
+    except UNREACHABLE_ERRORS:
+        return None
+
+def _read_events(response):
+    with response:
+        for line in response:
+            yield json.loads(line.decode("utf-8"))
+
+def stream_server(endpoint: str,
+                  payload: dict,
+                  host=DEFAULT_HOST,
+                  port=DEFAULT_PORT,
+                  timeout=120):
+    """
+    Sends a request to a streaming endpoint of a running Ask PW search server,
+    e.g. "ask_stream", which replies with one JSON event per line.
+
+    Parameters
+    -----------
+        endpoint (str) : server endpoint
+        payload (dict) : JSON-serializable request body
+        host (str) : host the server is listening on
+        port (int) : port the server is listening on
+        timeout (float) : seconds to wait for the response and for each event
+
+    Returns
+    -----------
+        events (iterator[dict] | None) : decoded events as they arrive, or
+                None if no server is reachable at the given address. Timing out
+                after the request was sent raises TimeoutError, from the
+                iterator once the stream has started.
+    """
+    request = _make_request(endpoint, payload, host, port)
+
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        raise _server_error(e) from e
+    except UNREACHABLE_ERRORS:
+        return None
+
+    return _read_events(response)
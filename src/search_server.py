@@ -0,0 +1,321 @@
+import os
+import sys
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import helper_funcs as helper
+import doc_reader as reader
+import w2v_semantic_search as w2v
+import bm25_semantic_search as bm25
+import passage_search as passages
+import run_gpt
+import search_client
+import metrics
+from semantic_search import semsearch
+from answer_cache import AnswerCache
+from semantic_cache import SemanticCache
+from async_gpt import BackgroundGPTStreamer
+
+
+class SearchService:
+    """
+    Resident semantic search service which loads the preprocessed docs, the
+    Word2Vec vectors, and the document vector index once and answers queries from
+    memory.
+    """
+    def __init__(self,
+                 docs_path=os.path.join(helper.DATA_PATH, "docs"),
+                 vectors_path=helper.W2V_VECTORS_PATH,
+                 index_backend="flat",
+                 search_mode="w2v"):
+        self.docs_path = docs_path
+        self.search_mode = search_mode
+        self.preproc_docs = helper.read_clean_process_data(docs_path)
+        self.hyperlink_dict = reader.create_hyperlink_dict(docs_path)
+        self.w2v_model = helper.load_w2v_vectors(vectors_path)
+        self.doc_index = w2v.load_vector_index(self.preproc_docs,
+                                               self.w2v_model,
+                                               index_backend,
+                                               docs_path,
+                                               vectors_path)
+        self.vectorizer, self.tfidf_matrix, self.tfidf_index = None, None, None
+        if search_mode == "hybrid":
+            import tfidf_semantic_search as tfidf
+            self.vectorizer, self.tfidf_matrix = helper.load_tfidf()
+            self.tfidf_index = tfidf.get_inverted_index(self.tfidf_matrix)
+        self.bm25_index = bm25.load_index() if search_mode == "bm25" else None
+        self.answer_cache = AnswerCache(version=run_gpt.get_answer_cache_version(docs_path, vectors_path))
+        self.semantic_cache = SemanticCache(self.w2v_model)
+        self.gpt_streamer = BackgroundGPTStreamer()
+        self.passage_index = None
+        if search_mode == "passage":
+            self.passage_index = passages.load_passage_index(self.preproc_docs,
+                                                             self.w2v_model,
+                                                             docs_path,
+                                                             vectors_path)
+        elif search_mode == "tfidf_passage":
+            self.vectorizer, _ = helper.load_tfidf()
+            self.passage_index = passages.load_tfidf_passage_index(self.preproc_docs, self.vectorizer)
+
+    def search(self, query: str, top_k=5) -> dict:
+        """
+        Runs a semantic search for a query against the loaded docs.
+
+        Parameters
+        -----------
+            query (str) : user query
+            top_k (int) : top 'k' most relevant files to return (default: 5)
+
+        Returns
+        -----------
+            ss_docs (dict) : most relevant docs keyed by filename
+        """
+        ss_docs, _ = self.search_with_tokens(query, top_k)
+        return ss_docs
+
+    def search_with_tokens(self, query: str, top_k=5) -> tuple:
+        """
+        Runs a semantic search like `search`, and also returns the preprocessed
+        query so the answer caches can reuse it.
+
+        Parameters
+        -----------
+            query (str) : user query
+            top_k (int) : top 'k' most relevant files to return (default: 5)
+
+        Returns
+        -----------
+            ss_docs (dict) : most relevant docs keyed by filename
+            query_tokens (list[str]) : preprocessed query
+        """
+        with metrics.span("retrieval"):
+            query_tokens = helper.preprocess_query(query)
+            ss_docs = semsearch(query,
+                                self.preproc_docs,
+                                self.w2v_model,
+                                top_k=top_k,
+                                doc_index=self.doc_index,
+                                vectorizer=self.vectorizer,
+                                tfidf_matrix=self.tfidf_matrix,
+                                mode=self.search_mode,
+                                tfidf_index=self.tfidf_index,
+                                bm25_index=self.bm25_index,
+                                passage_index=self.passage_index,
+                                query_tokens=query_tokens)
+
+        return ss_docs, query_tokens
+
+    def ask(self, query: str, top_k=5) -> str:
+        """
+        Answers a query end to end with semantic search and GPT.
+
+        Parameters
+        -----------
+            query (str) : user query
+            top_k (int) : top 'k' most relevant files to use (default: 5)
+
+        Returns
+        -----------
+            answer (str) : GPT AI response with filenames as hyperlinks
+        """
+        ss_docs, query_tokens = self.search_with_tokens(query, top_k)
+        return run_gpt.answer_query(query,
+                                    ss_docs,
+                                    self.hyperlink_dict,
+                                    self.answer_cache,
+                                    self.semantic_cache,
+                                    query_tokens)
+
+    def ask_stream(self, query: str, top_k=5, timings=False):
+        """
+        Answers a query end to end like `ask`, but streams the GPT reply as it
+        is generated.
+
+        Parameters
+        -----------
+            query (str) : user query
+            top_k (int) : top 'k' most relevant files to use (default: 5)
+            timings (bool) : if True, the final event also carries the query's
+                    per-stage timings in milliseconds
+
+        Returns
+        -----------
+            (generator[dict]) : {"delta": text} events while the reply is being
+                    generated, then a final {"answer": text} event with the
+                    filenames as hyperlinks
+        """
+        with metrics.trace() as stage_timings:
+            ss_docs, query_tokens = self.search_with_tokens(query, top_k)
+
+            cached_reply = run_gpt.get_cached_answer(query,
+                                                     ss_docs,
+                                                     self.answer_cache,
+                                                     self.semantic_cache,
+                                                     query_tokens)
+            if cached_reply is not None:
+                yield {"answer": cached_reply, **({"timings": stage_timings} if timings else {})}
+                return
+
+            with metrics.span("pack_prompt"):
+                gpt_input = run_gpt.optimize_gpt_input(ss_docs)
+
+            deltas = []
+            with metrics.span("llm_call"):
+                start = time.perf_counter()
+                for delta in self.gpt_streamer.stream(query, gpt_input):
+                    if not deltas:
+                        metrics.observe("llm_first_token_seconds", time.perf_counter() - start)
+                    deltas.append(delta)
+                    yield {"delta": delta}
+
+            hyperlink_reply = run_gpt.replace_filenames_with_links("".join(deltas), self.hyperlink_dict)
+            run_gpt.store_answer(query,
+                                 ss_docs,
+                                 hyperlink_reply,
+                                 self.answer_cache,
+                                 self.semantic_cache,
+                                 query_tokens)
+
+            yield {"answer": hyperlink_reply, **({"timings": stage_timings} if timings else {})}
+
+    def close(self):
+        """
+        Saves the answers cached since the last save and stops the GPT
+        streaming loop.
+
+        Returns
+        -----------
+            (Does not return a value)
+        """
+        self.answer_cache.flush()
+        self.gpt_streamer.close()
+
+
+def make_handler(service: SearchService):
+    """
+    Creates an HTTP request handler class bound to a loaded search service.
+
+    Parameters
+    -----------
+        service (SearchService) : loaded search service to answer requests with
+
+    Returns
+    -----------
+        (type) : request handler class for the HTTP server
+    """
+    class SearchRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send_json(200, {"answer_cache": service.answer_cache.stats(),
+                                      "semantic_cache": service.semantic_cache.stats()})
+            elif self.path == "/metrics":
+                encoded = metrics.export_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+            else:
+                self._send_json(404, {"error": f"Unknown endpoint '{self.path}'."})
+
+        def do_POST(self):
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                query = payload["query"]
+                top_k = int(payload.get("top_k", 5))
+                timings = bool(payload.get("timings", False))
+
+                with metrics.trace() as stage_timings:
+                    if self.path == "/search":
+                        response = {"docs": service.search(query, top_k)}
+                    elif self.path == "/ask":
+                        response = {"answer": service.ask(query, top_k)}
+                    elif self.path == "/ask_stream":
+                        self._stream_events(service.ask_stream(query, top_k, timings))
+                        return
+                    else:
+                        self._send_json(404, {"error": f"Unknown endpoint '{self.path}'."})
+                        return
+                if timings:
+                    response["timings"] = stage_timings
+            except (KeyError, ValueError) as e:
+                self._send_json(400, {"error": f"Bad request: {e}"})
+                return
+            except Exception as e:
+                self._send_json(500, {"error": str(e)})
+                return
+
+            self._send_json(200, response)
+
+        def _stream_events(self, events):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+
+            try:
+                for event in events:
+                    self.wfile.write(f"{json.dumps(event)}\n".encode("utf-8"))
+                    self.wfile.flush()
+            except Exception as e:
+                self.wfile.write(f"{json.dumps({'error': str(e)})}\n".encode("utf-8"))
+
+        def _send_json(self, status: int, body: dict):
+            encoded = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(encoded)))
+            self.end_headers()
+            self.wfile.write(encoded)
+
+        def log_message(self, format, *args):
+            pass
+
+    return SearchRequestHandler
+
+
+def run_server(service: SearchService, host=search_client.DEFAULT_HOST, port=search_client.DEFAULT_PORT):
+    """
+    Serves a loaded search service over HTTP until interrupted, then closes
+    the service.
+
+    Parameters
+    -----------
+        service (SearchService) : loaded search service
+        host (str) : host to listen on
+        port (int) : port to listen on
+
+    Returns
+    -----------
+        (Does not return a value)
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"Ask PW search server listening on http://{host}:{port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+def main():
+    """
+    Main execution function for running the search server. Metrics are
+    enabled and served at GET /metrics in the Prometheus text format.
+    """
+    docs_path = sys.argv[1] if len(sys.argv) >= 2 else os.path.join(helper.DATA_PATH, "docs")
+    port = int(sys.argv[2]) if len(sys.argv) >= 3 else search_client.DEFAULT_PORT
+    index_backend = sys.argv[3] if len(sys.argv) >= 4 else "flat"
+    search_mode = sys.argv[4] if len(sys.argv) >= 5 else "w2v"
+
+    metrics.enable()
+    service = SearchService(docs_path, index_backend=index_backend, search_mode=search_mode)
+    run_server(service, port=port)
+
+
+if __name__ == "__main__":
+    main()
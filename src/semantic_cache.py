@@ -0,0 +1,147 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+
+import helper_funcs as helper
+import w2v_semantic_search as w2v
+from vector_index import FlatIndex
+
+DEFAULT_SIMILARITY_THRESHOLD = 0.9
+DEFAULT_MIN_DOC_OVERLAP = 0.5
+DEFAULT_MAX_ENTRIES = 500
+
+
+def doc_overlap(doc_names_a, doc_names_b) -> float:
+    """
+    Computes the Jaccard overlap of two sets of retrieved filenames.
+    """
+    doc_names_a, doc_names_b = set(doc_names_a), set(doc_names_b)
+    if not doc_names_a and not doc_names_b:
+        return 1.0
+
+    return len(doc_names_a & doc_names_b) / len(doc_names_a | doc_names_b)
+
+
+class SemanticCache:
+    """
+    In-memory cache of Ask PW answers for near-duplicate queries. Each query is
+    embedded as the unit average of its Word2Vec token vectors, and a prior
+    answer is reused when its query is at least `threshold` cosine-similar and
+    the docs retrieved for the two queries overlap by at least `min_doc_overlap`.
+    Embeddings live in a fixed-size `FlatIndex` with one slot per entry, and
+    slots are reused as the least recently used entries are evicted.
+
+    The cache is in memory, so it only pays off in a resident process such as
+    the search server; the one-shot `run_gpt` CLI only uses the persistent
+    `AnswerCache`.
+    """
+    def __init__(self,
+                 model: object,
+                 threshold=DEFAULT_SIMILARITY_THRESHOLD,
+                 min_doc_overlap=DEFAULT_MIN_DOC_OVERLAP,
+                 max_entries=DEFAULT_MAX_ENTRIES):
+        self.model = model
+        self.threshold = threshold
+        self.min_doc_overlap = min_doc_overlap
+        self.max_entries = max_entries
+        vector_size = w2v.get_keyed_vectors(model).vector_size
+        self.index = FlatIndex(vector_size,
+                               vectors=np.zeros((max_entries, vector_size), dtype=np.float32),
+                               ids=range(max_entries))
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _embed(self, query: str, query_tokens=None) -> np.ndarray:
+        if query_tokens is None:
+            query_tokens = helper.preprocess_query(query)
+        if not any(token in w2v.get_keyed_vectors(self.model) for token in query_tokens):
+            return None
+
+        return w2v.embed_tokens(query_tokens, self.model)
+
+    def get(self, query: str, doc_names, query_tokens=None) -> str:
+        """
+        Looks up the answer of a sufficiently similar prior query.
+
+        Parameters
+        -----------
+            query (str) : user query
+            doc_names (iterable[str]) : filenames retrieved by semantic search
+            query_tokens (list[str] | None) : the query already preprocessed
+                    for retrieval, to skip preprocessing it again
+
+        Returns
+        -----------
+            answer (str | None) : cached answer, or None on a miss
+        """
+        query_vector = self._embed(query, query_tokens)
+
+        with self._lock:
+            if query_vector is not None and self.entries:
+                for slot, score in self.index.search(query_vector, len(self.index)):
+                    if score < self.threshold:
+                        break
+                    entry = self.entries.get(slot)
+                    if entry is not None and doc_overlap(entry["doc_names"], doc_names) >= self.min_doc_overlap:
+                        self.entries.move_to_end(slot)
+                        self.hits += 1
+                        return entry["answer"]
+
+            self.misses += 1
+            return None
+
+    def put(self, query: str, doc_names, answer: str, query_tokens=None):
+        """
+        Stores the answer of a query, evicting the least recently used entry
+        when the cache is full.
+
+        Parameters
+        -----------
+            query (str) : user query
+            doc_names (iterable[str]) : filenames retrieved by semantic search
+            answer (str) : answer to cache
+            query_tokens (list[str] | None) : the query already preprocessed
+                    for retrieval, to skip preprocessing it again
+
+        Returns
+        -----------
+            (Does not return a value)
+        """
+        query_vector = self._embed(query, query_tokens)
+        if query_vector is None:
+            return
+
+        with self._lock:
+            if len(self.entries) >= self.max_entries:
+                slot, _ = self.entries.popitem(last=False)
+                self.evictions += 1
+            else:
+                slot = next(slot for slot in range(self.max_entries) if slot not in self.entries)
+
+            self.index.update(slot, query_vector)
+            self.entries[slot] = {"query": query, "doc_names": set(doc_names), "answer": answer}
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Reports the cache size, evictions, and hit rate.
+
+        Returns
+        -----------
+            (dict) : entries, hits, misses, evictions, and hit_rate
+        """
+        lookups = self.hits + self.misses
+        return {"entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
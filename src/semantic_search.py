@@ -1,5 +1,13 @@
+import contextvars
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+import helper_funcs as helper
 import w2v_semantic_search as w2v
-import tfidf_semantic_search as tfidf
+import bm25_semantic_search as bm25
+import passage_search as passages
+
+RRF_K = 60
 
 def get_common_files(w2v_output: list[str], tfidf_output: list[str]) -> list[str]:
     """
@@ -21,6 +29,124 @@ def get_common_files(w2v_output: list[str], tfidf_output: list[str]) -> list[str
 
     return common_files if common_files != [] else w2v_output[:3]
 
+def fuse_rankings(rankings: list[list[tuple]],
+                  method="rrf",
+                  weights=None,
+                  rrf_k=RRF_K) -> list[tuple]:
+    """
+    Fuses the ranked outputs of several retrieval backends into one ranking.
+
+    With "rrf" (reciprocal-rank fusion), each file scores the sum over backends
+    of weight / (rrf_k + rank). With "weighted", each backend's scores are
+    min-max normalized over its own candidates and summed with the weights.
+
+    Parameters
+    -----------
+        rankings (list[list[tuple]]) : (filename, score) lists, best first, one
+                per backend
+        method (str) : fusion method, "rrf" or "weighted" (default: "rrf")
+        weights (list[float] | None) : per-backend weights (default: all 1.0)
+        rrf_k (int) : reciprocal-rank fusion smoothing constant (default: 60)
+
+    Returns
+    -----------
+        fused (list[tuple]) : (filename, fused score), best first
+    """
+    weights = weights or [1.0] * len(rankings)
+    fused_scores = {}
+
+    for ranking, weight in zip(rankings, weights):
+        if not ranking:
+            continue
+
+        if method == "rrf":
+            contributions = [(file, weight / (rrf_k + rank)) for rank, (file, _) in enumerate(ranking, start=1)]
+        elif method == "weighted":
+            scores = [float(score) for _, score in ranking]
+            low, high = min(scores), max(scores)
+            spread = high - low
+            contributions = [(file, weight * ((float(score) - low) / spread if spread else 1.0))
+                             for file, score in ranking]
+        else:
+            raise ValueError(f"Unknown fusion method '{method}'.")
+
+        for file, contribution in contributions:
+            fused_scores[file] = fused_scores.get(file, 0.0) + contribution
+
+    return sorted(fused_scores.items(), key=lambda x: x[1], reverse=True)
+
+def hybrid_search(query,
+                  preproc_docs,
+                  w2v_model,
+                  vectorizer,
+                  tfidf_matrix,
+                  top_k=5,
+                  candidate_k=None,
+                  fusion="rrf",
+                  weights=None,
+                  doc_embeddings=None,
+                  doc_index=None,
+                  tfidf_index=None,
+                  query_tokens=None) -> list[tuple]:
+    """
+    Hybrid retrieval which preprocesses the query once, runs the Word2Vec and
+    TF-IDF backends concurrently on their own top candidates, and fuses their
+    rankings into a single scored ranking.
+
+    Parameters
+    -----------
+        query (str) : Inputted user question
+        preproc_docs (dict) : preprocessed documentation
+        w2v_model : pre-trained Word2Vec model or its KeyedVectors
+        vectorizer : pre-trained TF-IDF model vectorizer
+        tfidf_matrix : pre-trained TF-IDF model matrix
+        top_k (int) : top 'k' most relevant files to return (default: 5)
+        candidate_k (int | None) : candidates taken from each backend (default: top_k)
+        fusion (str) : fusion method, "rrf" or "weighted" (default: "rrf")
+        weights (list[float] | None) : [Word2Vec, TF-IDF] fusion weights
+        doc_embeddings (tuple | None) : precomputed Word2Vec (embedding_matrix, filenames)
+        doc_index (FlatIndex | IVFIndex | None) : Word2Vec vector index backend
+        tfidf_index (scipy.sparse.csc_matrix | None) : TF-IDF inverted index from
+                `tfidf_semantic_search.build_inverted_index`
+        query_tokens (list[str] | None) : the query already preprocessed with
+                `helper_funcs.preprocess_query`, to skip preprocessing it again
+
+    Returns
+    -----------
+        fused (list[tuple]) : top_k (filename, fused score), best first
+    """
+    import tfidf_semantic_search as tfidf
+
+    candidate_k = candidate_k or top_k
+    if query_tokens is None:
+        query_tokens = helper.preprocess_query(query)
+
+    def run_w2v():
+        return w2v.run_token_query(query_tokens,
+                                   preproc_docs,
+                                   w2v_model,
+                                   doc_embeddings=doc_embeddings,
+                                   top_k=candidate_k,
+                                   doc_index=doc_index)
+
+    def run_tfidf():
+        tfidf_docs = tfidf.semantic_search_tokens(query_tokens,
+                                                  preproc_docs,
+                                                  vectorizer,
+                                                  tfidf_matrix,
+                                                  top_k=candidate_k,
+                                                  inverted_index=tfidf_index)
+        return [(file, score) for file, score in tfidf_docs if score > 0]
+
+    # Each backend runs in a copy of the caller's context, so that its spans
+    # are recorded in the caller's `metrics.trace`
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        w2v_future = executor.submit(contextvars.copy_context().run, run_w2v)
+        tfidf_future = executor.submit(contextvars.copy_context().run, run_tfidf)
+        rankings = [w2v_future.result(), tfidf_future.result()]
+
+    return fuse_rankings(rankings, method=fusion, weights=weights)[:top_k]
+
 def get_file_content_from_filenames(filenames: list, docs: dict) -> dict:
     """
     Helper function that takes a list of filenames and returns a list of
@@ -41,7 +167,17 @@ def semsearch(query,
               w2v_model,
               top_k=5,
               include_score=False,
-              verbose=False):
+              verbose=False,
+              doc_embeddings=None,
+              doc_index=None,
+              vectorizer=None,
+              tfidf_matrix=None,
+              mode="w2v",
+              fusion="rrf",
+              tfidf_index=None,
+              bm25_index=None,
+              passage_index=None,
+              query_tokens=None):
     """
     Overall semantic search function which takes in a query, preprocessed
     documentation, a Word2Vec model, a TF-IDF vectorizer and matrix, and optional
@@ -53,24 +189,94 @@ def semsearch(query,
     -----------
         query (str) : Inputted user question
         preproc_docs (dict) : preprocessed documentation
-        w2v_model : pre-trained Word2Vec model
+        w2v_model : pre-trained Word2Vec model or its KeyedVectors
         vectorizer : pre-trained TF-IDF model vectorizer
         tfidf_matrix : pre-trained TF-IDF model matrix
         top_k (int) : top 'k' most relevant files to return (default: 5)
         include_score (bool) : if True, includes similarity score of file
         verbose (bool) : if True, prints files in addition to returning
+        doc_embeddings (tuple | None) : precomputed Word2Vec (embedding_matrix,
+                filenames) from `w2v_semantic_search.load_doc_embeddings`
+        doc_index (FlatIndex | IVFIndex | None) : vector index backend from
+                `w2v_semantic_search.load_vector_index`, which selects exact or
+                approximate retrieval and takes precedence over doc_embeddings
+        mode (str) : "w2v" for Word2Vec only, "bm25" for BM25 only, "passage"
+                for Word2Vec passage retrieval, "tfidf_passage" for TF-IDF
+                passage retrieval, or "hybrid" to fuse the Word2Vec and TF-IDF
+                rankings (default: "w2v")
+        fusion (str) : hybrid fusion method, "rrf" or "weighted" (default: "rrf")
+        tfidf_index (scipy.sparse.csc_matrix | None) : TF-IDF inverted index from
+                `tfidf_semantic_search.build_inverted_index`
+        bm25_index (BM25Index | None) : BM25 index from
+                `bm25_semantic_search.load_index` (required for "bm25")
+        passage_index (FlatIndex | tuple | None) : passage index from
+                `passage_search.load_passage_index` (required for "passage"),
+                or from `passage_search.load_tfidf_passage_index` (required
+                for "tfidf_passage", along with vectorizer)
+        query_tokens (list[str] | None) : the query already preprocessed with
+                `helper_funcs.preprocess_query`, to skip preprocessing it again
 
     Returns
     -----------
         common_content (dict) : the top_k most relevant files, keyed by filename
-            and corresponding to the content of those respective docs
+            and corresponding to the content of those respective docs, or in
+            the passage modes to only their best passages
     """
+    if query_tokens is None:
+        query_tokens = helper.preprocess_query(query)
+
+    if mode == "hybrid":
+        fused = hybrid_search(query,
+                              preproc_docs,
+                              w2v_model,
+                              vectorizer,
+                              tfidf_matrix,
+                              top_k=top_k,
+                              fusion=fusion,
+                              doc_embeddings=doc_embeddings,
+                              doc_index=doc_index,
+                              tfidf_index=tfidf_index,
+                              query_tokens=query_tokens)
+        if verbose:
+            print(f"Top {top_k} most relevant files to your query:\n")
+            for i, (file, score) in enumerate(fused):
+                print(f"{i + 1}. {file}: {score}" if include_score else f"{i + 1}. {file}")
+        return get_file_content_from_filenames([file for file, _ in fused], preproc_docs)
+    elif mode == "bm25":
+        bm25_output = bm25.get_relevant_files(query,
+                                              bm25_index,
+                                              top_k=top_k,
+                                              include_score=include_score,
+                                              verbose=verbose,
+                                              query_tokens=query_tokens)
+        if include_score:
+            bm25_output = [file for file, _ in bm25_output]
+        return get_file_content_from_filenames(bm25_output, preproc_docs)
+    elif mode in ("passage", "tfidf_passage"):
+        if mode == "passage":
+            search = partial(passages.search_passages, query_tokens, w2v_model, passage_index)
+        else:
+            search = partial(passages.search_tfidf_passages, query_tokens, vectorizer, passage_index)
+        passage_hits = passages.retrieve_passages(search, top_k)
+        if not passage_hits:
+            print("Your query does not match anything in our system.")
+        elif verbose:
+            print(f"Top {len(passage_hits)} most relevant passages to your query:\n")
+            for i, (passage_id, score) in enumerate(passage_hits):
+                print(f"{i + 1}. {passage_id}: {score}" if include_score else f"{i + 1}. {passage_id}")
+        return passages.pack_passages(passage_hits, preproc_docs)
+    elif mode != "w2v":
+        raise ValueError(f"Unknown semantic search mode '{mode}'.")
+
     w2v_output = w2v.get_relevant_files(query,
                                         preproc_docs,
                                         w2v_model,
                                         top_k=top_k,
                                         include_score=include_score,
-                                        verbose=verbose)
+                                        verbose=verbose,
+                                        doc_embeddings=doc_embeddings,
+                                        doc_index=doc_index,
+                                        query_tokens=query_tokens)
 
     # tfidf_output = tfidf.get_relevant_files(query,
     #                                         preproc_docs,
@@ -84,4 +290,66 @@ def semsearch(query,
 
     w2v_content = get_file_content_from_filenames(w2v_output, preproc_docs)
 
-    return w2v_content
\ No newline at end of file
+    return w2v_content
+
+def semsearch_batch(queries,
+                    preproc_docs,
+                    w2v_model=None,
+                    vectorizer=None,
+                    tfidf_matrix=None,
+                    backend="w2v",
+                    top_k=5,
+                    include_score=False,
+                    doc_embeddings=None,
+                    bm25_index=None):
+    """
+    Batched semantic search which scores many queries at once against either the
+    Word2Vec doc embeddings or the TF-IDF matrix with a single matrix product,
+    or against the BM25 index, for offline evaluation and replaying query logs.
+    Repeated queries are only preprocessed once, and every backend returns no
+    files for queries matching nothing.
+
+    Parameters
+    -----------
+        queries (list[str]) : Inputted user questions
+        preproc_docs (dict) : preprocessed documentation
+        w2v_model : pre-trained Word2Vec model or its KeyedVectors (required for "w2v")
+        vectorizer : pre-trained TF-IDF model vectorizer (required for "tfidf")
+        tfidf_matrix : pre-trained TF-IDF model matrix (required for "tfidf")
+        backend (str) : retrieval backend to use, "w2v", "tfidf", or "bm25"
+                (default: "w2v")
+        top_k (int) : top 'k' most relevant files to return per query (default: 5)
+        include_score (bool) : if True, includes similarity score of file
+        doc_embeddings (tuple | None) : precomputed Word2Vec (embedding_matrix,
+                filenames) from `w2v_semantic_search.load_doc_embeddings`
+        bm25_index (BM25Index | None) : BM25 index from
+                `bm25_semantic_search.load_index` (required for "bm25")
+
+    Returns
+    -----------
+        batch_files (list[list]) : the top_k most relevant files for each query,
+            as (filename, score) tuples if include_score is True, empty for
+            queries matching nothing
+    """
+    if backend == "w2v":
+        batch_docs = w2v.run_query_batch(queries,
+                                         preproc_docs,
+                                         w2v_model,
+                                         doc_embeddings=doc_embeddings,
+                                         top_k=top_k)
+    elif backend == "tfidf":
+        import tfidf_semantic_search as tfidf
+        batch_docs = tfidf.semantic_search_batch(queries,
+                                                 preproc_docs,
+                                                 vectorizer,
+                                                 tfidf_matrix,
+                                                 top_k=top_k)
+    elif backend == "bm25":
+        batch_docs = bm25.semantic_search_batch(queries, bm25_index, top_k)
+    else:
+        raise ValueError(f"Unknown semantic search backend '{backend}'.")
+
+    if include_score:
+        return batch_docs
+
+    return [[filename for filename, _ in similar_docs] for similar_docs in batch_docs]
@@ -1,3 +1,4 @@
+import weakref
 import numpy as np
 import scipy
 from sklearn.feature_extraction.text import TfidfVectorizer
@@ -6,12 +7,107 @@ from sklearn.metrics.pairwise import cosine_similarity
 import md_cleaner as cleaner
 import md_preprocessor as preprocessor
 import helper_funcs as helper
+import metrics
 
+# Inverted index of each live TF-IDF matrix, keyed by the matrix's id
+_inverted_indexes = {}
+
+
+def build_inverted_index(tfidf_matrix: scipy.sparse.csr_matrix) -> scipy.sparse.csc_matrix:
+    """
+    Builds an inverted index from the TF-IDF matrix by converting it to
+    column-major (CSC) form, so that the postings of each term, i.e. the
+    documents containing it and their weights, are stored contiguously.
+
+    Parameters
+    -----------
+        tfidf_matrix (scipy.sparse.csr_matrix): The L2-normalized TF-IDF matrix
+
+    Returns
+    -----------
+        inverted_index (scipy.sparse.csc_matrix): term-major copy of the matrix
+    """
+    return scipy.sparse.csc_matrix(tfidf_matrix)
+
+def get_inverted_index(tfidf_matrix: scipy.sparse.csr_matrix) -> scipy.sparse.csc_matrix:
+    """
+    Gets the inverted index of a TF-IDF matrix, building it the first time and
+    keeping it for as long as the matrix itself is alive. Call it right after
+    loading the matrix to pay the conversion up front.
+
+    Parameters
+    -----------
+        tfidf_matrix (scipy.sparse.csr_matrix): The L2-normalized TF-IDF matrix
+
+    Returns
+    -----------
+        inverted_index (scipy.sparse.csc_matrix): term-major copy of the matrix
+    """
+    key = id(tfidf_matrix)
+    inverted_index = _inverted_indexes.get(key)
+    if inverted_index is None:
+        inverted_index = _inverted_indexes[key] = build_inverted_index(tfidf_matrix)
+        weakref.finalize(tfidf_matrix, _inverted_indexes.pop, key, None)
+
+    return inverted_index
+
+def score_top_k(query_vector: scipy.sparse.csr_matrix,
+                tfidf_matrix: scipy.sparse.csr_matrix,
+                top_k: int,
+                inverted_index=None,
+                use_inverted_index=True) -> tuple:
+    """
+    Scores a TF-IDF query vector against the documents and selects the top 'k'
+    with `np.argpartition`. Both the query vector and the matrix rows are
+    L2-normalized, so their sparse dot product is the cosine similarity. Only
+    the postings of the query terms are touched in the inverted index, so the
+    cost scales with those postings rather than with the corpus size.
+
+    Parameters
+    -----------
+        query_vector (scipy.sparse.csr_matrix): (1, vocab_size) TF-IDF query vector
+        tfidf_matrix (scipy.sparse.csr_matrix): The TF-IDF matrix
+        top_k (int): number of docs to return
+        inverted_index (scipy.sparse.csc_matrix | None): from `build_inverted_index`
+                (default: the cached `get_inverted_index` of the matrix)
+        use_inverted_index (bool): if False, scores every doc with the full
+                matrix-vector product instead (default: True)
+
+    Returns
+    -----------
+        doc_indices (np.ndarray): row indices of the best matching docs, best first
+        scores (np.ndarray): cosine similarity of each returned doc
+    """
+    query_vector = scipy.sparse.csr_matrix(query_vector)
+    terms, weights = query_vector.indices, query_vector.data
+
+    if len(terms) == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0)
+
+    if use_inverted_index:
+        if inverted_index is None:
+            inverted_index = get_inverted_index(tfidf_matrix)
+        postings = inverted_index[:, terms]
+        contributions = postings.data * np.repeat(weights, np.diff(postings.indptr))
+        doc_indices, inverse = np.unique(postings.indices, return_inverse=True)
+        scores = np.bincount(inverse, weights=contributions)
+        metrics.inc("docs_scored", len(doc_indices))
+    else:
+        all_scores = np.asarray((tfidf_matrix @ query_vector.T).todense()).ravel()
+        doc_indices = np.flatnonzero(all_scores)
+        scores = all_scores[doc_indices]
+        metrics.inc("docs_scored", tfidf_matrix.shape[0])
+
+    best_indices = helper.top_k_indices(scores, top_k)
+
+    return doc_indices[best_indices], scores[best_indices]
 
 def semantic_search(query: str,
                     preproc_docs: dict,
                     vectorizer: TfidfVectorizer,
-                    tfidf_matrix: scipy.sparse.csr_matrix) -> list[str]:
+                    tfidf_matrix: scipy.sparse.csr_matrix,
+                    top_k=None,
+                    inverted_index=None) -> list[str]:
     """
     Runs a semantic search with a query on inputted docs based on the TF-IDF
     model for numerical representation of words
@@ -23,30 +119,114 @@ def semantic_search(query: str,
                 values corresponding to the file content in tokenized form
         vectorizer (TfidfVectorizer): The initialized TF-IDF vectorizer
         tfidf_matrix (scipy.sparse.csr_matrix): The TF-IDF matrix
+        top_k (int | None): number of docs to return, all if None
+        inverted_index (scipy.sparse.csc_matrix | None): from `build_inverted_index`
 
     Returns
     -----------
         results (list): List of tuples containing similar documents and their similarity scores
     """
-    corrected_query = cleaner.correct_spelling(query)
-    cp_query = helper.clean_and_preproc_data(corrected_query)
-    query_vector = vectorizer.transform([" ".join(cp_query)])
-    
-    similarity_scores = cosine_similarity(query_vector, tfidf_matrix)
-    sorted_indexes = np.argsort(similarity_scores, axis=1)[0][::-1]
+    cp_query = helper.preprocess_query(query)
 
+    return semantic_search_tokens(cp_query, preproc_docs, vectorizer, tfidf_matrix, top_k, inverted_index)
+
+def semantic_search_tokens(query_tokens: list[str],
+                           preproc_docs: dict,
+                           vectorizer: TfidfVectorizer,
+                           tfidf_matrix: scipy.sparse.csr_matrix,
+                           top_k=None,
+                           inverted_index=None) -> list[tuple]:
+    """
+    Runs a semantic search for already preprocessed query tokens on inputted
+    docs based on the TF-IDF model. With top_k, only docs sharing at least one
+    term with the query are scored and at most top_k of them are returned;
+    otherwise every doc is ranked.
+
+    Parameters
+    -----------
+        query_tokens (list[str]): preprocessed query tokens
+        preproc_docs (dict): preprocessed documents, keyed by filename with
+                values corresponding to the file content in tokenized form
+        vectorizer (TfidfVectorizer): The initialized TF-IDF vectorizer
+        tfidf_matrix (scipy.sparse.csr_matrix): The TF-IDF matrix
+        top_k (int | None): number of docs to return, all if None
+        inverted_index (scipy.sparse.csc_matrix | None): from `build_inverted_index`
+
+    Returns
+    -----------
+        results (list): List of tuples containing similar documents and their similarity scores
+    """
+    query_vector = vectorizer.transform([" ".join(query_tokens)])
     filenames = list(preproc_docs.keys())
-    similar_docs = [(filenames[i], similarity_scores[0][i]) for i in sorted_indexes]
+
+    if top_k is not None:
+        doc_indices, scores = score_top_k(query_vector, tfidf_matrix, top_k, inverted_index)
+        return [(filenames[i], score) for i, score in zip(doc_indices, scores)]
+
+    similarity_scores = cosine_similarity(query_vector, tfidf_matrix)[0]
+    sorted_indexes = helper.top_k_indices(similarity_scores)
+
+    similar_docs = [(filenames[i], similarity_scores[i]) for i in sorted_indexes]
 
     return similar_docs
 
+def semantic_search_batch(queries: list[str],
+                          preproc_docs: dict,
+                          vectorizer: TfidfVectorizer,
+                          tfidf_matrix: scipy.sparse.csr_matrix,
+                          top_k=5,
+                          inverted_index=None) -> list[list[tuple]]:
+    """
+    Runs a semantic search for a batch of queries at once by transforming all
+    queries into one sparse query matrix and scoring it against the inverted
+    index with a single sparse-sparse matrix product, which only touches the
+    postings of the query terms. Repeated queries are only preprocessed once,
+    and as in `semantic_search`, docs sharing no terms with a query are not
+    returned for it.
+
+    Parameters
+    -----------
+        queries (list[str]): the query strings
+        preproc_docs (dict): preprocessed documents, keyed by filename with
+                values corresponding to the file content in tokenized form
+        vectorizer (TfidfVectorizer): The initialized TF-IDF vectorizer
+        tfidf_matrix (scipy.sparse.csr_matrix): The TF-IDF matrix
+        top_k (int): number of docs to return per query (default: 5)
+        inverted_index (scipy.sparse.csc_matrix | None): from `build_inverted_index`
+                (default: the cached `get_inverted_index` of the matrix)
+
+    Returns
+    -----------
+        batch_docs (list[list[tuple]]): (filename, score) of the most similar
+                docs for each query, empty for queries matching nothing
+    """
+    if inverted_index is None:
+        inverted_index = get_inverted_index(tfidf_matrix)
+
+    cp_queries = helper.preprocess_query_batch(queries)
+    query_matrix = vectorizer.transform([" ".join(cp_query) for cp_query in cp_queries])
+
+    similarity_scores = scipy.sparse.csr_matrix(query_matrix @ inverted_index.T)
+    metrics.inc("docs_scored", similarity_scores.nnz)
+
+    filenames = list(preproc_docs.keys())
+    batch_docs = []
+    for i in range(similarity_scores.shape[0]):
+        start, end = similarity_scores.indptr[i], similarity_scores.indptr[i + 1]
+        doc_indices, scores = similarity_scores.indices[start:end], similarity_scores.data[start:end]
+        batch_docs.append([(filenames[doc_indices[j]], scores[j])
+                           for j in helper.top_k_indices(scores, top_k) if scores[j] > 0])
+
+    return batch_docs
+
 def get_relevant_files(query: str,
                        preproc_docs: dict,
                        vectorizer: TfidfVectorizer,
                        tfidf_matrix: scipy.sparse.csr_matrix,
                        top_k=5,
                        include_score=False,
-                       verbose=False) -> list[str]:
+                       verbose=False,
+                       inverted_index=None) -> list[str]:
     """
     Gets the top 'k' relevant files from an inputted query. Defaults to top
     5 most relevant files.
@@ -61,14 +241,14 @@ def get_relevant_files(query: str,
         top_k (int) : top 'k' most relevant files to return (default: 5)
         include_score (bool) : if True, includes similarity score of file
         verbose (bool) : if True, prints files in addition to returning
+        inverted_index (scipy.sparse.csc_matrix | None): from `build_inverted_index`
 
     Returns
     -----------
         rel_files (list) : top 'k' most relevant files
     """
-    try:
-        similar_docs = semantic_search(query, preproc_docs, vectorizer, tfidf_matrix)
-    except TypeError:
+    similar_docs = semantic_search(query, preproc_docs, vectorizer, tfidf_matrix, top_k, inverted_index)
+    if not similar_docs:
         print("Your query does not match anything in our system.")
         return []
 
@@ -0,0 +1,77 @@
+import os
+import sys
+from collections import Counter
+
+import md_cleaner as cleaner
+import md_preprocessor as preprocessor
+import helper_funcs as helper
+from cleaner_benchmark import load_texts, measure_throughput, DEFAULT_REPEATS
+
+NUM_EXAMPLES = 10
+
+
+def compare_tokenizers(cleaned_texts: list[str]) -> dict:
+    """
+    Compares the fast tokenizer against NLTK's word_tokenize on cleaned texts.
+
+    Parameters
+    -----------
+        cleaned_texts (list[str]) : texts cleaned by `md_cleaner.clean_str`
+
+    Returns
+    -----------
+        (dict) : the share of texts with identical token lists, the share of
+                NLTK tokens also produced by the fast tokenizer, and the most
+                common tokens only one of the tokenizers produced
+    """
+    identical_texts = 0
+    num_nltk_tokens, num_shared_tokens = 0, 0
+    nltk_only, fast_only = Counter(), Counter()
+
+    for text in cleaned_texts:
+        nltk_tokens = preprocessor.tokenize_str(text, "nltk")
+        fast_tokens = preprocessor.tokenize_str(text, "fast")
+        if nltk_tokens == fast_tokens:
+            identical_texts += 1
+
+        nltk_counts, fast_counts = Counter(nltk_tokens), Counter(fast_tokens)
+        num_nltk_tokens += len(nltk_tokens)
+        num_shared_tokens += sum((nltk_counts & fast_counts).values())
+        nltk_only.update(nltk_counts - fast_counts)
+        fast_only.update(fast_counts - nltk_counts)
+
+    return {"num_texts": len(cleaned_texts),
+            "text_agreement": identical_texts / max(len(cleaned_texts), 1),
+            "token_agreement": num_shared_tokens / max(num_nltk_tokens, 1),
+            "nltk_only": nltk_only.most_common(NUM_EXAMPLES),
+            "fast_only": fast_only.most_common(NUM_EXAMPLES)}
+
+def main():
+    """
+    Main execution function for the tokenizer agreement report and speed
+    comparison.
+    Usage: python tokenizer_benchmark.py [docs] [repeats]
+    """
+    docs_path = os.path.join(helper.DATA_PATH, sys.argv[1] if len(sys.argv) >= 2 else "docs")
+    repeats = int(sys.argv[2]) if len(sys.argv) >= 3 else DEFAULT_REPEATS
+
+    helper.check_nltk_data()
+    cleaned_texts = [cleaner.clean_str(text) for text in load_texts(docs_path)]
+
+    report = compare_tokenizers(cleaned_texts)
+    print(f"Identical token lists: {report['text_agreement']:.2%} of {report['num_texts']} texts")
+    print(f"NLTK tokens also produced by the fast tokenizer: {report['token_agreement']:.4%}")
+    for name in ("nltk_only", "fast_only"):
+        if report[name]:
+            print(f"Most common {name} tokens: {report[name]}")
+
+    print(f"\n{'stage':<22}{'nltk MB/s':>12}{'fast MB/s':>12}{'speedup':>10}")
+    for name, func in (("tokenize_str", preprocessor.tokenize_str),
+                       ("preprocess_str", preprocessor.preprocess_str)):
+        nltk = measure_throughput(lambda text: func(text, "nltk"), cleaned_texts, repeats)
+        fast = measure_throughput(lambda text: func(text, "fast"), cleaned_texts, repeats)
+        print(f"{name:<22}{nltk:>12.1f}{fast:>12.1f}{fast / nltk:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+import sys
+import os
+import json
+import hashlib
+import numpy as np
+import scipy.sparse
+from sklearn.preprocessing import normalize
+
+import helper_funcs as helper
+import w2v_semantic_search as w2v
+import create_w2v_model
+import create_tfidf_model
+
+MANIFEST_VERSION = 1
+MANIFEST_PATH = os.path.join(create_w2v_model.MODEL_PATH, "docs_manifest.json")
+W2V_MODEL_PATH = os.path.join(create_w2v_model.MODEL_PATH, "word2vec_model.bin")
+TFIDF_VECTORIZER_PATH = os.path.join(create_tfidf_model.MODEL_PATH, "tfidf_vectorizer.pkl")
+TFIDF_MATRIX_PATH = os.path.join(create_tfidf_model.MODEL_PATH, "tfidf_matrix.pkl")
+FULL_REBUILD_INTERVAL = 20
+MAX_DELTA_FRACTION = 0.5
+
+
+def hash_tokens(tokens: list[str]) -> str:
+    return hashlib.sha1("\0".join(tokens).encode()).hexdigest()
+
+def get_models_state() -> dict:
+    """
+    Records the modification time and size of the saved models, so an update
+    can tell whether they were rebuilt outside of this script.
+    """
+    state = {}
+    for path in (W2V_MODEL_PATH, TFIDF_VECTORIZER_PATH, TFIDF_MATRIX_PATH):
+        stat = os.stat(path)
+        state[os.path.basename(path)] = f"{stat.st_mtime_ns}:{stat.st_size}"
+
+    return state
+
+def load_manifest(manifest_path=MANIFEST_PATH) -> dict:
+    """
+    Loads the docs manifest written by the last model build or update.
+
+    Parameters
+    -----------
+        manifest_path (str) : path to the manifest file
+
+    Returns
+    -----------
+        manifest (dict | None) : manifest, or None if it is missing or unreadable
+    """
+    if not os.path.exists(manifest_path):
+        return None
+
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    return manifest if manifest.get("version") == MANIFEST_VERSION else None
+
+def save_manifest(preproc_docs: dict, docs_path: str, updates_since_rebuild: int, manifest_path=MANIFEST_PATH):
+    """
+    Writes the docs manifest: a content hash of every preprocessed doc, in the
+    row order of the saved TF-IDF matrix, plus the state of the saved models.
+    """
+    manifest = {"version": MANIFEST_VERSION,
+                "docs_path": os.path.abspath(docs_path),
+                "docs": {filename: hash_tokens(tokens) for filename, tokens in preproc_docs.items()},
+                "models": get_models_state(),
+                "updates_since_rebuild": updates_since_rebuild}
+
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+def diff_docs(manifest: dict, preproc_docs: dict) -> tuple:
+    """
+    Compares the current docs against the manifest.
+
+    Parameters
+    -----------
+        manifest (dict) : manifest from the last build or update
+        preproc_docs (dict) : current preprocessed docs
+
+    Returns
+    -----------
+        added (list[str]) : filenames of new docs
+        changed (list[str]) : filenames of docs whose content changed
+        removed (list[str]) : filenames of docs that no longer exist
+    """
+    old_hashes = manifest["docs"]
+    added, changed = [], []
+    for filename, tokens in preproc_docs.items():
+        if filename not in old_hashes:
+            added.append(filename)
+        elif old_hashes[filename] != hash_tokens(tokens):
+            changed.append(filename)
+    removed = [filename for filename in old_hashes if filename not in preproc_docs]
+
+    return added, changed, removed
+
+def update_w2v(preproc_docs: dict, docs_path: str, delta: list[str]):
+    """
+    Continues training the saved Word2Vec model on only the added and changed
+    docs, then recomputes only their document embedding rows and drops the
+    rows of removed docs. The rows of unchanged docs drift slightly from the
+    continued training until the next full rebuild.
+
+    Parameters
+    -----------
+        preproc_docs (dict) : current preprocessed docs
+        docs_path (str) : path to documentation folder
+        delta (list[str]) : filenames of the added and changed docs
+
+    Returns
+    -----------
+        (Does not return a value)
+    """
+    model = helper.load_w2v(W2V_MODEL_PATH)
+
+    delta_corpus = [preproc_docs[filename] for filename in delta]
+    if delta_corpus:
+        model.build_vocab(delta_corpus, update=True)
+        model.train(delta_corpus, total_examples=len(delta_corpus), epochs=model.epochs)
+
+    embeddings_path = os.path.join(create_w2v_model.MODEL_PATH, w2v.DOC_EMBEDDINGS_FILE)
+    index_path = os.path.join(create_w2v_model.MODEL_PATH, w2v.DOC_EMBEDDINGS_INDEX_FILE)
+    with open(index_path, "r") as f:
+        old_rows = {filename: i for i, filename in enumerate(json.load(f)["filenames"])}
+    old_matrix = np.load(embeddings_path, mmap_mode='r')
+
+    delta_matrix, delta_filenames = w2v.create_doc_embedding_matrix({f: preproc_docs[f] for f in delta}, model)
+    delta_rows = {filename: i for i, filename in enumerate(delta_filenames)}
+    delta = set(delta)
+
+    filenames, rows = [], []
+    for filename in preproc_docs:
+        if filename in delta_rows:
+            rows.append(delta_matrix[delta_rows[filename]])
+        elif filename in old_rows and filename not in delta:
+            rows.append(old_matrix[old_rows[filename]])
+        else:
+            continue
+        filenames.append(filename)
+
+    embedding_matrix = np.array(rows, dtype=np.float32).reshape(len(rows), model.wv.vector_size)
+    create_w2v_model.save_model(model, preproc_docs, docs_path, embedding_matrix, filenames)
+
+def update_tfidf(preproc_docs: dict, old_filenames: list[str], delta: list[str]):
+    """
+    Updates the saved TF-IDF matrix in place of a refit. Only the added and
+    changed docs are vectorized, while the rows of unchanged docs are reused.
+    The IDF statistics are recomputed from the new document frequencies, and
+    every row is rescaled to them, which is exact because each stored row is
+    the l2-normalized product of the doc's term frequencies and the IDF.
+    Terms outside the fitted vocabulary are ignored until the next full rebuild.
+
+    Parameters
+    -----------
+        preproc_docs (dict) : current preprocessed docs
+        old_filenames (list[str]) : filename of each row of the saved matrix
+        delta (list[str]) : filenames of the added and changed docs
+
+    Returns
+    -----------
+        (Does not return a value)
+    """
+    vectorizer, tfidf_matrix = helper.load_tfidf(TFIDF_VECTORIZER_PATH, TFIDF_MATRIX_PATH)
+    tfidf_matrix = tfidf_matrix.tocsr()
+
+    old_rows = {filename: i for i, filename in enumerate(old_filenames)}
+    delta_rows = {filename: i for i, filename in enumerate(delta)}
+    delta_matrix = vectorizer.transform(" ".join(preproc_docs[filename]) for filename in delta)
+
+    stacked = scipy.sparse.vstack([tfidf_matrix, delta_matrix]).tocsr()
+    order = [len(old_filenames) + delta_rows[filename] if filename in delta_rows else old_rows[filename]
+             for filename in preproc_docs]
+    stacked = stacked[order]
+
+    old_idf = vectorizer.idf_
+    doc_freqs = np.bincount(stacked.indices, minlength=len(old_idf))
+    num_docs = stacked.shape[0]
+    if vectorizer.smooth_idf:
+        new_idf = np.log((1 + num_docs) / (1 + doc_freqs)) + 1
+    else:
+        new_idf = np.log(num_docs / np.maximum(doc_freqs, 1)) + 1
+
+    rescaled = normalize(stacked @ scipy.sparse.diags(new_idf / old_idf), norm=vectorizer.norm, copy=False)
+    vectorizer.idf_ = new_idf
+
+    create_tfidf_model.save_vectorizer(vectorizer, scipy.sparse.csr_matrix(rescaled))
+
+def full_rebuild(preproc_docs: dict, docs_path: str, workers=None):
+    """
+    Rebuilds the Word2Vec and TF-IDF models from scratch.
+    """
+    model = create_w2v_model.create_model(preproc_docs)
+    create_w2v_model.save_model(model, preproc_docs, docs_path)
+
+    vectorizer, tfidf_matrix = create_tfidf_model.initialize_vectorizer(docs_path, workers)
+    create_tfidf_model.save_vectorizer(vectorizer, tfidf_matrix)
+
+def update_models(docs_path: str, workers=None, force_full=False, verbose=True) -> str:
+    """
+    Brings the saved models up to date with the docs. Added, changed, and
+    removed docs are detected against the manifest, and only that delta is
+    applied to the models. A full rebuild is done instead when there is no
+    usable manifest, the models were rebuilt outside of this script, the delta
+    covers more than MAX_DELTA_FRACTION of the docs, or FULL_REBUILD_INTERVAL
+    incremental updates have accumulated since the last full rebuild.
+
+    Parameters
+    -----------
+        docs_path (str) : path to documentation folder
+        workers (int | None) : number of worker processes used to ingest the
+                docs, all CPU cores if None
+        force_full (bool) : if True, always does a full rebuild
+        verbose (bool) : if True, prints what was updated
+
+    Returns
+    -----------
+        (str) : "full", "incremental", or "unchanged"
+    """
+    helper.check_nltk_data()
+    preproc_docs = helper.read_clean_process_data(docs_path,
+                                                  cache_path=create_w2v_model.PREPROC_CACHE_PATH,
+                                                  workers=workers)
+
+    manifest = load_manifest()
+    needs_full = (force_full
+                  or manifest is None
+                  or manifest["docs_path"] != os.path.abspath(docs_path)
+                  or manifest["updates_since_rebuild"] >= FULL_REBUILD_INTERVAL)
+    if not needs_full:
+        try:
+            needs_full = manifest["models"] != get_models_state()
+        except FileNotFoundError:
+            needs_full = True
+
+    if not needs_full:
+        added, changed, removed = diff_docs(manifest, preproc_docs)
+        num_delta = len(added) + len(changed) + len(removed)
+        if num_delta == 0:
+            if verbose:
+                print("Docs are unchanged. Models are up to date.")
+            return "unchanged"
+        needs_full = num_delta > MAX_DELTA_FRACTION * max(len(manifest["docs"]), 1)
+
+    if needs_full:
+        full_rebuild(preproc_docs, docs_path, workers)
+        save_manifest(preproc_docs, docs_path, 0)
+        if verbose:
+            print(f"Rebuilt the models from scratch on {len(preproc_docs)} docs.")
+        return "full"
+
+    delta = added + changed
+    update_w2v(preproc_docs, docs_path, delta)
+    update_tfidf(preproc_docs, list(manifest["docs"]), delta)
+    save_manifest(preproc_docs, docs_path, manifest["updates_since_rebuild"] + 1)
+
+    if verbose:
+        print(f"Updated the models incrementally: {len(added)} added, "
+              f"{len(changed)} changed, {len(removed)} removed docs.")
+    return "incremental"
+
+def main():
+    """
+    Main execution function for updating the models after the docs change.
+    Usage: python update_models.py [docs] [workers] [--full]
+    """
+    args = [arg for arg in sys.argv[1:] if arg != "--full"]
+    force_full = len(args) < len(sys.argv) - 1
+
+    input_docs_path = args[0] if len(args) >= 1 else "docs"
+    docs_path = os.path.join(create_w2v_model.DATA_PATH, input_docs_path)
+    workers = int(args[1]) if len(args) >= 2 else None
+
+    update_models(docs_path, workers, force_full)
+
+
+if __name__ == "__main__":
+    main()
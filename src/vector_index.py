@@ -0,0 +1,333 @@
+import os
+import json
+import numpy as np
+
+import helper_funcs as helper
+
+VECTORS_FILE = "vectors.npy"
+CENTROIDS_FILE = "centroids.npy"
+ASSIGNMENTS_FILE = "assignments.npy"
+META_FILE = "index_meta.json"
+
+
+class FlatIndex:
+    """
+    Exact vector index which scores a query against every stored vector with a
+    single matrix-vector product. Vectors are expected to be unit-length so
+    that the inner product is the cosine similarity.
+    """
+    kind = "flat"
+
+    def __init__(self, dim: int, vectors=None, ids=None):
+        self.dim = dim
+        self.vectors = np.empty((0, dim), dtype=np.float32) if vectors is None else vectors
+        self.ids = [] if ids is None else list(ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def build(self, vectors: np.ndarray, ids: list):
+        """
+        Builds the index from scratch on a set of vectors.
+
+        Parameters
+        -----------
+            vectors (np.ndarray) : (num_vectors, dim) unit-length vectors
+            ids (list) : identifier of each vector, e.g. its filename
+
+        Returns
+        -----------
+            self (FlatIndex) : the built index
+        """
+        self.vectors = np.empty((0, self.dim), dtype=np.float32)
+        self.ids = []
+        self.add(vectors, ids)
+
+        return self
+
+    def add(self, vectors: np.ndarray, ids: list):
+        """
+        Incrementally adds vectors to the index.
+
+        Parameters
+        -----------
+            vectors (np.ndarray) : (num_vectors, dim) unit-length vectors
+            ids (list) : identifier of each vector
+
+        Returns
+        -----------
+            (Does not return a value)
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if len(vectors) != len(ids):
+            raise ValueError("The number of vectors and ids must match.")
+
+        self.vectors = np.concatenate([self.vectors, vectors])
+        self.ids.extend(ids)
+
+    def update(self, position: int, vector: np.ndarray):
+        """
+        Overwrites a stored vector in place, keeping its id, e.g. to reuse the
+        slot of an evicted entry.
+
+        Parameters
+        -----------
+            position (int) : row of the vector to overwrite
+            vector (np.ndarray) : new unit-length vector
+
+        Returns
+        -----------
+            (Does not return a value)
+        """
+        self.vectors[position] = vector
+
+    def search(self, query: np.ndarray, top_k=5) -> list[tuple]:
+        """
+        Finds the stored vectors most similar to a query vector.
+
+        Parameters
+        -----------
+            query (np.ndarray) : unit-length query vector
+            top_k (int) : number of results to return (default: 5)
+
+        Returns
+        -----------
+            results (list[tuple]) : (id, score) of the best matches, best first
+        """
+        return self.search_with_count(query, top_k)[0]
+
+    def search_with_count(self, query: np.ndarray, top_k=5) -> tuple:
+        """
+        Same as `search`, but also reports how many stored vectors were
+        scored, e.g. for the docs_scored metric.
+
+        Returns
+        -----------
+            results (list[tuple]) : (id, score) of the best matches, best first
+            num_scored (int) : number of vectors the query was scored against
+        """
+        scores = self.vectors @ np.asarray(query, dtype=np.float32)
+        best_indices = helper.top_k_indices(scores, top_k)
+
+        return [(self.ids[i], scores[i]) for i in best_indices], len(scores)
+
+    def _meta(self) -> dict:
+        return {"kind": self.kind, "dim": self.dim, "ids": self.ids}
+
+    def save(self, index_dir: str):
+        """
+        Saves the index into a directory as `.npy` arrays plus a JSON metadata file.
+
+        Parameters
+        -----------
+            index_dir (str) : directory to save the index into
+
+        Returns
+        -----------
+            (Does not return a value)
+        """
+        if not os.path.exists(index_dir):
+            os.makedirs(index_dir)
+
+        np.save(os.path.join(index_dir, VECTORS_FILE), np.ascontiguousarray(self.vectors, dtype=np.float32))
+
+        with open(os.path.join(index_dir, META_FILE), "w") as f:
+            json.dump(self._meta(), f)
+
+    @classmethod
+    def _from_saved(cls, meta: dict, index_dir: str, mmap_mode):
+        vectors = np.load(os.path.join(index_dir, VECTORS_FILE), mmap_mode=mmap_mode)
+        return cls(meta["dim"], vectors=vectors, ids=meta["ids"])
+
+
+class IVFIndex(FlatIndex):
+    """
+    Approximate inverted-file (IVF) vector index. Vectors are clustered with
+    spherical k-means into `n_lists` lists, and a query is only scored against
+    the vectors in its `n_probe` closest lists.
+    """
+    kind = "ivf"
+
+    def __init__(self, dim: int, n_lists=None, n_probe=8, n_iter=20, seed=0,
+                 vectors=None, ids=None, centroids=None, assignments=None):
+        super().__init__(dim, vectors, ids)
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.seed = seed
+        self.centroids = centroids
+        self.assignments = np.empty(0, dtype=np.int32) if assignments is None else assignments
+        self._lists = None
+
+    def train(self, vectors: np.ndarray):
+        """
+        Trains the list centroids with spherical k-means on a sample of vectors.
+
+        Parameters
+        -----------
+            vectors (np.ndarray) : (num_vectors, dim) unit-length training vectors
+
+        Returns
+        -----------
+            (Does not return a value)
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        rng = np.random.default_rng(self.seed)
+
+        n_lists = self.n_lists or max(1, int(4 * np.sqrt(len(vectors))))
+        n_lists = min(n_lists, len(vectors))
+
+        max_samples = 256 * n_lists
+        if len(vectors) > max_samples:
+            vectors = vectors[rng.choice(len(vectors), max_samples, replace=False)]
+
+        centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+
+        for _ in range(self.n_iter):
+            assignments = self._assign(vectors, centroids)
+            order = np.argsort(assignments, kind='stable')
+            counts = np.bincount(assignments, minlength=n_lists)
+            nonempty = np.flatnonzero(counts)
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[nonempty]
+
+            centroids[nonempty] = np.add.reduceat(vectors[order], starts, axis=0)
+            empty = np.flatnonzero(counts == 0)
+            if len(empty):
+                centroids[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            centroids /= np.maximum(norms, np.finfo(np.float32).eps)
+
+        self.n_lists = n_lists
+        self.centroids = centroids
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray, chunk_size=65536) -> np.ndarray:
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), chunk_size):
+            chunk = vectors[start:start + chunk_size]
+            assignments[start:start + chunk_size] = np.argmax(chunk @ centroids.T, axis=1)
+
+        return assignments
+
+    def build(self, vectors: np.ndarray, ids: list):
+        self.vectors = np.empty((0, self.dim), dtype=np.float32)
+        self.ids = []
+        self.assignments = np.empty(0, dtype=np.int32)
+        self.train(vectors)
+        self.add(vectors, ids)
+
+        return self
+
+    def add(self, vectors: np.ndarray, ids: list):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if self.centroids is None:
+            self.train(vectors)
+
+        super().add(vectors, ids)
+        self.assignments = np.concatenate([self.assignments, self._assign(vectors, self.centroids)])
+        self._lists = None
+
+    def _get_lists(self) -> tuple:
+        """
+        Groups the stored vectors by list so each list is one contiguous slice,
+        reordering the vectors only if they are not already grouped.
+        """
+        if self._lists is None:
+            if np.any(np.diff(self.assignments) < 0):
+                order = np.argsort(self.assignments, kind='stable')
+                self.vectors = np.ascontiguousarray(self.vectors[order])
+                self.assignments = self.assignments[order]
+                self.ids = [self.ids[i] for i in order]
+
+            counts = np.bincount(self.assignments, minlength=self.n_lists)
+            self._lists = np.concatenate([[0], np.cumsum(counts)])
+
+        return self._lists
+
+    def search_with_count(self, query: np.ndarray, top_k=5) -> tuple:
+        if len(self) == 0:
+            return [], 0
+
+        query = np.asarray(query, dtype=np.float32)
+        offsets = self._get_lists()
+
+        probed_lists = helper.top_k_indices(self.centroids @ query, self.n_probe)
+        ranges = [(offsets[i], offsets[i + 1]) for i in probed_lists if offsets[i + 1] > offsets[i]]
+        if not ranges:
+            return [], 0
+
+        candidates = np.concatenate([np.arange(start, end) for start, end in ranges])
+        scores = np.concatenate([self.vectors[start:end] @ query for start, end in ranges])
+        best_indices = helper.top_k_indices(scores, top_k)
+
+        return [(self.ids[candidates[i]], scores[i]) for i in best_indices], len(candidates)
+
+    def _meta(self) -> dict:
+        meta = super()._meta()
+        meta.update({"n_lists": self.n_lists, "n_probe": self.n_probe, "n_iter": self.n_iter, "seed": self.seed})
+        return meta
+
+    def save(self, index_dir: str):
+        self._get_lists()
+        super().save(index_dir)
+        np.save(os.path.join(index_dir, CENTROIDS_FILE), self.centroids)
+        np.save(os.path.join(index_dir, ASSIGNMENTS_FILE), self.assignments)
+
+    @classmethod
+    def _from_saved(cls, meta: dict, index_dir: str, mmap_mode):
+        return cls(meta["dim"],
+                   n_lists=meta["n_lists"],
+                   n_probe=meta["n_probe"],
+                   n_iter=meta["n_iter"],
+                   seed=meta["seed"],
+                   vectors=np.load(os.path.join(index_dir, VECTORS_FILE), mmap_mode=mmap_mode),
+                   ids=meta["ids"],
+                   centroids=np.load(os.path.join(index_dir, CENTROIDS_FILE)),
+                   assignments=np.load(os.path.join(index_dir, ASSIGNMENTS_FILE)))
+
+
+INDEX_TYPES = {FlatIndex.kind: FlatIndex, IVFIndex.kind: IVFIndex}
+
+
+def create_index(kind: str, dim: int, **params):
+    """
+    Creates an empty vector index of the given kind.
+
+    Parameters
+    -----------
+        kind (str) : index backend, "flat" (exact) or "ivf" (approximate)
+        dim (int) : dimensionality of the indexed vectors
+        params : backend-specific parameters, e.g. `n_lists` and `n_probe` for "ivf"
+
+    Returns
+    -----------
+        (FlatIndex | IVFIndex) : empty vector index
+    """
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown vector index backend '{kind}'. Choose from {list(INDEX_TYPES)}.")
+
+    return INDEX_TYPES[kind](dim, **params)
+
+
+def load_index(index_dir: str, mmap_mode='r'):
+    """
+    Loads a saved vector index, memory-mapping its vectors by default.
+
+    Parameters
+    -----------
+        index_dir (str) : directory the index was saved into
+        mmap_mode (str | None) : `np.load` memory-map mode for the vectors
+
+    Returns
+    -----------
+        (FlatIndex | IVFIndex) : loaded vector index
+    """
+    meta_path = os.path.join(index_dir, META_FILE)
+    if not os.path.exists(meta_path):
+        raise FileNotFoundError(f"The vector index '{index_dir}' does not exist.")
+
+    with open(meta_path, "r") as f:
+        meta = json.load(f)
+
+    return INDEX_TYPES[meta["kind"]]._from_saved(meta, index_dir, mmap_mode)
@@ -0,0 +1,127 @@
+import sys
+import json
+import time
+import numpy as np
+
+import vector_index
+
+
+def make_synthetic_vectors(num_vectors: int, dim: int, num_topics=256, noise=0.35, seed=0) -> np.ndarray:
+    """
+    Generates unit-length vectors clustered around random topic directions,
+    which mimics the structure of averaged document embeddings.
+
+    Parameters
+    -----------
+        num_vectors (int) : number of vectors to generate
+        dim (int) : dimensionality of the vectors
+        num_topics (int) : number of topic directions to cluster around
+        noise (float) : scale of the per-vector noise around its topic
+        seed (int) : random seed
+
+    Returns
+    -----------
+        vectors (np.ndarray) : (num_vectors, dim) float32 unit vectors
+    """
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((num_topics, dim)).astype(np.float32)
+    topics /= np.linalg.norm(topics, axis=1, keepdims=True)
+
+    vectors = topics[rng.integers(num_topics, size=num_vectors)]
+    vectors = vectors + noise * rng.standard_normal((num_vectors, dim)).astype(np.float32) / np.sqrt(dim)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    return vectors
+
+
+def time_searches(index, queries: np.ndarray, top_k: int) -> tuple:
+    """
+    Runs every query against an index and times each search.
+
+    Returns
+    -----------
+        results (list[set]) : ids of the top 'k' results for each query
+        latencies (np.ndarray) : per-query latency in milliseconds
+    """
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = index.search(query, top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append({doc_id for doc_id, _ in hits})
+
+    return results, np.array(latencies)
+
+
+def run_report(num_vectors=100000, dim=300, num_queries=200, top_k=10, n_probes=(1, 4, 8, 16, 32)) -> dict:
+    """
+    Compares the recall and latency of the approximate IVF backend against the
+    exact flat backend on a synthetic corpus.
+
+    Parameters
+    -----------
+        num_vectors (int) : number of indexed vectors
+        dim (int) : dimensionality of the vectors
+        num_queries (int) : number of queries to run
+        top_k (int) : number of results per query
+        n_probes (tuple[int]) : IVF `n_probe` settings to evaluate
+
+    Returns
+    -----------
+        report (dict) : build time, recall@k, and latency for every backend setting
+    """
+    vectors = make_synthetic_vectors(num_vectors + num_queries, dim)
+    queries, vectors = vectors[:num_queries], vectors[num_queries:]
+    ids = list(range(num_vectors))
+
+    flat = vector_index.create_index("flat", dim).build(vectors, ids)
+    exact_results, flat_latencies = time_searches(flat, queries, top_k)
+
+    start = time.perf_counter()
+    ivf = vector_index.create_index("ivf", dim).build(vectors, ids)
+    ivf_build_s = time.perf_counter() - start
+
+    report = {"num_vectors": num_vectors,
+              "dim": dim,
+              "num_queries": num_queries,
+              "top_k": top_k,
+              "ivf_n_lists": ivf.n_lists,
+              "ivf_build_s": round(ivf_build_s, 3),
+              "backends": [{"backend": "flat",
+                            "recall_at_k": 1.0,
+                            "p50_ms": round(float(np.percentile(flat_latencies, 50)), 3),
+                            "p95_ms": round(float(np.percentile(flat_latencies, 95)), 3)}]}
+
+    for n_probe in n_probes:
+        ivf.n_probe = n_probe
+        approx_results, latencies = time_searches(ivf, queries, top_k)
+        recall = np.mean([len(approx & exact) / len(exact) for approx, exact in zip(approx_results, exact_results)])
+        report["backends"].append({"backend": f"ivf (n_probe={n_probe})",
+                                   "recall_at_k": round(float(recall), 4),
+                                   "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                                   "p95_ms": round(float(np.percentile(latencies, 95)), 3)})
+
+    return report
+
+
+def main():
+    """
+    Main execution function for the vector index recall-vs-latency report.
+    Usage: python vector_index_report.py [num_vectors] [output.json]
+    """
+    num_vectors = int(sys.argv[1]) if len(sys.argv) >= 2 else 100000
+    report = run_report(num_vectors=num_vectors)
+
+    print(f"{num_vectors} vectors, dim {report['dim']}, top {report['top_k']}, "
+          f"{report['ivf_n_lists']} IVF lists built in {report['ivf_build_s']}s\n")
+    print(f"{'backend':<22}{'recall@k':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for row in report["backends"]:
+        print(f"{row['backend']:<22}{row['recall_at_k']:>10}{row['p50_ms']:>10}{row['p95_ms']:>10}")
+
+    if len(sys.argv) >= 3:
+        with open(sys.argv[2], "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
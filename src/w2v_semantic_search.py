@@ -1,15 +1,40 @@
-import gensim
-import gensim.downloader
-from gensim.models import Word2Vec
+import os
+import json
+import hashlib
+import itertools
 from gensim.matutils import unitvec
 import numpy as np
+import scipy.sparse
 
+import doc_reader as reader
 import md_cleaner as cleaner
 import md_preprocessor as preprocessor
 import helper_funcs as helper
+import vector_index
+import metrics
 
+DOC_EMBEDDINGS_FILE = "doc_embeddings.npy"
+DOC_EMBEDDINGS_INDEX_FILE = "doc_embeddings_index.json"
+VECTOR_INDEX_FINGERPRINT_FILE = "fingerprint.txt"
+SIF_A = 1e-3
 
-def create_doc_embeddings(preproc_docs: dict, model: object) -> dict:
+
+def get_keyed_vectors(model: object):
+    """
+    Gets the word vectors of a model, accepting either a full Word2Vec model or
+    the query-serving KeyedVectors loaded by `helper.load_w2v_vectors`.
+
+    Parameters
+    -----------
+        model: the trained Word2Vec model or its KeyedVectors
+
+    Returns
+    -----------
+        (KeyedVectors) : the model's word vectors
+    """
+    return model.wv if hasattr(model, "wv") else model
+
+def create_doc_embeddings(preproc_docs: dict, model: object, weighting=None) -> dict:
     """
     Create document embeddings by averaging the word embeddings of the tokens
     of the preprocessed docs which are present in the model.
@@ -19,22 +44,291 @@ def create_doc_embeddings(preproc_docs: dict, model: object) -> dict:
         preproc_docs (dict): preprocessed documents, keyed by filename with
                 values corresponding to the file content in tokenized form
         model: the trained Word2Vec model
+        weighting (str | None): token weighting, see `create_doc_embedding_matrix`
 
     Returns
     -----------
         document_embeddings (dict): document embeddings dictionary keyed by
             filename with values corresponding to the document embeddings
     """
-    document_embeddings = {}
+    embedding_matrix, filenames = create_doc_embedding_matrix(preproc_docs, model, weighting)
+
+    return dict(zip(filenames, embedding_matrix))
 
+def create_doc_embedding_matrix(preproc_docs: dict, model: object, weighting=None) -> tuple:
+    """
+    Computes the unit-length average token embedding of every document in one
+    vectorized step. All tokens are mapped to vocabulary ids in a single pass,
+    and the per-document sums come from one sparse (docs x vocab) count matrix
+    multiplied by the word vectors. Docs without any in-vocabulary token are
+    left out.
+
+    Parameters
+    -----------
+        preproc_docs (dict): preprocessed documents, keyed by filename with
+                values corresponding to the file content in tokenized form
+        model: the trained Word2Vec model
+        weighting (str | None): None for a plain average, "tfidf" to weight
+                tokens by their inverse document frequency in these docs, or
+                "sif" for smooth inverse frequency weights a / (a + p(word))
+
+    Returns
+    -----------
+        embedding_matrix (np.ndarray): (num_docs, vector_size) float32 matrix
+        filenames (list[str]): filename corresponding to each matrix row
+    """
+    wv = get_keyed_vectors(model)
+    key_to_index = wv.key_to_index
+
+    filenames, doc_token_ids = [], []
     for filename, tokens in preproc_docs.items():
-        embeddings = [model.wv[word] for word in tokens if word in model.wv]
-        if embeddings:
-            document_embeddings[filename] = unitvec(np.mean(embeddings, axis=0))
+        filenames.append(filename)
+        doc_token_ids.append(np.fromiter(map(key_to_index.get, tokens, itertools.repeat(-1)),
+                                         dtype=np.int64, count=len(tokens)))
+
+    doc_lengths = np.array([len(ids) for ids in doc_token_ids], dtype=np.int64)
+    token_ids = np.concatenate(doc_token_ids) if doc_token_ids else np.empty(0, dtype=np.int64)
+
+    known = token_ids >= 0
+    token_ids = token_ids[known]
+    known_lengths = np.bincount(np.repeat(np.arange(len(filenames)), doc_lengths)[known], minlength=len(filenames))
+    indptr = np.concatenate([[0], np.cumsum(known_lengths)])
+
+    # Repeated tokens stay separate entries of the count matrix, which the
+    # matrix product sums up without the cost of sorting them together.
+    counts = scipy.sparse.csr_matrix((np.ones(len(token_ids), dtype=np.float32), token_ids, indptr),
+                                     shape=(len(filenames), len(key_to_index)))
+
+    embedded_docs = np.flatnonzero(known_lengths)
+    if len(embedded_docs) < len(filenames):
+        counts = counts[embedded_docs]
+        filenames = [filenames[i] for i in embedded_docs]
+
+    if weighting == "tfidf":
+        counts.sum_duplicates()
+        doc_freqs = np.bincount(counts.indices, minlength=counts.shape[1])
+        idf = np.log((1 + len(filenames)) / (1 + doc_freqs)) + 1
+        counts = counts @ scipy.sparse.diags(idf.astype(np.float32))
+    elif weighting == "sif":
+        word_probs = np.bincount(token_ids, minlength=counts.shape[1]) / max(len(token_ids), 1)
+        counts = counts @ scipy.sparse.diags((SIF_A / (SIF_A + word_probs)).astype(np.float32))
+    elif weighting is not None:
+        raise ValueError(f"Unknown document embedding weighting '{weighting}'.")
+
+    embedding_matrix = np.asarray(counts @ wv.vectors, dtype=np.float32)
+    norms = np.linalg.norm(embedding_matrix, axis=1, keepdims=True)
+    embedding_matrix /= np.maximum(norms, np.finfo(np.float32).tiny)
+
+    return embedding_matrix, filenames
+
+def get_embeddings_fingerprint(docs_path: str, model_path: str) -> str:
+    """
+    Computes the fingerprint used to decide whether a stored embedding matrix
+    is still valid, based on the state of the docs and of the model file.
+
+    Parameters
+    -----------
+        docs_path (str) : path to documentation folder
+        model_path (str) : path to the Word2Vec model or vectors file
+
+    Returns
+    -----------
+        fingerprint (str) : hex digest of the docs and model state
+    """
+    model_stat = os.stat(model_path)
+    model_state = f"{os.path.abspath(model_path)}:{model_stat.st_mtime_ns}:{model_stat.st_size}"
+    docs_state = reader.get_docs_fingerprint(docs_path)
 
-    return document_embeddings
+    return hashlib.sha1(f"{model_state}|{docs_state}".encode()).hexdigest()
 
-def run_query(query_str: str, preproc_docs: dict, model: object) -> list[str]:
+def save_doc_embeddings(embedding_matrix: np.ndarray,
+                        filenames: list[str],
+                        fingerprint: str,
+                        embeddings_dir=helper.MODEL_PATH):
+    """
+    Saves the document embedding matrix as a `.npy` file and its filename index
+    as a JSON file next to the Word2Vec model.
+
+    Parameters
+    -----------
+        embedding_matrix (np.ndarray): document embedding matrix
+        filenames (list[str]): filename corresponding to each matrix row
+        fingerprint (str): fingerprint of the docs and model used to build it
+        embeddings_dir (str): directory to save the files into
+
+    Returns
+    -----------
+        (Does not return a value)
+    """
+    if not os.path.exists(embeddings_dir):
+        os.makedirs(embeddings_dir)
+
+    np.save(os.path.join(embeddings_dir, DOC_EMBEDDINGS_FILE),
+            np.ascontiguousarray(embedding_matrix, dtype=np.float32))
+
+    with open(os.path.join(embeddings_dir, DOC_EMBEDDINGS_INDEX_FILE), "w") as f:
+        json.dump({"fingerprint": fingerprint, "filenames": filenames}, f)
+
+def build_doc_embeddings(preproc_docs: dict,
+                         model: object,
+                         docs_path=os.path.join(helper.DATA_PATH, "docs"),
+                         model_path=helper.W2V_VECTORS_PATH):
+    """
+    Offline build step which computes the document embedding matrix for the
+    inputted docs and model and stores it next to the Word2Vec model.
+
+    Parameters
+    -----------
+        preproc_docs (dict): preprocessed documents, keyed by filename with
+                values corresponding to the file content in tokenized form
+        model (object): the trained Word2Vec model
+        docs_path (str): path to documentation folder
+        model_path (str): path to the saved Word2Vec model or vectors file
+
+    Returns
+    -----------
+        (Does not return a value)
+    """
+    embedding_matrix, filenames = create_doc_embedding_matrix(preproc_docs, model)
+    fingerprint = get_embeddings_fingerprint(docs_path, model_path)
+    save_doc_embeddings(embedding_matrix, filenames, fingerprint, os.path.dirname(model_path))
+
+def load_doc_embeddings(preproc_docs: dict,
+                        model: object,
+                        docs_path=os.path.join(helper.DATA_PATH, "docs"),
+                        model_path=helper.W2V_VECTORS_PATH) -> tuple:
+    """
+    Loads the stored document embedding matrix memory-mapped, rebuilding it
+    first if it is missing or if the docs or model have changed since it was
+    built.
+
+    Parameters
+    -----------
+        preproc_docs (dict): preprocessed documents, keyed by filename with
+                values corresponding to the file content in tokenized form
+        model (object): the trained Word2Vec model
+        docs_path (str): path to documentation folder
+        model_path (str): path to the saved Word2Vec model or vectors file
+
+    Returns
+    -----------
+        embedding_matrix (np.memmap): read-only document embedding matrix
+        filenames (list[str]): filename corresponding to each matrix row
+    """
+    embeddings_dir = os.path.dirname(model_path)
+    matrix_path = os.path.join(embeddings_dir, DOC_EMBEDDINGS_FILE)
+    index_path = os.path.join(embeddings_dir, DOC_EMBEDDINGS_INDEX_FILE)
+
+    fingerprint = get_embeddings_fingerprint(docs_path, model_path)
+
+    index = None
+    if os.path.exists(matrix_path) and os.path.exists(index_path):
+        with open(index_path, "r") as f:
+            index = json.load(f)
+
+    if index is None or index.get("fingerprint") != fingerprint:
+        build_doc_embeddings(preproc_docs, model, docs_path, model_path)
+        with open(index_path, "r") as f:
+            index = json.load(f)
+
+    embedding_matrix = np.load(matrix_path, mmap_mode='r')
+
+    return embedding_matrix, index["filenames"]
+
+def load_vector_index(preproc_docs: dict,
+                      model: object,
+                      backend="flat",
+                      docs_path=os.path.join(helper.DATA_PATH, "docs"),
+                      model_path=helper.W2V_VECTORS_PATH,
+                      **index_params):
+    """
+    Loads a vector index over the document embeddings. The "flat" backend wraps
+    the memory-mapped embedding matrix directly, while approximate backends are
+    built once, saved next to the Word2Vec model, and rebuilt when the docs or
+    model change.
+
+    Parameters
+    -----------
+        preproc_docs (dict): preprocessed documents, keyed by filename with
+                values corresponding to the file content in tokenized form
+        model (object): the trained Word2Vec model
+        backend (str): vector index backend, "flat" (exact) or "ivf" (approximate)
+        docs_path (str): path to documentation folder
+        model_path (str): path to the saved Word2Vec model or vectors file
+        index_params: backend-specific parameters, e.g. `n_lists` and `n_probe`
+
+    Returns
+    -----------
+        (vector_index.FlatIndex | vector_index.IVFIndex) : loaded vector index
+    """
+    embedding_matrix, filenames = load_doc_embeddings(preproc_docs, model, docs_path, model_path)
+
+    vector_size = get_keyed_vectors(model).vector_size
+
+    if backend == vector_index.FlatIndex.kind:
+        return vector_index.FlatIndex(vector_size, vectors=embedding_matrix, ids=filenames)
+
+    index_dir = os.path.join(os.path.dirname(model_path), f"{backend}_index")
+    fingerprint_path = os.path.join(index_dir, VECTOR_INDEX_FINGERPRINT_FILE)
+    fingerprint = get_embeddings_fingerprint(docs_path, model_path)
+
+    if os.path.exists(fingerprint_path):
+        with open(fingerprint_path, "r") as f:
+            if f.read() == fingerprint:
+                index = vector_index.load_index(index_dir)
+                index.n_probe = index_params.get("n_probe", index.n_probe)
+                return index
+
+    index = vector_index.create_index(backend, vector_size, **index_params)
+    index.build(np.asarray(embedding_matrix), filenames)
+    index.save(index_dir)
+
+    with open(fingerprint_path, "w") as f:
+        f.write(fingerprint)
+
+    return index
+
+def embed_tokens(query_tokens: list[str], model: object) -> np.ndarray:
+    """
+    Embeds preprocessed query tokens as the unit average of their
+    in-vocabulary token vectors.
+
+    Parameters
+    -----------
+        query_tokens (list[str]) : preprocessed query tokens
+        model (object) : the trained Word2Vec model
+
+    Returns
+    -----------
+        query_embedding (np.ndarray) : unit-length query embedding
+    """
+    wv = get_keyed_vectors(model)
+    average_vec_rep = [wv[token] for token in query_tokens if token in wv]
+
+    return unitvec(np.mean(average_vec_rep, axis=0))
+
+def embed_query(query_str: str, model: object) -> np.ndarray:
+    """
+    Spell-corrects, cleans, and preprocesses a query and embeds it as the unit
+    average of its in-vocabulary token vectors.
+
+    Parameters
+    -----------
+        query_str (str) : user query
+        model (object) : the trained Word2Vec model
+
+    Returns
+    -----------
+        query_embedding (np.ndarray) : unit-length query embedding
+    """
+    return embed_tokens(helper.preprocess_query(query_str), model)
+
+def run_query(query_str: str,
+              preproc_docs: dict,
+              model: object,
+              doc_embeddings=None,
+              top_k=None,
+              doc_index=None) -> list[tuple]:
     """
     Performs a similarity search on the inputted query against a dictionary
     of preprocessed documents and an inputted Word2Vec model.
@@ -45,28 +339,152 @@ def run_query(query_str: str, preproc_docs: dict, model: object) -> list[str]:
         preproc_docs (dict): preprocessed documents, keyed by filename with
                 values corresponding to the file content in tokenized form
         model (object) : the trained Word2Vec model
-    
+        doc_embeddings (tuple | None) : precomputed (embedding_matrix, filenames)
+                from `load_doc_embeddings`; computed in memory if None
+        top_k (int | None) : number of docs to return, all if None
+        doc_index (FlatIndex | IVFIndex | None) : vector index from
+                `load_vector_index`, used instead of doc_embeddings if given
+
+    Returns
+    -----------
+        similar_docs (list[tuple]) : (filename, score) of the most similar docs
+                to the query, most similar first
+    """
+    return run_token_query(helper.preprocess_query(query_str),
+                           preproc_docs,
+                           model,
+                           doc_embeddings,
+                           top_k,
+                           doc_index)
+
+def run_token_query(query_tokens: list[str],
+                    preproc_docs: dict,
+                    model: object,
+                    doc_embeddings=None,
+                    top_k=None,
+                    doc_index=None) -> list[tuple]:
+    """
+    Performs a similarity search for already preprocessed query tokens against
+    a dictionary of preprocessed documents and an inputted Word2Vec model.
+
+    Parameters
+    -----------
+        query_tokens (list[str]) : preprocessed query tokens
+        preproc_docs (dict): preprocessed documents, keyed by filename with
+                values corresponding to the file content in tokenized form
+        model (object) : the trained Word2Vec model
+        doc_embeddings (tuple | None) : precomputed (embedding_matrix, filenames)
+                from `load_doc_embeddings`; computed in memory if None
+        top_k (int | None) : number of docs to return, all if None
+        doc_index (FlatIndex | IVFIndex | None) : vector index from
+                `load_vector_index`, used instead of doc_embeddings if given
+
     Returns
     -----------
-        similar_docs (list[str]) : filenames of the most similar docs to the query
+        similar_docs (list[tuple]) : (filename, score) of the most similar docs
+                to the query, most similar first, or an empty list if the query
+                has no in-vocabulary token
     """
-    corrected_query = cleaner.correct_spelling(query_str)
-    query_tokens = helper.clean_and_preproc_data(corrected_query)
-    average_vec_rep = [model.wv[token] for token in query_tokens if token in model.wv]
-    query_embedding = unitvec(np.mean(average_vec_rep, axis=0))
+    if not any(token in get_keyed_vectors(model) for token in query_tokens):
+        return []
 
-    doc_embeddings = create_doc_embeddings(preproc_docs, model)
+    with metrics.span("embed_query"):
+        query_embedding = embed_tokens(query_tokens, model)
 
-    similar_docs = []
-    for filename, doc_embedding in doc_embeddings.items():
-        similarity_score = np.dot(doc_embedding, query_embedding)
-        similar_docs.append((filename, similarity_score))
-    
-    similar_docs = sorted(similar_docs, key=lambda x: x[1], reverse=True)
+    if doc_index is not None:
+        with metrics.span("score_docs"):
+            similar_docs, num_scored = doc_index.search_with_count(query_embedding,
+                                                                   len(doc_index) if top_k is None else top_k)
+        metrics.inc("docs_scored", num_scored)
+        return similar_docs
+
+    if doc_embeddings is None:
+        doc_embeddings = create_doc_embedding_matrix(preproc_docs, model)
+    embedding_matrix, filenames = doc_embeddings
+
+    metrics.inc("docs_scored", len(filenames))
+    with metrics.span("score_docs"):
+        similarity_scores = embedding_matrix @ query_embedding
+        best_indices = helper.top_k_indices(similarity_scores, top_k)
+
+    similar_docs = [(filenames[i], similarity_scores[i]) for i in best_indices]
 
     return similar_docs
 
-def get_relevant_files(query: str, preproc_docs: dict, model: object, top_k=5, include_score=False, verbose=False) -> list[str]:
+def embed_queries(queries: list[str], model: object) -> tuple:
+    """
+    Spell-corrects, cleans, preprocesses, and embeds a batch of queries into a
+    single query matrix, one unit-length row per query. Repeated queries are
+    only preprocessed once.
+
+    Parameters
+    -----------
+        queries (list[str]) : user queries
+        model (object) : the trained Word2Vec model
+
+    Returns
+    -----------
+        query_matrix (np.ndarray): (num_queries, vector_size) float32 matrix
+        valid (np.ndarray): boolean mask of queries with in-vocabulary tokens
+    """
+    wv = get_keyed_vectors(model)
+    query_matrix = np.zeros((len(queries), wv.vector_size), dtype=np.float32)
+    valid = np.zeros(len(queries), dtype=bool)
+
+    for i, query_tokens in enumerate(helper.preprocess_query_batch(queries)):
+        query_tokens = [token for token in query_tokens if token in wv]
+        if query_tokens:
+            query_matrix[i] = unitvec(np.mean(wv[query_tokens], axis=0))
+            valid[i] = True
+
+    return query_matrix, valid
+
+def run_query_batch(queries: list[str],
+                    preproc_docs: dict,
+                    model: object,
+                    doc_embeddings=None,
+                    top_k=5) -> list[list[tuple]]:
+    """
+    Performs a similarity search for a batch of queries at once by scoring the
+    query matrix against the document embedding matrix with a single matrix
+    product.
+
+    Parameters
+    -----------
+        queries (list[str]) : user queries
+        preproc_docs (dict): preprocessed documents, keyed by filename with
+                values corresponding to the file content in tokenized form
+        model (object) : the trained Word2Vec model
+        doc_embeddings (tuple | None) : precomputed (embedding_matrix, filenames)
+                from `load_doc_embeddings`; computed in memory if None
+        top_k (int) : number of docs to return per query (default: 5)
+
+    Returns
+    -----------
+        batch_docs (list[list[tuple]]) : (filename, score) of the most similar
+                docs for each query, empty for queries matching nothing
+    """
+    query_matrix, valid = embed_queries(queries, model)
+
+    if doc_embeddings is None:
+        doc_embeddings = create_doc_embedding_matrix(preproc_docs, model)
+    embedding_matrix, filenames = doc_embeddings
+
+    similarity_scores = query_matrix @ np.asarray(embedding_matrix).T
+    best_indices = helper.top_k_indices_batch(similarity_scores, top_k)
+
+    return [[(filenames[j], similarity_scores[i, j]) for j in best_indices[i]] if valid[i] else []
+            for i in range(len(queries))]
+
+def get_relevant_files(query: str,
+                       preproc_docs: dict,
+                       model: object,
+                       top_k=5,
+                       include_score=False,
+                       verbose=False,
+                       doc_embeddings=None,
+                       doc_index=None,
+                       query_tokens=None) -> list[str]:
     """
     Gets the top 'k' relevant files from an inputted query. Defaults to top
     5 most relevant files.
@@ -79,13 +497,20 @@ def get_relevant_files(query: str, preproc_docs: dict, model: object, top_k=5, i
         top_k (int) : top 'k' most relevant files to return (default: 5)
         include_score (bool) : if True, includes similarity score of file
         verbose (bool) : if True, prints files in addition to returning
+        doc_embeddings (tuple | None) : precomputed (embedding_matrix, filenames)
+                from `load_doc_embeddings`
+        doc_index (FlatIndex | IVFIndex | None) : vector index from
+                `load_vector_index`, used instead of doc_embeddings if given
+        query_tokens (list[str] | None) : the query already preprocessed with
+                `helper_funcs.preprocess_query`, to skip preprocessing it again
 
     Returns:
         rel_files (list) : top 'k' most relevant files
     """
-    try:
-        similar_docs = run_query(query, preproc_docs, model)
-    except TypeError:
+    if query_tokens is None:
+        query_tokens = helper.preprocess_query(query)
+    similar_docs = run_token_query(query_tokens, preproc_docs, model, doc_embeddings, top_k, doc_index)
+    if not similar_docs:
         print("Your query does not match anything in our system.")
         return []
 
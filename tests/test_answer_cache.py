@@ -0,0 +1,67 @@
+import gc
+import os
+import json
+import weakref
+
+import pytest
+
+import answer_cache
+from answer_cache import AnswerCache
+
+
+@pytest.fixture(autouse=True)
+def normalize_query(monkeypatch):
+    # Keys only need to be stable here, not normalized like the docs
+    monkeypatch.setattr(answer_cache, "normalize_query", lambda query: query.lower().split())
+
+
+def test_puts_are_batched_and_flushed(tmp_path):
+    cache_path = str(tmp_path / "answer_cache.json")
+    cache = AnswerCache(cache_path, version="v1", save_interval=60)
+
+    cache.put("first question", ["a.md"], "first answer")
+    cache.put("second question", ["b.md"], "second answer")
+    cache.put("third question", ["c.md"], "third answer")
+
+    with open(cache_path) as f:
+        assert len(json.load(f)["entries"]) == 1
+
+    cache.flush()
+
+    reloaded = AnswerCache(cache_path, version="v1")
+    assert len(reloaded) == 3
+    assert reloaded.get("Second question", ["b.md"]) == "second answer"
+    assert os.listdir(tmp_path) == ["answer_cache.json"]
+
+
+def test_cache_is_not_kept_alive_after_use(tmp_path):
+    cache = AnswerCache(str(tmp_path / "answer_cache.json"), version="v1")
+    cache.put("question", ["a.md"], "answer")
+    cache_ref = weakref.ref(cache)
+
+    del cache
+    gc.collect()
+
+    assert cache_ref() is None
+
+
+def test_version_mismatch_empties_cache(tmp_path):
+    cache_path = str(tmp_path / "answer_cache.json")
+    AnswerCache(cache_path, version="v1").put("question", ["a.md"], "answer")
+
+    assert len(AnswerCache(cache_path, version="v2")) == 0
+
+
+@pytest.mark.parametrize("contents", ["{not json",
+                                      '{"version": "v1", "entries": [["key", {"answer": "x"}]]}',
+                                      '{"version": "v1", "entries": [["key"]]}',
+                                      '{"version": "v1", "entries": [["key", {"answer": "x", "created": "now"}]]}'])
+def test_malformed_cache_is_discarded(tmp_path, contents):
+    cache_path = tmp_path / "answer_cache.json"
+    cache_path.write_text(contents)
+
+    cache = AnswerCache(str(cache_path), version="v1")
+    assert len(cache) == 0
+
+    cache.put("question", ["a.md"], "answer")
+    assert AnswerCache(str(cache_path), version="v1").get("question", ["a.md"]) == "answer"
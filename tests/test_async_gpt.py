@@ -0,0 +1,138 @@
+import json
+import time
+import asyncio
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import fake_completion_server
+import search_server
+from async_gpt import AsyncGPTClient, BackgroundGPTStreamer
+
+
+@pytest.fixture
+def fake_server():
+    """
+    Starts fake completion servers on ephemeral ports. Yields a function which
+    takes `make_handler` arguments and returns (api_base, handler state).
+    """
+    servers = []
+
+    def start(**handler_kwargs):
+        handler = fake_completion_server.make_handler(**handler_kwargs)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}/v1", handler.state
+
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def make_client(api_base, **kwargs):
+    return AsyncGPTClient(api_key="fake-key", api_base=api_base, backoff_base=0.01, **kwargs)
+
+
+def test_stream_chat_yields_incremental_deltas(fake_server):
+    api_base, _ = fake_server(token_delay=0, first_token_delay=0)
+    client = make_client(api_base)
+
+    async def collect():
+        try:
+            return [delta async for delta in client.stream_chat("question", "{}")]
+        finally:
+            await client.close()
+
+    deltas = asyncio.run(collect())
+
+    assert len(deltas) == len(fake_completion_server.FAKE_REPLY.split(" "))
+    assert "".join(deltas) == fake_completion_server.FAKE_REPLY
+
+
+def test_rate_limited_request_is_retried(fake_server):
+    api_base, state = fake_server(token_delay=0, first_token_delay=0, fail_first=2)
+    client = make_client(api_base, max_retries=3)
+
+    async def complete():
+        try:
+            return await client.complete("question", "{}")
+        finally:
+            await client.close()
+
+    assert asyncio.run(complete()) == fake_completion_server.FAKE_REPLY
+    assert state["requests"] == 3
+
+
+def test_concurrency_is_limited(fake_server):
+    api_base, state = fake_server(token_delay=0.01, first_token_delay=0.05)
+    client = make_client(api_base, max_concurrency=2)
+
+    async def complete_many():
+        try:
+            return await client.complete_many([(f"question {i}", "{}") for i in range(6)])
+        finally:
+            await client.close()
+
+    replies = asyncio.run(complete_many())
+
+    assert replies == [fake_completion_server.FAKE_REPLY] * 6
+    assert state["requests"] == 6
+    assert state["max_in_flight"] == 2
+
+
+def test_closing_background_stream_early_releases_request(fake_server):
+    # The full reply takes about four seconds to stream
+    api_base, state = fake_server(token_delay=0.2, first_token_delay=0)
+    client = make_client(api_base, max_concurrency=1)
+    streamer = BackgroundGPTStreamer(client)
+
+    try:
+        stream = streamer.stream("question", "{}")
+        next(stream)
+        stream.close()
+
+        deadline = time.monotonic() + 1
+        while (client._semaphore._value == 0 or state["in_flight"]) and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert client._semaphore._value == 1
+        assert state["in_flight"] == 0
+    finally:
+        streamer.close()
+
+
+def test_ask_stream_emits_ndjson_deltas_then_answer(fake_server):
+    api_base, _ = fake_server(token_delay=0, first_token_delay=0)
+
+    service = object.__new__(search_server.SearchService)
+    service.search_with_tokens = lambda query, top_k: ({"compute_clusters.md": ["start", "cluster"]}, query.split())
+    service.answer_cache = None
+    service.semantic_cache = None
+    service.hyperlink_dict = {"compute_clusters.md": "https://docs.parallel.works/compute/clusters"}
+    service.gpt_streamer = BackgroundGPTStreamer(make_client(api_base))
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), search_server.make_handler(service))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        request = urllib.request.Request(f"http://127.0.0.1:{server.server_address[1]}/ask_stream",
+                                         data=json.dumps({"query": "How do I start a cluster?"}).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"},
+                                         method="POST")
+        with urllib.request.urlopen(request, timeout=10) as response:
+            assert response.headers["Content-Type"] == "application/x-ndjson"
+            events = [json.loads(line) for line in response]
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.gpt_streamer.close()
+
+    *delta_events, final_event = events
+    assert delta_events and all(set(event) == {"delta"} for event in delta_events)
+    assert "".join(event["delta"] for event in delta_events) == fake_completion_server.FAKE_REPLY
+    assert final_event["answer"] == fake_completion_server.FAKE_REPLY.replace(
+        "compute_clusters.md", "[compute_clusters.md](https://docs.parallel.works/compute/clusters)")
@@ -0,0 +1,21 @@
+import json
+
+import context_packer
+
+
+def test_pack_context_truncates_last_doc_to_budget():
+    docs = {f"doc{i}.md": ['say "quoted\\path"'] * 100 for i in range(3)}
+    context_packer._doc_cost.cache_clear()
+
+    packed = context_packer.pack_context(docs, max_tokens=800)
+
+    assert context_packer.count_tokens(packed) <= 800
+    assert list(json.loads(packed)) == ["doc0.md", "doc1.md"]
+    # Only the costs of whole docs are cached, never of truncated prefixes
+    assert context_packer._doc_cost.cache_info().currsize == 2
+
+
+def test_pack_context_keeps_docs_that_fit():
+    docs = {"a.md": ["alpha", "beta"], "b.md": ["gamma"]}
+
+    assert json.loads(context_packer.pack_context(docs, max_tokens=1000)) == {"a.md": "alpha beta", "b.md": "gamma"}
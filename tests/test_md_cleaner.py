@@ -0,0 +1,63 @@
+import os
+
+import nltk
+import pytest
+
+import md_cleaner as cleaner
+import md_preprocessor as preprocessor
+from cleaner_benchmark import EDGE_CASES, load_texts
+
+
+def has_nltk_data(*resources: str) -> bool:
+    try:
+        for resource in resources:
+            nltk.data.find(resource)
+    except LookupError:
+        return False
+    return True
+
+
+@pytest.fixture(scope="module")
+def pipeline():
+    """
+    Uses the real preprocessing pipeline when the NLTK corpora are installed,
+    and otherwise a stand-in with a small stop-word list and a lemmatizer that
+    strips plural endings, which is enough to compare the two code paths.
+    """
+    if has_nltk_data("corpora/stopwords", "corpora/wordnet"):
+        yield preprocessor.get_default_pipeline()
+        return
+
+    pipeline = object.__new__(preprocessor.PreprocessingPipeline)
+    pipeline.stop_words = {"the", "a", "an", "and", "of", "to", "in", "is", "it", "s", "t"}
+    pipeline._spell = None
+    pipeline.lemmatize = lambda token: token[:-1] if token.endswith("s") else token
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(preprocessor, "_default_pipeline", pipeline)
+        yield pipeline
+
+
+@pytest.fixture(scope="module")
+def texts(pipeline, tmp_path_factory):
+    # A path without docs makes `load_texts` generate the synthetic corpus
+    return load_texts(os.path.join(tmp_path_factory.mktemp("corpus"), "docs"))
+
+
+def test_edge_cases_are_checked(texts):
+    assert texts[-len(EDGE_CASES):] == EDGE_CASES
+
+
+def test_clean_str_matches_stepwise(texts):
+    mismatches = [text for text in texts if cleaner.clean_str(text) != cleaner.clean_str_stepwise(text)]
+    assert not mismatches
+
+
+@pytest.mark.parametrize("tokenizer", ["fast",
+                                       pytest.param("nltk", marks=pytest.mark.skipif(
+                                           not has_nltk_data("tokenizers/punkt"),
+                                           reason="NLTK punkt tokenizer data is not installed"))])
+def test_preprocess_str_matches_stepwise(texts, tokenizer):
+    cleaned_texts = [cleaner.clean_str(text) for text in texts]
+    mismatches = [text for text in cleaned_texts
+                  if preprocessor.preprocess_str(text, tokenizer) != preprocessor.preprocess_str_stepwise(text, tokenizer)]
+    assert not mismatches
@@ -0,0 +1,55 @@
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+import helper_funcs as helper
+import passage_search as passages
+from semantic_search import semsearch
+
+
+def make_search(passage_hits):
+    calls = []
+
+    def search(num_passages):
+        calls.append(num_passages)
+        return passage_hits[:num_passages]
+
+    return search, calls
+
+
+def test_retrieve_passages_caps_files_at_top_k():
+    hits = [("a.md#0-10", 0.9), ("b.md#0-10", 0.8), ("a.md#5-15", 0.7), ("c.md#0-10", 0.6),
+            ("a.md#10-20", 0.5), ("d.md#0-10", 0.4)]
+    search, calls = make_search(hits)
+
+    selected = passages.retrieve_passages(search, top_k=2)
+
+    assert selected == [("a.md#0-10", 0.9), ("b.md#0-10", 0.8), ("a.md#5-15", 0.7)]
+    assert calls == [4]
+
+
+def test_retrieve_passages_widens_pool_until_top_k_files():
+    hits = [(f"a.md#{i}-{i + 10}", 1 - i / 100) for i in range(8)] + [("b.md#0-10", 0.1), ("c.md#0-10", 0.05)]
+    search, calls = make_search(hits)
+
+    selected = passages.retrieve_passages(search, top_k=3)
+
+    assert calls == [6, 12]
+    assert [passage_id for passage_id, _ in selected] == ["a.md#0-10", "a.md#1-11", "b.md#0-10", "c.md#0-10"]
+
+
+@pytest.fixture
+def docs(monkeypatch):
+    monkeypatch.setattr(helper, "preprocess_query", lambda query: query.split())
+    return {f"doc{i}.md": ["cluster"] * 20 + [f"topic{i}"] * 5 + ["filler"] * 300 for i in range(6)}
+
+
+def test_tfidf_passage_mode_returns_top_k_files(docs):
+    vectorizer = TfidfVectorizer().fit(" ".join(tokens) for tokens in docs.values())
+    passage_index = passages.load_tfidf_passage_index(docs, vectorizer)
+
+    ss_docs = semsearch("cluster topic3", docs, None, top_k=2, vectorizer=vectorizer,
+                        mode="tfidf_passage", passage_index=passage_index)
+
+    assert len(ss_docs) == 2
+    assert next(iter(ss_docs)) == "doc3.md"
+    assert all(len(tokens) <= 2 * passages.PASSAGE_WINDOW + 1 for tokens in ss_docs.values())
@@ -0,0 +1,73 @@
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import search_client
+
+
+def make_handler(delay=0.0):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            for event in ({"delta": "Hello"}, {"delta": " world"}, {"answer": "Hello world"}):
+                self.wfile.write((json.dumps(event) + "\n").encode("utf-8"))
+
+    return Handler
+
+
+@pytest.fixture
+def server():
+    servers = []
+
+    def start(delay=0.0):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(delay))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server.server_address[1]
+
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def unused_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_no_server_falls_back():
+    port = unused_port()
+
+    assert search_client.query_server("ask", {"query": "q"}, port=port) is None
+    assert search_client.stream_server("ask_stream", {"query": "q"}, port=port) is None
+
+
+def test_slow_server_raises_instead_of_falling_back(server):
+    port = server(delay=1.0)
+
+    with pytest.raises(TimeoutError):
+        search_client.query_server("ask", {"query": "q"}, port=port, timeout=0.2)
+    with pytest.raises(TimeoutError):
+        search_client.stream_server("ask_stream", {"query": "q"}, port=port, timeout=0.2)
+
+
+def test_stream_server_yields_events(server):
+    port = server()
+
+    events = list(search_client.stream_server("ask_stream", {"query": "q"}, port=port))
+
+    assert events == [{"delta": "Hello"}, {"delta": " world"}, {"answer": "Hello world"}]
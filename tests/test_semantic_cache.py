@@ -0,0 +1,41 @@
+import pytest
+from gensim.models import Word2Vec
+
+import helper_funcs as helper
+from semantic_cache import SemanticCache
+
+SENTENCES = [["start", "cluster", "power", "button"],
+             ["storage", "bucket", "mount", "cluster"],
+             ["workflow", "run", "form"]]
+
+
+@pytest.fixture
+def w2v_model():
+    return Word2Vec(SENTENCES, vector_size=16, min_count=1, workers=1, seed=0)
+
+
+def test_reuses_caller_query_tokens(w2v_model, monkeypatch):
+    def fail_preprocess(query):
+        raise AssertionError("query was preprocessed again")
+    monkeypatch.setattr(helper, "preprocess_query", fail_preprocess)
+
+    cache = SemanticCache(w2v_model)
+    cache.put("how do I start a cluster", ["clusters.md"], "answer", query_tokens=["start", "cluster"])
+
+    assert cache.get("start my cluster", ["clusters.md"], query_tokens=["start", "cluster"]) == "answer"
+    assert cache.get("start my cluster", ["storage.md"], query_tokens=["start", "cluster"]) is None
+
+
+def test_evicts_least_recently_used_slot(w2v_model):
+    cache = SemanticCache(w2v_model, max_entries=2)
+    cache.put("start", ["clusters.md"], "start answer", query_tokens=["start"])
+    cache.put("bucket", ["storage.md"], "bucket answer", query_tokens=["bucket"])
+    cache.get("start", ["clusters.md"], query_tokens=["start"])
+    cache.put("workflow", ["workflows.md"], "workflow answer", query_tokens=["workflow"])
+
+    assert len(cache) == 2
+    assert len(cache.index) == 2
+    assert cache.get("bucket", ["storage.md"], query_tokens=["bucket"]) is None
+    assert cache.get("start", ["clusters.md"], query_tokens=["start"]) == "start answer"
+    assert cache.get("workflow", ["workflows.md"], query_tokens=["workflow"]) == "workflow answer"
+    assert cache.stats()["evictions"] == 1
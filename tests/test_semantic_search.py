@@ -0,0 +1,51 @@
+import pytest
+from gensim.models import Word2Vec
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+import helper_funcs as helper
+import metrics
+import w2v_semantic_search as w2v
+from semantic_search import hybrid_search
+
+DOCS = {"clusters.md": ["start", "cluster", "power", "button"],
+        "storage.md": ["storage", "bucket", "mount", "cluster"],
+        "workflows.md": ["workflow", "run", "form"]}
+
+
+@pytest.fixture
+def models(monkeypatch):
+    monkeypatch.setattr(helper, "preprocess_query", lambda query: query.split())
+    w2v_model = Word2Vec(list(DOCS.values()), vector_size=16, min_count=1, workers=1, seed=0)
+    vectorizer = TfidfVectorizer()
+    tfidf_matrix = vectorizer.fit_transform(" ".join(tokens) for tokens in DOCS.values())
+    return w2v_model, vectorizer, tfidf_matrix
+
+
+@pytest.fixture
+def enabled_metrics():
+    metrics.enable()
+    yield
+    metrics.disable()
+    metrics.reset()
+
+
+def test_hybrid_stage_timings_include_worker_spans(models, enabled_metrics):
+    w2v_model, vectorizer, tfidf_matrix = models
+
+    with metrics.trace() as stage_timings:
+        fused = hybrid_search("start cluster", DOCS, w2v_model, vectorizer, tfidf_matrix, top_k=2)
+
+    assert len(fused) == 2
+    assert {"embed_query", "score_docs"} <= set(stage_timings)
+
+
+def test_hybrid_falls_back_to_tfidf_for_out_of_vocabulary_query(models):
+    _, vectorizer, tfidf_matrix = models
+    # The Word2Vec model has never seen the storage doc's words
+    w2v_model = Word2Vec([DOCS["clusters.md"], DOCS["workflows.md"]], vector_size=16, min_count=1, workers=1, seed=0)
+
+    assert w2v.run_token_query(["bucket"], DOCS, w2v_model, top_k=2) == []
+
+    fused = hybrid_search("bucket", DOCS, w2v_model, vectorizer, tfidf_matrix, top_k=2)
+
+    assert [filename for filename, _ in fused] == ["storage.md"]
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+import helper_funcs as helper
+import metrics
+import tfidf_semantic_search as tfidf
+
+DOCS = {"clusters.md": ["start", "cluster", "power", "button"],
+        "storage.md": ["storage", "bucket", "mount", "cluster"],
+        "workflows.md": ["workflow", "run", "form"],
+        "billing.md": ["billing", "account", "budget"]}
+
+
+@pytest.fixture
+def model(monkeypatch):
+    # Queries are already preprocessed here
+    monkeypatch.setattr(helper, "preprocess_query", lambda query: query.split())
+    vectorizer = TfidfVectorizer()
+    tfidf_matrix = vectorizer.fit_transform(" ".join(tokens) for tokens in DOCS.values())
+    return vectorizer, tfidf_matrix
+
+
+@pytest.fixture
+def docs_scored():
+    metrics.reset()
+    metrics.enable()
+    yield lambda: metrics.snapshot()["counters"].get("docs_scored", 0)
+    metrics.disable()
+    metrics.reset()
+
+
+def test_inverted_index_is_the_default_and_matches_full_product(model, docs_scored):
+    vectorizer, tfidf_matrix = model
+    query_vector = vectorizer.transform(["cluster storage"])
+
+    doc_indices, scores = tfidf.score_top_k(query_vector, tfidf_matrix, top_k=3)
+    assert tfidf.get_inverted_index(tfidf_matrix) is tfidf.get_inverted_index(tfidf_matrix)
+    assert docs_scored() == 2
+
+    full_indices, full_scores = tfidf.score_top_k(query_vector, tfidf_matrix, top_k=3, use_inverted_index=False)
+    assert docs_scored() == 2 + len(DOCS)
+
+    assert list(doc_indices) == list(full_indices)
+    np.testing.assert_allclose(scores, full_scores)
+
+
+def test_batch_matches_single_queries(model):
+    vectorizer, tfidf_matrix = model
+    queries = ["cluster storage", "run workflow", "cluster storage", "unknown words"]
+
+    batch_docs = tfidf.semantic_search_batch(queries, DOCS, vectorizer, tfidf_matrix, top_k=2)
+
+    for query, similar_docs in zip(queries, batch_docs):
+        expected = tfidf.semantic_search(query, DOCS, vectorizer, tfidf_matrix, top_k=2)
+        assert [filename for filename, _ in similar_docs] == [filename for filename, _ in expected]
+        np.testing.assert_allclose([score for _, score in similar_docs], [score for _, score in expected])
+    assert batch_docs[-1] == []
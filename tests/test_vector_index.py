@@ -0,0 +1,32 @@
+import numpy as np
+
+import vector_index
+
+
+def make_vectors(num_vectors=1000, dim=16):
+    vectors = np.random.default_rng(0).normal(size=(num_vectors, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors, [f"doc{i}.md" for i in range(num_vectors)]
+
+
+def test_flat_index_scores_every_vector():
+    vectors, ids = make_vectors()
+    index = vector_index.FlatIndex(vectors.shape[1]).build(vectors, ids)
+
+    results, num_scored = index.search_with_count(vectors[7], top_k=3)
+
+    assert results[0][0] == "doc7.md"
+    assert num_scored == len(ids)
+    assert index.search(vectors[7], top_k=3) == results
+
+
+def test_ivf_index_scores_only_probed_lists():
+    vectors, ids = make_vectors()
+    index = vector_index.IVFIndex(vectors.shape[1], n_lists=20, n_probe=2).build(vectors, ids)
+
+    results, num_scored = index.search_with_count(vectors[7], top_k=3)
+
+    assert results[0][0] == "doc7.md"
+    probed = np.argsort(-(index.centroids @ vectors[7]))[:2]
+    assert num_scored == int(np.isin(index.assignments, probed).sum())
+    assert num_scored < len(ids)